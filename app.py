@@ -1,58 +1,238 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import time
+_import_started = time.perf_counter()
+
 from dotenv import load_dotenv
+load_dotenv()  # before utils.* read their settings from the environment
+
+from flask import Flask, Blueprint, request, jsonify, Response, g, stream_with_context, send_file
+from flask_cors import CORS
 from utils.db import db
-from utils.ai_utils import get_ai_guidance
+from utils.ai_utils import get_ai_guidance, stream_ai_guidance
+from utils.ai_cache import cache_ttl_for, cache_stats
+from utils.ai_profiles import profile_for
+from utils.ai_usage import usage_summary
+from utils.metrics import start_request, finish_request, render_metrics, record_startup, metrics_token_ok
+from utils.http_cache import (
+    conditional, compress_response, table_versions, make_etag, not_modified, cache_headers
+)
+from utils.rate_limit import rate_limited, check_rate_limit, too_many_requests, AIBusy
+from utils.prompts import (
+    TEST_PROMPT, quote_prompt, career_details_prompt, career_ideas_prompt, parse_career_ideas,
+    is_valid_career, is_valid_career_details
+)
+from utils.json_stream import iter_json_array
+from utils.search import search_careers, search_stories, page_args, tag_filter
+from utils.pagination import page_params, keyset, stream_rows, stream_page
+from utils.user_cache import user_cache, get_cached_user_dict, invalidate_user
+from utils.career_catalog import find_career, generate_career, career_result
+from utils.story_bank import get_bank_stories, StoryBankEmpty
+from utils.saved_careers import list_saved_careers, get_current_career, save_career as save_career_plan
+from utils.career_pdf import plan_data, plan_hash, get_plan_pdf, RenderOverloaded, PDF_RENDER_RETRY_AFTER
+from utils.jobs import submit_job, get_job, valid_webhook, JOB_POLL_INTERVAL
+from utils.forum import (
+    ask_question, post_answer, question_feed, get_question, question_dict, thread_answers,
+    MAX_TEXT_LENGTH
+)
+from utils.bulk import KINDS as BULK_KINDS, FORMATS as BULK_FORMATS, read_rows, import_rows, export_lines
 from models.user import User
 from models.failcourse import FailCourse
 from models.careerpath import CareerPath
 from models.question import Question
 from models.answer import Answer
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from peewee import SqliteDatabase, Model, CharField
-from playhouse.shortcuts import model_to_dict
-from flask_cors import cross_origin
-import openai
-import os
+from utils.passwords import (
+    hash_password, verify_password, needs_rehash, HashingOverloaded, PASSWORD_HASH_RETRY_AFTER
+)
+import functools
+import io
 import json
 import traceback
-import re
-
-# Load environment variables
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-openai.api_base = "https://openrouter.ai/api/v1"  # ✅ OpenRouter endpoint
-
-
-
-app = Flask(__name__)
-CORS(app, origins=["https://frontend1-eight-liart.vercel.app"])  # Add your frontend domain here
 
+# Importing this module does no I/O: tables, migrations and the admin account
+# are set up by `python -m utils.bootstrap` (gunicorn.conf.py runs it once in
+# the master), and the app itself is built by create_app() at the bottom.
+bp = Blueprint("main", __name__)
 
 
 # === Database Setup ===
-@app.before_request
-def before_request():
-    if db.is_closed():
-        db.connect(reuse_if_open=True)
-
-@app.teardown_request
+# Routes connect on their first query (peewee autoconnect); this hands the
+# connection back to the pool once the request, including any stream, is done.
+@bp.teardown_app_request
 def teardown_request(exc):
     if not db.is_closed():
         db.close()
 
-# === Create Tables Once ===
-with db:
-    db.create_tables([User], safe=True)
+# === Metrics ===
+@bp.before_app_request
+def start_request_metrics():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.request_stats = start_request(request.method, route)
+
+@bp.after_app_request
+def finish_request_metrics(response):
+    stats = g.pop("request_stats", None)
+    if stats:
+        # A streamed body is still unsent here; the server closes the response when it's done
+        response.call_on_close(lambda: finish_request(stats, response.status_code))
+    return response
+
+# === Compression ===
+@bp.after_app_request
+def compress(response):
+    return compress_response(response)
+
+# === AI Cache ===
+def ai_cache_options(endpoint):
+    """Profile and cache settings for an AI call; ?fresh=1 or Cache-Control: no-cache skips the cache."""
+    fresh = (
+        request.args.get("fresh") == "1"
+        or "no-cache" in request.headers.get("Cache-Control", "")
+    )
+    return {"cache_ttl": cache_ttl_for(endpoint), "use_cache": not fresh,
+            "profile": profile_for(endpoint)}
+
+# === AI Streaming ===
+def wants_ndjson():
+    """Per-item streaming is opt-in via ?stream=1 or Accept: application/x-ndjson."""
+    return (
+        request.args.get("stream") == "1"
+        or "application/x-ndjson" in request.headers.get("Accept", "")
+    )
+
+def ndjson_response(items):
+    """Stream one JSON object per line as each item is parsed."""
+    def generate():
+        try:
+            for item in items:
+                yield json.dumps(item) + "\n"
+        except AIBusy as e:
+            yield json.dumps({"error": "AI service busy", "retry_after": e.retry_after}) + "\n"
+        except Exception as e:
+            traceback.print_exc()
+            yield json.dumps({"error": "AI stream failed", "details": str(e)}) + "\n"
+        finally:
+            items.close()
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+def wants_stream():
+    """Streaming is opt-in via ?stream=1 or Accept: text/event-stream."""
+    return (
+        request.args.get("stream") == "1"
+        or "text/event-stream" in request.headers.get("Accept", "")
+    )
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_response(chunks, meta=None, result=None):
+    """Relay text chunks as SSE "data" events, then a final "done" (or "error") event.
+
+    With result, the chunks aren't relayed (a comment per chunk keeps the
+    connection alive) and result(full_text) becomes the "done" event's data.
+    """
+    def generate():
+        try:
+            if meta:
+                yield sse_event(meta, "meta")
+            parts = []
+            for chunk in chunks:
+                if result:
+                    parts.append(chunk)
+                    yield ": generating\n\n"
+                else:
+                    yield sse_event({"delta": chunk})
+            done = {}
+            if result:
+                # The request has torn down by now, so borrow a connection
+                with db.connection_context():
+                    done = result("".join(parts))
+            yield sse_event(done, "done")
+        except AIBusy as e:
+            yield sse_event({"error": "AI service busy", "retry_after": e.retry_after}, "error")
+        except Exception as e:
+            traceback.print_exc()
+            yield sse_event({"error": "AI stream failed", "details": str(e)}, "error")
+        finally:
+            # Runs on client disconnect too; closes the upstream connection
+            chunks.close()
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+# === AI Jobs ===
+def wants_async():
+    """Queueing is opt-in via ?async=1 or Prefer: respond-async."""
+    return (
+        request.args.get("async") == "1"
+        or "respond-async" in request.headers.get("Prefer", "")
+    )
+
+def job_accepted(kind, params, webhook_url=None):
+    """Queue (or reuse) a job for a worker and answer 202 with where to find it."""
+    if webhook_url and not valid_webhook(webhook_url):
+        return jsonify({"error": "webhook_url must be an allowed http(s) URL"}), 400
+    if not ai_cache_options(kind)["use_cache"]:
+        params = dict(params, fresh=True)
+
+    job, created = submit_job(kind, params, webhook_url=webhook_url)
+    status_url = f"/jobs/{job.id}"
+    response = jsonify({"job_id": job.id, "status": job.status, "created": created,
+                        "status_url": status_url, "events_url": f"{status_url}/events"})
+    response.headers["Location"] = status_url
+    return response, 202
 
 # === Routes ===
-@app.route('/')
+@bp.route('/')
 def home():
     return '✅ Backend is live', 200
 
-@app.route('/register', methods=['POST'])
+def hashing_busy():
+    response = jsonify({"error": "Server busy, please retry shortly"})
+    response.headers["Retry-After"] = str(PASSWORD_HASH_RETRY_AFTER)
+    return response, 503
+
+@bp.app_errorhandler(AIBusy)
+def ai_busy(e):
+    """Every upstream AI slot is taken and the wait queue is full (or timed out)."""
+    return too_many_requests(e.retry_after, "AI service busy, please retry shortly")
+
+def admin_from_request(data):
+    """The admin User whose email/password are in data, or None."""
+    cached = user_cache.load(email=data.get("email"))
+    if not cached:
+        return None
+    user = cached.user()
+    if user.role != "admin" or not verify_password(user.password, data.get("password")):
+        return None
+    return user
+
+def admin_from_auth():
+    """The admin named by HTTP Basic credentials, for routes whose body can't carry them (bulk, ops)."""
+    auth = request.authorization
+    if not auth or auth.type != "basic":
+        return None
+    return admin_from_request({"email": auth.username, "password": auth.password})
+
+def ops_only(view):
+    """Route decorator: METRICS_TOKEN as a bearer token, or admin HTTP Basic; otherwise 403."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not metrics_token_ok(request.headers.get("Authorization")):
+            try:
+                if not admin_from_auth():
+                    return jsonify({"error": "Admin credentials or metrics token required"}), 403
+            except HashingOverloaded:
+                return hashing_busy()
+        return view(*args, **kwargs)
+    return wrapper
+
+@bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
 
@@ -64,10 +244,13 @@ def register():
     if not name or not email or not password:
         return jsonify({'error': 'Missing name, email or password'}), 400
 
-    if User.get_or_none(User.email == email):
+    if User.select().where(User.email == email).exists():
         return jsonify({'error': 'Email already exists'}), 400
 
-    hashed_password = generate_password_hash(password)
+    try:
+        hashed_password = hash_password(password)
+    except HashingOverloaded:
+        return hashing_busy()
 
     user = User.create(
         name=name,
@@ -75,59 +258,76 @@ def register():
         password=hashed_password,
         bio=bio
     )
+    invalidate_user(user)
 
     return jsonify({'user': user.to_dict()}), 200
 
 
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     email = data.get("email")
     password = data.get("password")
 
-    user = User.get_or_none(User.email == email)
-    if not user:
+    cached = user_cache.load(email=email)
+    if not cached:
         return jsonify({"error": "Invalid email or password"}), 401
+    user = cached.user()
 
-    if not check_password_hash(user.password, password):
-        return jsonify({"error": "Invalid email or password"}), 401
+    try:
+        if not verify_password(user.password, password):
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        # Upgrade hashes made with old parameters (or legacy SHA-256) while we have the password
+        if needs_rehash(user.password):
+            (User
+             .update(password=hash_password(password), version=User.version + 1)
+             .where(User.id == user.id)
+             .execute())
+            invalidate_user(user)
+    except HashingOverloaded:
+        return hashing_busy()
 
-    return jsonify({"user": user.to_dict()}), 200
+    return jsonify({"user": cached.public}), 200
 
 
 
-@app.route('/me')
+@bp.route('/me')
 def get_profile_by_email():
     email = request.args.get('email')
     if not email:
         return jsonify({"error": "Email is required"}), 400
 
-    user = User.get_or_none(User.email == email)
-    if not user:
+    profile = get_cached_user_dict(email=email)
+    if not profile:
         return jsonify({"error": "User not found"}), 404
 
-    return jsonify(user.to_dict())
+    return jsonify(profile)
 
 
 # ---------- AI Quote ----------
-@app.route('/ai-quote', methods=['POST'])
+@bp.route('/ai-quote', methods=['POST'])
+@rate_limited("ai")
 def ai_quote():
     try:
         data = request.get_json()
         topic = data.get("topic", "failure")
 
-        prompt = f"Give me a short motivational quote about {topic}."
-        quote = get_ai_guidance(prompt, expect_json=False)
+        prompt = quote_prompt(topic)
+        if wants_stream():
+            return sse_response(stream_ai_guidance(prompt, **ai_cache_options("ai-quote")))
+        quote = get_ai_guidance(prompt, expect_json=False, **ai_cache_options("ai-quote"))
 
         return jsonify({"quote": quote})
+    except AIBusy as e:
+        return ai_busy(e)
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": "AI quote failed", "details": str(e)}), 500
 
 
-from flask import send_from_directory
-
-@app.route('/ai-guidance', methods=['POST'])
+@bp.route('/ai-guidance', methods=['POST'])
+@rate_limited("ai")
 def ai_guidance():
     data = request.get_json()
     text = data.get('text')
@@ -135,12 +335,14 @@ def ai_guidance():
     if not text:
         return jsonify({'error': 'Input text is required'}), 400
 
-    result = get_ai_guidance(text)
+    if wants_stream():
+        return sse_response(stream_ai_guidance(text, **ai_cache_options("ai-guidance")))
+    result = get_ai_guidance(text, **ai_cache_options("ai-guidance"))
     return jsonify({'result': result})
 
 
 
-@app.route('/update-career', methods=['POST'])
+@bp.route('/update-career', methods=['POST'])
 def update_career():
     try:
         data = request.get_json()
@@ -156,6 +358,7 @@ def update_career():
 
         user.career = career
         user.save()
+        invalidate_user(user)
 
         return jsonify({"message": "Career updated successfully"}), 200
 
@@ -167,21 +370,31 @@ def update_career():
 
 
 # ---------- Fail Stories ----------
-@app.route('/stories', methods=['GET'])
+@bp.route('/stories', methods=['GET'])
+@conditional("failcourse", "user")
 def get_stories():
     try:
-        stories = [
-            {
-                "id": s.id,
-                "user": s.user.name,
-                "title": s.title,
-                "story": s.story,
-                "lesson": s.lesson,
-                "tags": s.tags
-            }
-            for s in FailCourse.select().join(User)
-        ]
-        return jsonify(stories)
+        paginated, cursor, limit = page_params(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+
+    try:
+        query = (FailCourse
+                 .select(FailCourse.id, User.name.alias("user"), FailCourse.title,
+                         FailCourse.story, FailCourse.lesson, FailCourse.tags)
+                 .join(User)
+                 .dicts())
+
+        tagged = tag_filter(request.args.get("tag"))
+        if tagged is not None:
+            query = query.where(tagged)
+        user_id = request.args.get("user_id")
+        if user_id:
+            query = query.where(FailCourse.user == user_id)
+
+        if paginated:
+            return stream_page(keyset(query, FailCourse.id, cursor, limit), limit)
+        return stream_rows(keyset(query, FailCourse.id), limit)
 
     except Exception as e:
         print("Error in /stories:", e)
@@ -191,33 +404,37 @@ def get_stories():
 
 
 # ---------- Career ----------
-@app.route('/career-paths', methods=['GET'])
+@bp.route('/career-paths', methods=['GET'])
+@conditional("careerpath")
 def get_career_paths():
     try:
-        paths = [
-            {
-                "id": cp.id,
-                "title": cp.title,
-                "steps": cp.steps,
-                "pitfalls": cp.pitfalls,
-                "resources": cp.resources
-            }
-            for cp in CareerPath.select()
-        ]
-        return jsonify(paths)
+        paginated, cursor, limit = page_params(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+
+    try:
+        query = (CareerPath
+                 .select(CareerPath.id, CareerPath.title, CareerPath.description,
+                         CareerPath.steps, CareerPath.pitfalls, CareerPath.resources)
+                 .dicts())
+
+        if paginated:
+            return stream_page(keyset(query, CareerPath.id, cursor, limit), limit)
+        return stream_rows(keyset(query, CareerPath.id), limit)
 
     except Exception as e:
         print("Error in /career-paths:", e)
         return jsonify({"error": "Failed to fetch career paths", "details": str(e)}), 500
     
-@app.route('/test-ai')
+@bp.route('/test-ai')
+@rate_limited("ai")
 def test_ai():
-    from utils.ai_utils import get_ai_guidance
-    quote = get_ai_guidance("Give a short motivational quote for failed students", expect_json=False)
+    quote = get_ai_guidance(TEST_PROMPT, expect_json=False, **ai_cache_options("test-ai"))
     return jsonify({'quote': quote})
 
     
-@app.route('/ai-guide', methods=['POST'])
+@bp.route('/ai-guide', methods=['POST'])
+@rate_limited("ai")
 def ai_guide_post():
     data = request.get_json()
     prompt = data.get('prompt') or data.get('text')
@@ -225,11 +442,13 @@ def ai_guide_post():
     if not prompt:
         return jsonify({'error': 'Prompt is required'}), 400
 
-    result = get_ai_guidance(prompt, expect_json=False)
+    if wants_stream():
+        return sse_response(stream_ai_guidance(prompt, **ai_cache_options("ai-guide")))
+    result = get_ai_guidance(prompt, expect_json=False, **ai_cache_options("ai-guide"))
     return jsonify({'answer': result})
 
 
-@app.route('/career-details', methods=['POST'])
+@bp.route('/career-details', methods=['POST'])
 def career_details():
     try:
         data = request.get_json()
@@ -237,18 +456,24 @@ def career_details():
         if not title:
             return jsonify({"error": "Career title is required"}), 400
 
-        career = CareerPath.get_or_none(CareerPath.title == title)
+        career = find_career(title)
         if career:
-            return jsonify({
-                "title": career.title,
-                "description": career.description,
-                "steps": career.steps,
-                "pitfalls": career.pitfalls,
-                "resources": career.resources
-            }), 200
-
-        prompt = f"Explain how to build a career in {title}. List the steps, pitfalls, and resources."
-        ai_result = get_ai_guidance(prompt, expect_json=False)
+            return jsonify(career.to_dict()), 200
+
+        # Unknown career: generate it once and keep it in the catalog
+        limited = check_rate_limit("ai")
+        if limited:
+            return limited
+        if wants_stream():
+            # The reply is a JSON object, so send the parsed career at the end
+            # rather than its fragments
+            chunks = stream_ai_guidance(career_details_prompt(title), validate=is_valid_career_details,
+                                        **ai_cache_options("career-details"))
+            return sse_response(chunks, meta={"title": title},
+                                result=lambda text: career_result(title, text))
+        career, ai_result = generate_career(title, use_cache=ai_cache_options("career-details")["use_cache"])
+        if career:
+            return jsonify(career.to_dict()), 200
 
         return jsonify({
             "title": title,
@@ -256,85 +481,134 @@ def career_details():
             "ai_result": ai_result
         }), 200
 
+    except AIBusy as e:
+        return ai_busy(e)
     except Exception as e:
         print("Error in /career-details:", e)
         return jsonify({"error": "Failed to fetch career detail", "details": str(e)}), 500
 
 
-@app.route('/career-options', methods=['GET'])
+@bp.route('/career-details/regenerate', methods=['POST'])
+def regenerate_career_details():
+    """Admin only: replace a catalog entry with a freshly generated one."""
+    try:
+        data = request.get_json() or {}
+        title = data.get("title")
+        if not title:
+            return jsonify({"error": "Career title is required"}), 400
+        if not admin_from_request(data):
+            return jsonify({"error": "Admin credentials required"}), 403
+
+        career, ai_result = generate_career(title, use_cache=False, replace=True)
+        if not career:
+            return jsonify({"error": "AI returned unusable career details", "details": ai_result}), 502
+        return jsonify(career.to_dict()), 200
+    except HashingOverloaded:
+        return hashing_busy()
+    except AIBusy as e:
+        return ai_busy(e)
+    except Exception as e:
+        print("Error in /career-details/regenerate:", e)
+        return jsonify({"error": "Failed to regenerate career detail", "details": str(e)}), 500
+
+
+@bp.route('/career-options', methods=['GET'])
+@conditional("careerpath")
 def career_options():
     try:
-        titles = [c.title for c in CareerPath.select()]
+        titles = [title for (title,) in CareerPath.select(CareerPath.title).tuples()]
         return jsonify({"options": titles})
     except Exception as e:
         print("Error in /career-options:", e)
         return jsonify({"error": "Failed to load career titles", "details": str(e)}), 500
 
 
-@app.route('/career-search', methods=['GET'])
+@bp.route('/career-search', methods=['GET'])
 def career_search():
     try:
         keyword = request.args.get("q", "")
         if not keyword:
             return jsonify({"error": "Search keyword is required"}), 400
 
-        results = CareerPath.select().where(CareerPath.title.contains(keyword))
+        page, limit = page_args(request.args)
+        results, _ = search_careers(keyword, page, limit)
         return jsonify([{
-            "id": c.id,
-            "title": c.title,
-            "description": c.description
+            "id": c["id"],
+            "title": c["title"],
+            "description": c["description"],
+            "snippet": c["snippet"]
         } for c in results])
     except Exception as e:
         print("Error in /career-search:", e)
         return jsonify({"error": "Search failed", "details": str(e)}), 500
 
 
-@app.route('/ai-careers', methods=['POST'])
-def ai_careers():
+@bp.route('/search', methods=['GET'])
+def search():
     try:
-        data = request.get_json()
-        keyword = data.get("keyword") or "technology"
-
-        prompt = f"""
-Suggest 6 career paths for someone interested in "{keyword}".
-Each with:
-- title
-- short description
-- 3 steps to get started
-- 2 pitfalls
-- 2 free online resources
+        keyword = request.args.get("q", "")
+        kind = request.args.get("type", "all")
+        if not keyword:
+            return jsonify({"error": "Search keyword is required"}), 400
+        if kind not in ("all", "careers", "stories"):
+            return jsonify({"error": "type must be all, careers or stories"}), 400
+
+        page, limit = page_args(request.args)
+        result = {"page": page, "limit": limit, "has_more": False}
+        if kind in ("all", "careers"):
+            result["careers"], more = search_careers(keyword, page, limit)
+            result["has_more"] = result["has_more"] or more
+        if kind in ("all", "stories"):
+            result["stories"], more = search_stories(keyword, page, limit)
+            result["has_more"] = result["has_more"] or more
 
-Respond ONLY as valid JSON array.
-"""
+        return jsonify(result), 200
+    except Exception as e:
+        print("Error in /search:", e)
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
 
-        response = get_ai_guidance(prompt, expect_json=False)
 
-        match = re.search(r"\[\s*{.*}\s*]", response, re.DOTALL)
-        if not match:
-            raise ValueError("Could not parse valid JSON array from AI response.")
+@bp.route('/ai-careers', methods=['POST'])
+@rate_limited("ai")
+def ai_careers():
+    try:
+        data = request.get_json()
+        keyword = data.get("keyword") or "technology"
 
-        careers = json.loads(match.group())
+        if wants_async():
+            return job_accepted("ai-careers", {"keyword": keyword}, data.get("webhook_url"))
+
+        prompt = career_ideas_prompt(keyword)
+        if wants_ndjson():
+            return ndjson_response(
+                iter_json_array(stream_ai_guidance(prompt, **ai_cache_options("ai-careers")),
+                                validate=is_valid_career)
+            )
+        response = get_ai_guidance(prompt, expect_json=False, **ai_cache_options("ai-careers"))
+        careers = parse_career_ideas(response)
         return jsonify({"careers": careers})
 
+    except AIBusy as e:
+        return ai_busy(e)
     except Exception as e:
         print("AI Error:", e)
         return jsonify({"error": "AI suggestion failed", "details": str(e)}), 500
     
-@app.route('/profile', methods=['GET'])
+@bp.route('/profile', methods=['GET'])
 def get_profile():
     email = request.args.get('email')
-    user = User.get_or_none(User.email == email)
+    user = get_cached_user_dict(email=email) if email else None
     if user:
         return jsonify({
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "bio": user.bio,
-            "role": user.role
+            "id": user["id"],
+            "name": user["name"],
+            "email": user["email"],
+            "bio": user["bio"],
+            "role": user["role"]
         }), 200
     return jsonify({"error": "User not found"}), 404
 
-@app.route('/profile', methods=['PUT'])
+@bp.route('/profile', methods=['PUT'])
 def update_profile():
     data = request.get_json()
     email = data.get('email')
@@ -346,9 +620,13 @@ def update_profile():
 
     try:
         user = User.get(User.email == email)
-        user.name = name or user.name
-        user.bio = bio or user.bio
+        # Assign only real changes: an assigned name is saved, and saving it busts /stories ETags
+        if name and name != user.name:
+            user.name = name
+        if bio and bio != user.bio:
+            user.bio = bio
         user.save()
+        invalidate_user(user)
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -365,55 +643,44 @@ def update_profile():
         return jsonify({'error': str(e)}), 500
 
 
-
-def seed_default_user():
-    from models.user import User
-    import hashlib
-
-    email = "admin@example.com"
-    password = "admin123"
-    hashed_password = hashlib.sha256(password.encode()).hexdigest()
-
-    if not User.get_or_none(User.email == email):
-        User.create(
-            name="Admin",
-            email=email,
-            password=hashed_password,
-            role="admin",
-            bio="System administrator"
-        )
-        print("✅ Admin user created")
-    else:
-        print("ℹ️ Admin user already exists")
-
-@app.route('/user-stories', methods=['GET'])
+@bp.route('/user-stories', methods=['GET'])
+@conditional("failcourse", "user")
 def get_user_stories():
+    email = request.args.get("email")
+    if not email:
+        return jsonify({"error": "Email is required"}), 400
+
     try:
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
+        paginated, cursor, limit = page_params(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
 
-        user = User.get_or_none(User.email == email)
-        if not user:
+    try:
+        user_id = User.select(User.id).where(User.email == email).scalar()
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
 
-        stories = FailCourse.select().where(FailCourse.user == user)
-        result = [{
-            "id": s.id,
-            "title": s.title,
-            "story": s.story,
-            "lesson": s.lesson,
-            "tags": s.tags
-        } for s in stories]
+        query = (FailCourse
+                 .select(FailCourse.id, FailCourse.title, FailCourse.story,
+                         FailCourse.lesson, FailCourse.tags)
+                 .where(FailCourse.user == user_id)
+                 .dicts())
 
-        return jsonify(result), 200
+        tagged = tag_filter(request.args.get("tag"))
+        if tagged is not None:
+            query = query.where(tagged)
+
+        if paginated:
+            return stream_page(keyset(query, FailCourse.id, cursor, limit), limit)
+        return stream_rows(keyset(query, FailCourse.id), limit)
 
     except Exception as e:
         print("Error in /user-stories:", e)
         return jsonify({"error": "Failed to fetch stories", "details": str(e)}), 500
 
 
-@app.route('/ai-guide', methods=['POST'])
+@bp.route('/ai-guide', methods=['POST'])
+@rate_limited("ai")
 def ai_guide():
     data = request.get_json()
     prompt = data.get('prompt', '')
@@ -421,48 +688,70 @@ def ai_guide():
         return jsonify({'error': 'Prompt is required'}), 400
 
     # You can call your AI utility here to generate a response
-    answer = get_ai_guidance(prompt)  # Implement this in ai_utils.py
+    answer = get_ai_guidance(prompt, **ai_cache_options("ai-guide"))
     return jsonify({'answer': answer})
 
 
-def get_ai_failure_stories():
-    prompt = (
-        "Generate 10 inspiring Indian stories of individuals who initially failed in education, UPSC, or business, "
-        "but later achieved significant success. Each story should be written in 3 to 4 paragraphs, not as bullet points. "
-        "Include realistic characters with background, failure, turning point, and final growth. Avoid using real names like 'Narendra Modi' or 'Ambani'. "
-        "Return the stories as a JSON array of objects with the keys: 'title', 'story', and optional 'tags'. "
-        "Each 'story' field should contain a well-written paragraph-style narrative. "
-        "Do not return markdown or code formatting."
-    )
-
-    raw_stories = get_ai_guidance(prompt, expect_json=True)
-
-    # Clean and validate
-    stories = []
-    for item in raw_stories:
-        if (
-            isinstance(item, dict)
-            and item.get("title")
-            and item.get("story")
-            and isinstance(item["story"], str)
-            and len(item["story"].split()) > 50  # ensure it's more than a few lines
-        ):
-            stories.append(item)
-
-    return stories[:10]  # Return up to 10 medium-length stories
-
-from flask import jsonify
-from utils.ai_utils import get_ai_failure_stories  # ensure this import works
-
-@app.route("/ai-stories", methods=["GET"])
+@bp.route("/ai-stories", methods=["GET"])
 def ai_stories():
     try:
-        stories = get_ai_failure_stories()
+        if wants_async():
+            # A new batch from the model, rather than stories from the pool
+            return check_rate_limit("ai") or job_accepted("ai-stories", {}, request.args.get("webhook_url"))
+        stories = get_bank_stories(force_refresh=request.args.get("fresh") == "1")
         return jsonify({"stories": stories}), 200
+    except StoryBankEmpty as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+    except AIBusy as e:
+        return ai_busy(e)
     except Exception as e:
         return jsonify({"error": "Failed to fetch stories", "details": str(e)}), 500
 
-@app.route('/save-career', methods=['POST'])
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(job.to_dict())
+    if job.status in ("queued", "running"):
+        response.headers["Retry-After"] = "1"
+    return response, 200
+
+@bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """SSE: a "status" event on every change, then "done" (or "error") with the job."""
+    if not get_job(job_id):
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        last, idle_since = None, time.monotonic()
+        while True:
+            job = get_job(job_id)
+            # Don't hold a pooled connection between polls
+            db.close()
+            if job is None:
+                yield sse_event({"error": "Job expired"}, "error")
+                return
+            if job.status in ("done", "failed"):
+                yield sse_event(job.to_dict(), "done" if job.status == "done" else "error")
+                return
+            if job.status != last:
+                last, idle_since = job.status, time.monotonic()
+                yield sse_event({"status": job.status, "attempts": job.attempts}, "status")
+            elif time.monotonic() - idle_since > 15:
+                # Comment line: keeps proxies from timing out and notices a gone client
+                idle_since = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(JOB_POLL_INTERVAL)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@bp.route('/save-career', methods=['POST'])
 def save_career():
     try:
         data = request.get_json()
@@ -476,26 +765,239 @@ def save_career():
         if not email or not title:
             return jsonify({'error': 'Missing required fields'}), 400
 
-        user = User.get_or_none(User.email == email)
-        if not user:
+        user_id = User.select(User.id).where(User.email == email).scalar()
+        if not user_id:
             return jsonify({'error': 'User not found'}), 404
 
-        user.career_title = title
-        user.career_description = description
-        user.career_steps = json.dumps(steps)
-        user.career_pitfalls = json.dumps(pitfalls)
-        user.career_resources = json.dumps(resources)
-        user.save()
+        career = save_career_plan(user_id, title, description, steps, pitfalls, resources)
+        invalidate_user(email=email)
 
-        return jsonify({'message': 'Career updated successfully'}), 200
+        return jsonify({'message': 'Career updated successfully', 'id': career.id}), 200
 
     except Exception as e:
         print("Error in /save-career:", e)
         return jsonify({'error': 'Failed to save career', 'details': str(e)}), 500
 
 
+@bp.route('/ai-cache-stats', methods=['GET'])
+@ops_only
+def ai_cache_stats():
+    return jsonify(cache_stats()), 200
+
+
+@bp.route('/ai-usage', methods=['GET'])
+@ops_only
+def ai_usage():
+    """Token usage per AI profile and model over the last ?days= days (default 7)."""
+    try:
+        days = max(1, min(int(request.args.get('days', 7)), 90))
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+    return jsonify({"days": days, "usage": usage_summary(days)}), 200
+
+
+@bp.route('/metrics', methods=['GET'])
+@ops_only
+def metrics():
+    """Prometheus scrape endpoint."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+@bp.route('/saved-careers', methods=['GET'])
+def saved_careers():
+    try:
+        email = request.args.get('email')
+        if not email:
+            return jsonify({'error': 'Email is required'}), 400
+
+        user_id = User.select(User.id).where(User.email == email).scalar()
+        if not user_id:
+            return jsonify({'error': 'User not found'}), 404
+
+        return jsonify({'careers': list_saved_careers(user_id)}), 200
+
+    except Exception as e:
+        print("Error in /saved-careers:", e)
+        return jsonify({'error': 'Failed to fetch saved careers', 'details': str(e)}), 500
+
+
+@bp.route('/career-plan.pdf', methods=['GET'])
+def career_plan_pdf():
+    """The user's current saved career (or ?id=) as a PDF, rendered once per plan version."""
+    try:
+        email = request.args.get('email')
+        if not email:
+            return jsonify({'error': 'Email is required'}), 400
+        career_id = request.args.get('id', type=int)
+
+        user_id = User.select(User.id).where(User.email == email).scalar()
+        if not user_id:
+            return jsonify({'error': 'User not found'}), 404
+
+        career = get_current_career(user_id, career_id)
+        if not career:
+            return jsonify({'error': 'No saved career found'}), 404
+
+        plan = plan_data(career)
+        # Same plan, same file: answer revalidations before touching the disk or the pool
+        digest = plan_hash(plan)
+        if request.if_none_match.contains(digest):
+            response = Response(status=304)
+            response.set_etag(digest)
+            return response
+
+        path, digest = get_plan_pdf(plan)
+        # conditional=True handles If-None-Match/If-Range and Range (206) requests
+        response = send_file(path, mimetype="application/pdf", conditional=True, etag=digest,
+                             download_name=f"career-plan-{career['id']}.pdf", max_age=0)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    except RenderOverloaded:
+        response = jsonify({"error": "Server busy, please retry shortly"})
+        response.headers["Retry-After"] = str(PDF_RENDER_RETRY_AFTER)
+        return response, 503
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': 'Failed to build career plan PDF', 'details': str(e)}), 500
+
+
+# ---------- Q&A Forum ----------
+def forum_post(data):
+    """(user_id, text, None) from a post body, or (None, None, error response)."""
+    email = data.get("email")
+    text = (data.get("text") or "").strip()
+    if not email or not text:
+        return None, None, (jsonify({"error": "Email and text are required"}), 400)
+    if len(text) > MAX_TEXT_LENGTH:
+        return None, None, (jsonify({"error": f"Text is limited to {MAX_TEXT_LENGTH} characters"}), 400)
+    user_id = User.select(User.id).where(User.email == email).scalar()
+    if not user_id:
+        return None, None, (jsonify({"error": "User not found"}), 404)
+    return user_id, text, None
+
+
+@bp.route('/questions', methods=['POST'])
+def create_question():
+    try:
+        user_id, text, error = forum_post(request.get_json() or {})
+        if error:
+            return error
+        question = ask_question(user_id, text)
+        return jsonify({"id": question.id, "message": "Question posted"}), 201
+    except Exception as e:
+        print("Error in POST /questions:", e)
+        return jsonify({"error": "Failed to post question", "details": str(e)}), 500
+
+
+@bp.route('/questions/<int:question_id>/answers', methods=['POST'])
+def create_answer(question_id):
+    try:
+        user_id, text, error = forum_post(request.get_json() or {})
+        if error:
+            return error
+        posted = post_answer(question_id, user_id, text)
+        if not posted:
+            return jsonify({"error": "Question not found"}), 404
+        return jsonify({"id": posted.id, "message": "Answer posted"}), 201
+    except Exception as e:
+        print("Error in POST /questions/<id>/answers:", e)
+        return jsonify({"error": "Failed to post answer", "details": str(e)}), 500
+
+
+@bp.route('/questions', methods=['GET'])
+@conditional("question", "user")
+def questions():
+    """Newest questions with answer counts and their latest answers (?answers=, default 3)."""
+    try:
+        _, cursor, limit = page_params(request.args)
+        per_question = max(0, min(int(request.args.get("answers", 3)), 10))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor, limit or answers"}), 400
+
+    try:
+        items, next_cursor = question_feed(cursor, limit, per_question)
+        return jsonify({"items": items, "next_cursor": next_cursor}), 200
+    except Exception as e:
+        print("Error in /questions:", e)
+        return jsonify({"error": "Failed to fetch questions", "details": str(e)}), 500
+
+
+@bp.route('/questions/<int:question_id>', methods=['GET'])
+def question_thread(question_id):
+    """A question and one page of its answers, oldest first."""
+    try:
+        _, cursor, limit = page_params(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+
+    try:
+        question = get_question(question_id)
+        if not question:
+            return jsonify({"error": "Question not found"}), 404
+
+        # Every answer moves answer_count/last_answer_at, so the question row is
+        # the thread's version; user covers renamed authors
+        user_version = table_versions("user").get("user", (0, None))[0]
+        etag = make_etag(question["answer_count"], question["last_answer_at"], user_version)
+        last_modified = question["last_answer_at"] or question["created_at"]
+        if not_modified(etag, last_modified):
+            return cache_headers(Response(status=304), etag, last_modified)
+
+        answers, next_cursor = thread_answers(question_id, cursor, limit)
+        response = jsonify({"question": question_dict(question), "answers": answers,
+                            "next_cursor": next_cursor})
+        return cache_headers(response, etag, last_modified), 200
+    except Exception as e:
+        print("Error in /questions/<id>:", e)
+        return jsonify({"error": "Failed to fetch question", "details": str(e)}), 500
+
+
+# ---------- Bulk Import / Export ----------
+@bp.route('/admin/import/<kind>', methods=['POST'])
+def bulk_import(kind):
+    """Admin only: upsert careers, stories or users from an NDJSON (default) or CSV body."""
+    if kind not in BULK_KINDS:
+        return jsonify({"error": f"Unknown kind, expected one of: {', '.join(sorted(BULK_KINDS))}"}), 404
+    fmt = request.args.get("format") or ("csv" if request.mimetype == "text/csv" else "ndjson")
+    if fmt not in BULK_FORMATS:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    try:
+        if not admin_from_auth():
+            return jsonify({"error": "Admin credentials required"}), 403
+        lines = io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline="")
+        return jsonify(import_rows(kind, read_rows(lines, fmt))), 200
+    except HashingOverloaded:
+        return hashing_busy()
+    except Exception as e:
+        print("Error in /admin/import:", e)
+        return jsonify({"error": "Import failed", "details": str(e)}), 500
+
+
+@bp.route('/admin/export/<kind>', methods=['GET'])
+def bulk_export(kind):
+    """Admin only: stream a table as NDJSON (default) or CSV. Password hashes stay out."""
+    if kind not in BULK_KINDS:
+        return jsonify({"error": f"Unknown kind, expected one of: {', '.join(sorted(BULK_KINDS))}"}), 404
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in BULK_FORMATS:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    try:
+        if not admin_from_auth():
+            return jsonify({"error": "Admin credentials required"}), 403
+    except HashingOverloaded:
+        return hashing_busy()
+
+    return Response(stream_with_context(export_lines(kind, fmt)),
+                    mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+                    headers={"Content-Disposition": f'attachment; filename="{kind}.{fmt}"'})
+
+
 # ---------- Test ----------
-@app.route('/test-tables')
+@bp.route('/test-tables')
 def test_tables():
     try:
         FailCourse.select().first()
@@ -507,27 +1009,24 @@ def test_tables():
         return jsonify({"error": str(e)}), 500
 
 
-# ---------- Admin Bootstrap ----------
-def ensure_admin_exists():
-    try:
-        if not User.select().where(User.email == "admin@failed.com").exists():
-            User.create_user({
-                "name": "Admin",
-                "email": "admin@failed.com",
-                "password": "admin123",
-                "role": "admin",
-                "bio": "Platform administrator"
-            })
-    except Exception as e:
-        print("Admin creation failed:", e)
+# ---------- App Factory ----------
+def create_app():
+    """Build the Flask app; no database or network access happens here."""
+    started = time.perf_counter()
+    app = Flask(__name__)
+    CORS(app, origins=["https://frontend1-eight-liart.vercel.app"])  # Add your frontend domain here
+    app.register_blueprint(bp)
+    record_startup(started - _import_started, time.perf_counter() - started)
+    return app
+
 
-ensure_admin_exists()
+app = create_app()
 
 # ---------- Run ----------
 if __name__ == '__main__':
-    if db.is_closed():
-        db.connect()
-    db.create_tables([User], safe=True)
-    seed_default_user()
-    app.run(debug=True)
+    from utils.bootstrap import bootstrap, seed_default_user
 
+    bootstrap()
+    with db.connection_context():
+        seed_default_user()
+    app.run(debug=True)
@@ -0,0 +1,372 @@
+"""Async (aiohttp) app for the AI-bound routes.
+
+Each route here spends most of its time waiting on OpenRouter, so they run on one
+event loop per worker instead of holding a sync Flask thread per request. The
+DB-backed routes stay in app.py; route the AI paths to this app at the proxy.
+
+    gunicorn async_app:app --worker-class aiohttp.GunicornWebWorker
+"""
+import asyncio
+import functools
+import json
+import os
+import traceback
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()  # before utils.* read their settings from the environment
+
+from utils.db import db
+from utils.ai_cache import cache_ttl_for
+from utils.ai_profiles import profile_for
+from utils.ai_async import (
+    async_get_ai_guidance, async_stream_ai_guidance, close_client
+)
+from utils.prompts import (
+    TEST_PROMPT, quote_prompt, career_details_prompt, career_ideas_prompt, parse_career_ideas,
+    is_valid_career, is_valid_career_details
+)
+from utils.json_stream import aiter_json_array
+from utils.career_catalog import find_career, career_result
+from utils.story_bank import get_bank_stories, StoryBankEmpty
+from utils.metrics import start_request, finish_request, render_metrics, metrics_token_ok
+from utils.rate_limit import admit, resolve_client_ip, AIBusy
+
+ALLOWED_ORIGINS = {"https://frontend1-eight-liart.vercel.app"}
+
+
+# === Helpers ===
+async def read_json(request):
+    if not request.can_read_body:
+        return {}
+    try:
+        data = await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def ai_cache_options(request, endpoint):
+    fresh = (
+        request.query.get("fresh") == "1"
+        or "no-cache" in request.headers.get("Cache-Control", "")
+    )
+    return {"cache_ttl": cache_ttl_for(endpoint), "use_cache": not fresh,
+            "profile": profile_for(endpoint)}
+
+
+def too_many_requests(retry_after, message="Too many requests, please slow down"):
+    return web.json_response({"error": message, "retry_after": retry_after}, status=429,
+                             headers={"Retry-After": str(retry_after)})
+
+
+def ai_busy(e):
+    """Every upstream AI slot is taken and the wait queue is full (or timed out)."""
+    return too_many_requests(e.retry_after, "AI service busy, please retry shortly")
+
+
+async def check_rate_limit(request, scope):
+    """None if this request may go ahead, else a 429 response to return."""
+    ip = resolve_client_ip(request.remote, request.headers.get("X-Forwarded-For"))
+    retry_after = await asyncio.to_thread(admit, scope, ip)
+    return too_many_requests(retry_after) if retry_after else None
+
+
+def rate_limited(scope):
+    """Handler decorator: 429 once the client's token bucket for scope is empty."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            return await check_rate_limit(request, scope) or await handler(request)
+        return wrapper
+    return decorator
+
+
+def wants_stream(request):
+    return (
+        request.query.get("stream") == "1"
+        or "text/event-stream" in request.headers.get("Accept", "")
+    )
+
+
+def wants_ndjson(request):
+    return (
+        request.query.get("stream") == "1"
+        or "application/x-ndjson" in request.headers.get("Accept", "")
+    )
+
+
+async def ndjson_response(request, items):
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/x-ndjson",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    await response.prepare(request)
+    try:
+        async for item in items:
+            await response.write((json.dumps(item) + "\n").encode())
+    except (ConnectionResetError, asyncio.CancelledError):
+        raise
+    except AIBusy as e:
+        busy = {"error": "AI service busy", "retry_after": e.retry_after}
+        await response.write((json.dumps(busy) + "\n").encode())
+    except Exception as e:
+        traceback.print_exc()
+        await response.write((json.dumps({"error": "AI stream failed", "details": str(e)}) + "\n").encode())
+    finally:
+        await items.aclose()
+    return response
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode()
+
+
+async def sse_response(request, chunks, meta=None, result=None):
+    """Async twin of app.sse_response; result is awaited with the full text."""
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    await response.prepare(request)
+    try:
+        if meta:
+            await response.write(sse_event(meta, "meta"))
+        parts = []
+        async for chunk in chunks:
+            if result:
+                parts.append(chunk)
+                await response.write(b": generating\n\n")
+            else:
+                await response.write(sse_event({"delta": chunk}))
+        done = await result("".join(parts)) if result else {}
+        await response.write(sse_event(done, "done"))
+    except (ConnectionResetError, asyncio.CancelledError):
+        raise  # client went away; aclose() below drops the upstream stream
+    except AIBusy as e:
+        busy = {"error": "AI service busy", "retry_after": e.retry_after}
+        await response.write(sse_event(busy, "error"))
+    except Exception as e:
+        traceback.print_exc()
+        await response.write(sse_event({"error": "AI stream failed", "details": str(e)}, "error"))
+    finally:
+        await chunks.aclose()
+    return response
+
+
+def _with_db(fn, *args):
+    with db.connection_context():
+        return fn(*args)
+
+
+async def run_db(fn, *args):
+    """Run blocking peewee work on a thread with its own pooled connection."""
+    return await asyncio.to_thread(_with_db, fn, *args)
+
+
+# === Routes ===
+routes = web.RouteTableDef()
+
+
+@routes.get('/test-ai')
+@rate_limited("ai")
+async def test_ai(request):
+    quote = await async_get_ai_guidance(TEST_PROMPT, expect_json=False,
+                                        **ai_cache_options(request, "test-ai"))
+    return web.json_response({'quote': quote})
+
+
+@routes.post('/ai-quote')
+@rate_limited("ai")
+async def ai_quote(request):
+    try:
+        data = await read_json(request)
+        prompt = quote_prompt(data.get("topic", "failure"))
+        options = ai_cache_options(request, "ai-quote")
+        if wants_stream(request):
+            return await sse_response(request, await async_stream_ai_guidance(prompt, **options))
+        quote = await async_get_ai_guidance(prompt, expect_json=False, **options)
+        return web.json_response({"quote": quote})
+    except AIBusy as e:
+        return ai_busy(e)
+    except Exception as e:
+        traceback.print_exc()
+        return web.json_response({"error": "AI quote failed", "details": str(e)}, status=500)
+
+
+@routes.post('/ai-guidance')
+@rate_limited("ai")
+async def ai_guidance(request):
+    data = await read_json(request)
+    text = data.get('text')
+    if not text:
+        return web.json_response({'error': 'Input text is required'}, status=400)
+
+    options = ai_cache_options(request, "ai-guidance")
+    if wants_stream(request):
+        return await sse_response(request, await async_stream_ai_guidance(text, **options))
+    result = await async_get_ai_guidance(text, **options)
+    return web.json_response({'result': result})
+
+
+@routes.post('/ai-guide')
+@rate_limited("ai")
+async def ai_guide(request):
+    data = await read_json(request)
+    prompt = data.get('prompt') or data.get('text')
+    if not prompt:
+        return web.json_response({'error': 'Prompt is required'}, status=400)
+
+    options = ai_cache_options(request, "ai-guide")
+    if wants_stream(request):
+        return await sse_response(request, await async_stream_ai_guidance(prompt, **options))
+    result = await async_get_ai_guidance(prompt, expect_json=False, **options)
+    return web.json_response({'answer': result})
+
+
+@routes.post('/ai-careers')
+@rate_limited("ai")
+async def ai_careers(request):
+    try:
+        data = await read_json(request)
+        keyword = data.get("keyword") or "technology"
+        prompt = career_ideas_prompt(keyword)
+        options = ai_cache_options(request, "ai-careers")
+        if wants_ndjson(request):
+            careers = aiter_json_array(await async_stream_ai_guidance(prompt, **options),
+                                       validate=is_valid_career)
+            return await ndjson_response(request, careers)
+        response = await async_get_ai_guidance(prompt, expect_json=False, **options)
+        return web.json_response({"careers": parse_career_ideas(response)})
+    except AIBusy as e:
+        return ai_busy(e)
+    except Exception as e:
+        print("AI Error:", e)
+        return web.json_response({"error": "AI suggestion failed", "details": str(e)}, status=500)
+
+
+@routes.get('/ai-stories')
+async def ai_stories(request):
+    try:
+        stories = await run_db(get_bank_stories, 10, request.query.get("fresh") == "1")
+        return web.json_response({"stories": stories})
+    except StoryBankEmpty as e:
+        return web.json_response({"error": str(e), "retry_after": e.retry_after}, status=503,
+                                 headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        return web.json_response({"error": "Failed to fetch stories", "details": str(e)}, status=500)
+
+
+@routes.post('/career-details')
+async def career_details(request):
+    try:
+        data = await read_json(request)
+        title = data.get("title")
+        if not title:
+            return web.json_response({"error": "Career title is required"}, status=400)
+
+        career = await run_db(find_career, title)
+        if career:
+            return web.json_response(career.to_dict())
+
+        # Unknown career: generate it once and keep it in the catalog
+        limited = await check_rate_limit(request, "ai")
+        if limited:
+            return limited
+        prompt = career_details_prompt(title)
+        options = ai_cache_options(request, "career-details")
+        if wants_stream(request):
+            # The reply is a JSON object, so send the parsed career at the end
+            # rather than its fragments
+            chunks = await async_stream_ai_guidance(prompt, validate=is_valid_career_details, **options)
+            return await sse_response(request, chunks, meta={"title": title},
+                                      result=lambda text: run_db(career_result, title, text))
+        ai_result = await async_get_ai_guidance(prompt, expect_json=False,
+                                                validate=is_valid_career_details, **options)
+        return web.json_response(await run_db(career_result, title, ai_result))
+    except AIBusy as e:
+        return ai_busy(e)
+    except Exception as e:
+        print("Error in /career-details:", e)
+        return web.json_response({"error": "Failed to fetch career detail", "details": str(e)},
+                                 status=500)
+
+
+@routes.get('/metrics')
+async def metrics(request):
+    """Prometheus scrape endpoint; needs METRICS_TOKEN as a bearer token."""
+    if not metrics_token_ok(request.headers.get("Authorization")):
+        return web.json_response({"error": "Metrics token required"}, status=403)
+    body, content_type = render_metrics()
+    return web.Response(body=body, headers={"Content-Type": content_type})
+
+
+# === Metrics ===
+@web.middleware
+async def metrics_middleware(request, handler):
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource else "unmatched"
+    stats = start_request(request.method, route)
+    status = 500
+    try:
+        # Handlers write streamed bodies before returning, so this times the whole response
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        finish_request(stats, status)
+
+
+# === Admission ===
+@web.middleware
+async def ai_busy_middleware(request, handler):
+    # Routes without their own try block; the others return ai_busy() themselves
+    try:
+        return await handler(request)
+    except AIBusy as e:
+        return ai_busy(e)
+
+
+# === CORS ===
+@web.middleware
+async def preflight_middleware(request, handler):
+    if request.method == "OPTIONS":
+        return web.Response(status=204, headers={
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": request.headers.get(
+                "Access-Control-Request-Headers", "Content-Type")
+        })
+    return await handler(request)
+
+
+async def _add_cors_headers(request, response):
+    # Runs before headers are sent, so streamed (SSE) responses get them too
+    origin = request.headers.get("Origin")
+    if origin in ALLOWED_ORIGINS:
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Vary"] = "Origin"
+
+
+async def _on_cleanup(app):
+    await close_client()
+
+
+def create_async_app():
+    app = web.Application(middlewares=[metrics_middleware, preflight_middleware, ai_busy_middleware])
+    app.add_routes(routes)
+    app.on_response_prepare.append(_add_cors_headers)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    web.run_app(app, port=int(os.getenv("ASYNC_PORT", "8001")))
@@ -0,0 +1,118 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Answers in the shape each AI profile expects (plain text, a career list, one
+career object, a story list), with configurable latency, token rate and error
+rate, and supports stream: true. Point the backend at it with:
+
+    python -m bench.fake_openrouter --port 8999 --latency 0.4 --tokens-per-sec 80
+    OPENROUTER_URL=http://127.0.0.1:8999/api/v1/chat/completions OPENROUTER_API_KEY=bench gunicorn app:app
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+STORY_WORDS = ("failed the exam twice, took a job at a small shop, learned bookkeeping at night, "
+               "started helping neighbours with their accounts, and slowly built a firm that now "
+               "employs forty people across three towns while mentoring students who struggle").split()
+
+
+def _story(i):
+    return {
+        "title": f"From setback to success {i}",
+        "story": " ".join(STORY_WORDS * 3),
+        "tags": ["business", "resilience"]
+    }
+
+
+def _career(i):
+    return {
+        "title": f"Generated Career {i}",
+        "description": "A practical path that rewards steady practice.",
+        "steps": ["Learn the basics online", "Build two small projects", "Find a mentor"],
+        "pitfalls": ["Skipping fundamentals", "Working alone"],
+        "resources": ["freeCodeCamp", "Coursera audit courses"]
+    }
+
+
+def reply_for(payload, reply_words):
+    """Pick a reply matching what the calling profile's system prompt asks for."""
+    system = " ".join(m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "system")
+    if "title, story and tags" in system:
+        return json.dumps([_story(i) for i in range(10)])
+    if "keys title, description" in system:
+        return json.dumps([_career(i) for i in range(6)])
+    if "JSON object" in system:
+        career = _career(0)
+        del career["title"]
+        return json.dumps(career)
+    return " ".join(["Every failure is a lesson that moves you forward."] * max(1, reply_words // 9))
+
+
+def _usage(payload, content):
+    prompt_words = sum(len(m.get("content", "").split()) for m in payload.get("messages", []))
+    return {"prompt_tokens": prompt_words, "completion_tokens": len(content.split()),
+            "total_tokens": prompt_words + len(content.split())}
+
+
+def _chunks(content, size=4):
+    words = content.split(" ")
+    for i in range(0, len(words), size):
+        yield " ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+
+
+def make_app(latency, tokens_per_sec, error_rate, reply_words):
+    async def completions(request):
+        payload = await request.json()
+        await asyncio.sleep(latency)
+
+        if random.random() < error_rate:
+            status = random.choice([429, 503])
+            return web.json_response({"error": {"message": "fake upstream error"}}, status=status,
+                                     headers={"Retry-After": "1"} if status == 429 else None)
+
+        content = reply_for(payload, reply_words)
+        model = payload.get("model", "fake/model")
+
+        if not payload.get("stream"):
+            await asyncio.sleep(len(content.split()) / tokens_per_sec)
+            return web.json_response({
+                "model": model,
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": _usage(payload, content)
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": OPENROUTER PROCESSING\n\n")
+        for chunk in _chunks(content):
+            await asyncio.sleep(len(chunk.split()) / tokens_per_sec)
+            event = {"model": model, "choices": [{"delta": {"content": chunk}}]}
+            await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            event = {"model": model, "choices": [], "usage": _usage(payload, content)}
+            await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/v1/chat/completions", completions)
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.4, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered 429/503")
+    parser.add_argument("--reply-words", type=int, default=60, help="length of plain-text replies")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    web.run_app(make_app(args.latency, args.tokens_per_sec, args.error_rate, args.reply_words),
+                host=args.host, port=args.port)
@@ -0,0 +1,280 @@
+"""Load driver: hits every app.py route at each concurrency level and saves the numbers.
+
+    python -m bench.load --base-url http://127.0.0.1:5000 --concurrency 1,8,32 --requests 200 \
+        --db bench/data/failed.db --label baseline
+    python -m bench.load --compare bench/results/a.json bench/results/b.json
+
+Reports p50/p95/p99 latency and requests/second per route and level. With
+--db, each route is also run once in-process against a temp copy of that
+database to count the SQL statements it sends. Results go to
+bench/results/<timestamp>[-label].json.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from bench.seed_db import BENCH_EMAIL, BENCH_PASSWORD, FIELDS, TAGS, saved_users
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# (name, method, path, json body). Placeholders: {email} a seeded user, {saved_email}
+# one with a saved career, {n} unique per request, {career} a seeded catalog title,
+# {tag} a seeded tag, {cursor} a story id, {question} a question id
+SCENARIOS = [
+    ("home", "GET", "/", None),
+    ("register", "POST", "/register",
+     {"name": "Load {n}", "email": "load-{n}@bench.test", "password": BENCH_PASSWORD}),
+    ("login", "POST", "/login", {"email": "{email}", "password": BENCH_PASSWORD}),
+    ("me", "GET", "/me?email={email}", None),
+    ("profile", "GET", "/profile?email={email}", None),
+    ("profile-update", "PUT", "/profile", {"email": "{email}", "bio": "Updated {n}"}),
+    ("update-career", "POST", "/update-career", {"email": "{email}", "career": "Design {n}"}),
+    ("stories", "GET", "/stories", None),
+    ("stories-page", "GET", "/stories?limit=20&cursor={cursor}", None),
+    ("stories-tag", "GET", "/stories?limit=20&tag={tag}", None),
+    ("user-stories", "GET", "/user-stories?email={email}&limit=20", None),
+    ("career-paths", "GET", "/career-paths?limit=20&cursor={cursor}", None),
+    ("career-options", "GET", "/career-options", None),
+    ("career-details-hit", "POST", "/career-details", {"title": "{career}"}),
+    ("career-details-miss", "POST", "/career-details", {"title": "Bench Career {n}"}),
+    ("career-regenerate", "POST", "/career-details/regenerate",
+     {"title": "{career}", "email": "admin@failed.com", "password": "admin123"}),
+    ("career-search", "GET", "/career-search?q={tag}", None),
+    ("search", "GET", "/search?q={tag}&type=all", None),
+    ("save-career", "POST", "/save-career",
+     {"email": "{email}", "title": "{career}", "description": "Saved {n}",
+      "steps": ["one", "two"], "pitfalls": ["three"], "resources": ["four"]}),
+    ("saved-careers", "GET", "/saved-careers?email={email}", None),
+    ("career-plan-pdf", "GET", "/career-plan.pdf?email={saved_email}", None),
+    ("questions", "GET", "/questions?limit=20", None),
+    ("questions-page", "GET", "/questions?limit=20&cursor={question}", None),
+    ("question-thread", "GET", "/questions/{question}?limit=20", None),
+    ("ask-question", "POST", "/questions", {"email": "{email}", "text": "What now after failing {n}?"}),
+    ("answer-question", "POST", "/questions/{question}/answers",
+     {"email": "{email}", "text": "Keep going, {n}."}),
+    ("test-ai", "GET", "/test-ai", None),
+    ("ai-quote", "POST", "/ai-quote", {"topic": "failure {n}"}),
+    ("ai-quote-stream", "POST", "/ai-quote?stream=1", {"topic": "failure {n}"}),
+    ("ai-guidance", "POST", "/ai-guidance", {"text": "How do I restart after failing {n}?"}),
+    ("ai-guide", "POST", "/ai-guide", {"prompt": "Plan my week {n}"}),
+    ("ai-careers", "POST", "/ai-careers", {"keyword": "keyword {n}"}),
+    ("ai-careers-ndjson", "POST", "/ai-careers?stream=1", {"keyword": "keyword {n}"}),
+    ("ai-stories", "GET", "/ai-stories", None),
+    ("ai-cache-stats", "GET", "/ai-cache-stats", None),
+    ("ai-usage", "GET", "/ai-usage", None),
+    ("test-tables", "GET", "/test-tables", None),
+]
+
+
+class Inputs:
+    """Fills scenario placeholders from the seeded data's known shape."""
+
+    def __init__(self, users, stories, careers, saved, questions, seed):
+        self.users, self.stories, self.careers = users, stories, careers
+        self.questions = questions
+        self.saved = max(1, saved_users(users, saved))
+        self.rng = random.Random(seed)
+        self.counter = itertools.count()
+        self.run_id = datetime.datetime.now().strftime("%H%M%S")
+
+    def values(self):
+        i = self.rng.randrange(self.careers)
+        return {
+            "email": BENCH_EMAIL.format(self.rng.randrange(self.users)),
+            "saved_email": BENCH_EMAIL.format(self.rng.randrange(self.saved)),
+            "n": f"{self.run_id}-{next(self.counter)}",
+            "career": f"{FIELDS[i % len(FIELDS)]} {i // len(FIELDS) + 1}",
+            "tag": self.rng.choice(TAGS),
+            "cursor": self.rng.randrange(1, max(2, self.stories)),
+            "question": self.rng.randrange(1, max(2, self.questions + 1)),
+        }
+
+    def fill(self, template, values=None):
+        values = values or self.values()
+        if isinstance(template, str):
+            return template.format(**values)
+        if isinstance(template, dict):
+            return {k: self.fill(v, values) for k, v in template.items()}
+        if isinstance(template, list):
+            return [self.fill(v, values) for v in template]
+        return template
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1  # nearest-rank
+    return sorted_values[max(0, rank)]
+
+
+async def run_scenario(session, base_url, scenario, concurrency, total, inputs):
+    name, method, path, body = scenario
+    latencies = []
+    errors = 0
+    statuses = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            values = inputs.values()
+            url = base_url + inputs.fill(path, values)
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, json=inputs.fill(body, values)) as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = "error"
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == "error" or status >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "route": name,
+        "method": method,
+        "path": path,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(total / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+def count_queries(db_path, scenarios, inputs, headers=None):
+    """Run each scenario once in-process on a copy of db_path; returns {name: statements}."""
+    workdir = tempfile.mkdtemp()
+    shutil.copy(db_path, os.path.join(workdir, "failed.db"))
+    os.environ["DB_PATH"] = os.path.join(workdir, "failed.db")
+    os.environ["AI_CACHE_PATH"] = os.path.join(workdir, "ai_cache.db")
+    try:
+        from app import create_app
+        from utils.bootstrap import bootstrap
+        from utils.db import capture_queries
+
+        bootstrap()
+        client = create_app().test_client()
+        counts = {}
+        for name, method, path, body in scenarios:
+            values = inputs.values()
+            with capture_queries() as queries:
+                client.open(inputs.fill(path, values), method=method, headers=headers,
+                            json=inputs.fill(body, values)).get_data()
+            counts[name] = len(queries)
+        return counts
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, scenarios, inputs, headers=None):
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=max(args.concurrency))
+    results = []
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector, headers=headers) as session:
+        for concurrency in args.concurrency:
+            for scenario in scenarios:
+                result = await run_scenario(session, args.base_url.rstrip("/"), scenario,
+                                            concurrency, args.requests, inputs)
+                results.append(result)
+                print(f"{result['route']:<22} c={concurrency:<4} {result['rps']:>8} req/s  "
+                      f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                      f"p99 {result['p99_ms']:>8} ms  errors {result['errors']}")
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r["route"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'route':<22} {'conc':>4}  {'p95 old':>9} {'p95 new':>9} {'change':>8}  {'rps old':>8} {'rps new':>8}")
+    for r in new:
+        before = old.get((r["route"], r["concurrency"]))
+        if not before:
+            continue
+        change = ((r["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100) if before["p95_ms"] else 0
+        print(f"{r['route']:<22} {r['concurrency']:>4}  {before['p95_ms']:>9} {r['p95_ms']:>9} "
+              f"{change:>+7.1f}%  {before['rps']:>8} {r['rps']:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda v: [int(c) for c in v.split(",")])
+    parser.add_argument("--requests", type=int, default=100, help="per route and concurrency level")
+    parser.add_argument("--routes", default="", help="comma separated scenario names (default: all)")
+    parser.add_argument("--db", help="seeded failed.db to count per-route queries against")
+    parser.add_argument("--users", type=int, default=1000, help="as passed to bench.seed_db")
+    parser.add_argument("--stories", type=int, default=5000)
+    parser.add_argument("--careers", type=int, default=300)
+    parser.add_argument("--saved", type=float, default=0.2)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN"),
+                        help="sent as a bearer token, for /metrics, /ai-usage and /ai-cache-stats")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    wanted = {r for r in args.routes.split(",") if r}
+    scenarios = [s for s in SCENARIOS if not wanted or s[0] in wanted]
+    inputs = Inputs(args.users, args.stories, args.careers, args.saved, args.questions, args.seed)
+
+    headers = {"Authorization": f"Bearer {args.metrics_token}"} if args.metrics_token else None
+    query_counts = count_queries(args.db, scenarios, inputs, headers) if args.db else {}
+    started_at = datetime.datetime.now()
+    results = asyncio.run(run(args, scenarios, inputs, headers))
+    for result in results:
+        result["db_queries"] = query_counts.get(result["route"])
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    name = started_at.strftime("%Y%m%d-%H%M%S") + (f"-{args.label}" if args.label else "")
+    out = os.path.join(RESULTS_DIR, name + ".json")
+    with open(out, "w") as f:
+        json.dump({
+            "label": args.label,
+            "started_at": started_at.isoformat(),
+            "git_commit": git_commit(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "results": results,
+        }, f, indent=2)
+    print(f"✅ Saved {out}")
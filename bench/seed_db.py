@@ -0,0 +1,146 @@
+"""Build a seeded failed.db for benchmarks.
+
+    python -m bench.seed_db --out bench/data/failed.db --users 1000 --stories 5000 --careers 300 \
+        --questions 500 --answers 5000
+
+Every seeded user is user<N>@bench.test with password BENCH_PASSWORD, which
+is what bench.load logs in with. The same --seed gives the same database.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_PASSWORD = "bench-password"
+BENCH_EMAIL = "user{}@bench.test"
+CHUNK = 500
+
+FIELDS = ["Data Science", "Web Development", "Graphic Design", "Nursing", "Accounting",
+          "Digital Marketing", "Electrician", "Teaching", "Photography", "Cyber Security",
+          "Content Writing", "Civil Services", "Cooking", "Mobile Apps", "Sales"]
+TAGS = ["exam", "upsc", "business", "startup", "college", "career", "resilience", "coding",
+        "family", "health", "sports", "music"]
+WORDS = ("failed tried again learned practice mentor interview rejected started small shop online "
+         "course project savings night shift exam village city friends support confidence").split()
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def saved_users(users, saved):
+    """How many users (user0 up) get a saved career."""
+    return int(users * saved)
+
+
+def seed(users, stories, careers, saved, questions, answers, rng):
+    from utils.db import db
+    from utils.migrations import run_migrations
+    from utils.passwords import hash_password
+    from utils.saved_careers import save_career
+    from models.user import User
+    from models.failcourse import FailCourse
+    from models.careerpath import CareerPath, normalize_title
+    from models.question import Question
+    from models.answer import Answer
+
+    with db:
+        run_migrations()
+        password = hash_password(BENCH_PASSWORD)  # hashed once; every user shares it
+
+        with db.atomic():
+            rows = [{"name": f"Bench User {i}", "email": BENCH_EMAIL.format(i), "password": password,
+                     "bio": _text(rng, 12), "career": rng.choice(FIELDS), "role": "user"}
+                    for i in range(users)]
+            for i in range(0, len(rows), CHUNK):
+                User.insert_many(rows[i:i + CHUNK]).execute()
+        user_ids = [uid for (uid,) in User.select(User.id).order_by(User.id).tuples()]
+
+        with db.atomic():
+            rows = [{"user": rng.choice(user_ids), "title": f"{rng.choice(FIELDS)} story {i}",
+                     "story": _text(rng, 120), "lesson": _text(rng, 20),
+                     "tags": ", ".join(rng.sample(TAGS, 3))}
+                    for i in range(stories)]
+            for i in range(0, len(rows), CHUNK):
+                FailCourse.insert_many(rows[i:i + CHUNK]).execute()
+
+        with db.atomic():
+            rows = []
+            for i in range(careers):
+                title = f"{FIELDS[i % len(FIELDS)]} {i // len(FIELDS) + 1}"
+                rows.append({"title": title, "title_key": normalize_title(title),
+                             "description": _text(rng, 25),
+                             "steps": json.dumps([_text(rng, 6) for _ in range(5)]),
+                             "pitfalls": json.dumps([_text(rng, 6) for _ in range(3)]),
+                             "resources": json.dumps([_text(rng, 4) for _ in range(3)]),
+                             "source": "curated", "generated_at": None})
+            for i in range(0, len(rows), CHUNK):
+                CareerPath.insert_many(rows[i:i + CHUNK]).execute()
+
+        with db.atomic():
+            # The first users get them, so bench.load knows whose career plan to fetch
+            for user_id in user_ids[:saved_users(len(user_ids), saved)]:
+                save_career(user_id, rng.choice(FIELDS), _text(rng, 20),
+                            [_text(rng, 6) for _ in range(4)], [_text(rng, 6) for _ in range(2)],
+                            [_text(rng, 4) for _ in range(2)])
+
+        # Forum: answers land on random questions, a minute apart, with the
+        # denormalized answer_count/last_answer_at the app would have written
+        start = datetime.datetime.utcnow() - datetime.timedelta(minutes=questions + answers)
+        with db.atomic():
+            rows = [{"user": rng.choice(user_ids), "text": _text(rng, 15), "answer_count": 0,
+                     "created_at": start + datetime.timedelta(minutes=i), "last_answer_at": None}
+                    for i in range(questions)]
+            for i in range(0, len(rows), CHUNK):
+                Question.insert_many(rows[i:i + CHUNK]).execute()
+            question_ids = [qid for (qid,) in Question.select(Question.id).order_by(Question.id).tuples()]
+
+            rows, stats = [], {}
+            for i in range(answers if question_ids else 0):
+                question_id = rng.choice(question_ids)
+                created_at = start + datetime.timedelta(minutes=questions + i)
+                rows.append({"question": question_id, "user": rng.choice(user_ids),
+                             "text": _text(rng, 30), "created_at": created_at})
+                count, _ = stats.get(question_id, (0, None))
+                stats[question_id] = (count + 1, created_at)
+            for i in range(0, len(rows), CHUNK):
+                Answer.insert_many(rows[i:i + CHUNK]).execute()
+            for question_id, (count, last_answer_at) in stats.items():
+                (Question
+                 .update(answer_count=count, last_answer_at=last_answer_at)
+                 .where(Question.id == question_id)
+                 .execute())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=os.path.join("bench", "data", "failed.db"))
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--stories", type=int, default=5000)
+    parser.add_argument("--careers", type=int, default=300)
+    parser.add_argument("--saved", type=float, default=0.2, help="fraction of users with a saved career")
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--answers", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="replace an existing --out file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        if not args.force:
+            sys.exit(f"{args.out} exists; pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.out + suffix):
+                os.remove(args.out + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    # utils.db reads DB_PATH at import, so set it before anything imports it
+    os.environ["DB_PATH"] = os.path.abspath(args.out)
+
+    started = time.perf_counter()
+    seed(args.users, args.stories, args.careers, args.saved, args.questions, args.answers,
+         random.Random(args.seed))
+    print(f"✅ Seeded {args.out} with {args.users} users, {args.stories} stories, "
+          f"{args.careers} careers, {args.questions} questions, {args.answers} answers "
+          f"in {time.perf_counter() - started:.1f}s")
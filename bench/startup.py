@@ -0,0 +1,48 @@
+"""Cold-start timer: how long a fresh process takes to import app and build it.
+
+    python -m bench.startup --runs 10 --max-ms 800
+
+Each run is a new interpreter doing `from app import create_app; create_app()`
+(what a gunicorn worker does on boot), against a temp DB_PATH so a missing
+bootstrap shows up as an error rather than as writes to failed.db. Exits 1 when
+the median is over --max-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SNIPPET = "from app import create_app; create_app()"
+
+
+def time_startup(module_dir, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", SNIPPET], cwd=module_dir, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - started) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=0, help="fail when the median is slower")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ,
+               DB_PATH=os.path.join(workdir, "failed.db"),
+               AI_CACHE_PATH=os.path.join(workdir, "ai_cache.db"))
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+    time_startup(root, env)  # warm the OS file cache and write .pyc files
+    timings = sorted(time_startup(root, env) for _ in range(args.runs))
+    median = statistics.median(timings)
+    print(f"startup over {args.runs} runs: median {median:.0f} ms, "
+          f"min {timings[0]:.0f} ms, max {timings[-1]:.0f} ms")
+    print("DB file created on import ❌" if os.path.exists(env["DB_PATH"])
+          else "no DB access on import ✅")
+    sys.exit(1 if (args.max_ms and median > args.max_ms) or os.path.exists(env["DB_PATH"]) else 0)
@@ -0,0 +1,38 @@
+"""Gunicorn settings; picked up automatically when gunicorn starts in this directory.
+
+    gunicorn app:app
+    gunicorn async_app:app --worker-class aiohttp.GunicornWebWorker
+
+Workers share Prometheus metrics through files in PROMETHEUS_MULTIPROC_DIR, so
+/metrics on any worker reports the whole server. Two gunicorn servers on one
+host need different directories, since each clears its own at startup.
+
+Before forking workers, the master runs `python -m utils.bootstrap` (migrations,
+admin account) once. Set SKIP_BOOTSTRAP=1 when the deploy runs it separately.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Must be set before a worker imports prometheus_client (utils/metrics.py)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                      os.path.join(tempfile.gettempdir(), f"failed-metrics-{os.getenv('PORT', '8000')}"))
+
+
+def on_starting(server):
+    # Files left by a previous run would be added to this run's totals
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    # In a child process, so the master forks workers without an open SQLite
+    # connection or a password-hashing pool inherited from the bootstrap
+    if os.getenv("SKIP_BOOTSTRAP") != "1":
+        subprocess.run([sys.executable, "-m", "utils.bootstrap"], check=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,46 @@
+from peewee import *
+from utils.db import db
+import datetime
+import json
+
+# Queued AI generations, run by `python -m utils.jobs worker` (utils/jobs.py)
+
+class AIJob(Model):
+    STATUSES = ('queued', 'running', 'done', 'failed')
+
+    id = CharField(primary_key=True)          # uuid hex, handed to the client
+    kind = CharField()                        # ai-careers, ai-stories
+    dedupe_key = CharField(index=True)        # same kind + params share one job
+    params = TextField()                      # JSON string
+    status = CharField(default='queued')
+    attempts = IntegerField(default=0)
+    max_attempts = IntegerField(default=3)
+    run_after = DateTimeField(default=datetime.datetime.utcnow)
+    lease_until = DateTimeField(null=True)    # a running job whose lease lapsed is retried
+    worker = CharField(null=True)
+    result = TextField(null=True)             # JSON string
+    error = TextField(null=True)
+    webhook_url = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    finished_at = DateTimeField(null=True)
+    expires_at = DateTimeField(null=True, index=True)
+
+    class Meta:
+        database = db
+        table_name = 'ai_jobs'
+        indexes = (
+            (('status', 'run_after'), False),
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": json.loads(self.result) if self.result is not None else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None
+        }
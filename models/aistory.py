@@ -0,0 +1,22 @@
+from peewee import *
+from utils.db import db
+import datetime
+import json
+
+class AIStory(Model):
+    title = CharField(unique=True)
+    story = TextField()
+    tags = TextField(null=True)               # JSON string
+    created_at = DateTimeField(default=datetime.datetime.utcnow, index=True)
+    served_count = IntegerField(default=0)
+
+    class Meta:
+        database = db
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "story": self.story,
+            "tags": json.loads(self.tags) if self.tags else []
+        }
@@ -2,11 +2,14 @@ from peewee import *
 from utils.db import db
 from models.user import User
 from models.question import Question
+import datetime
 
 class Answer(Model):
+    # The question index also orders each thread by id (rowid), which the feed and thread pages use
     question = ForeignKeyField(Question, backref='answers')
     user = ForeignKeyField(User)
     text = TextField()
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
 
     class Meta:
         database = db
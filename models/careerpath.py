@@ -1,11 +1,46 @@
 from peewee import *
 from utils.db import db
+import json
+
+
+def normalize_title(title):
+    """Lookup key for a career title: trimmed, single-spaced, lowercase."""
+    return " ".join((title or "").split()).lower()
+
+
+def _json_or_text(value):
+    try:
+        decoded = json.loads(value)
+    except (TypeError, ValueError):
+        return value
+    return decoded if isinstance(decoded, (list, dict)) else value
+
 
 class CareerPath(Model):
     title = CharField()
-    steps = TextField()
+    title_key = CharField(null=True, unique=True)     # normalize_title(title)
+    description = TextField(null=True)
+    steps = TextField()                               # JSON list (older rows: plain text)
     pitfalls = TextField()
     resources = TextField()
+    source = CharField(null=True, default="curated")  # "curated" or "ai"
+    generated_at = DateTimeField(null=True)           # when the AI wrote it
 
     class Meta:
         database = db
+
+    def save(self, *args, **kwargs):
+        self.title_key = normalize_title(self.title)
+        return super().save(*args, **kwargs)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "steps": _json_or_text(self.steps),
+            "pitfalls": _json_or_text(self.pitfalls),
+            "resources": _json_or_text(self.resources),
+            "source": self.source,
+            "generated_at": self.generated_at.isoformat() if self.generated_at else None
+        }
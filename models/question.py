@@ -1,10 +1,14 @@
 from peewee import *
 from utils.db import db
 from models.user import User
+import datetime
 
 class Question(Model):
     user = ForeignKeyField(User, backref='questions')
     text = TextField()
+    answer_count = IntegerField(default=0)        # kept in step with answer by utils/forum.py
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    last_answer_at = DateTimeField(null=True)
 
     class Meta:
         database = db
@@ -0,0 +1,53 @@
+from peewee import *
+from utils.db import db
+from models.user import User
+import datetime
+import json
+
+class SavedCareer(Model):
+    user = ForeignKeyField(User, backref='saved_careers', on_delete='CASCADE')
+    title = CharField()
+    description = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
+
+    class Meta:
+        database = db
+        indexes = (
+            (('user', 'title'), True),
+            (('user', 'updated_at'), False),
+        )
+
+    def to_dict(self, items=None):
+        items = self.items if items is None else items
+        grouped = {kind: [] for kind in SavedCareerItem.KINDS}
+        for item in sorted(items, key=lambda i: (i.kind, i.position)):
+            grouped[item.kind].append(item.value())
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "steps": grouped["step"],
+            "pitfalls": grouped["pitfall"],
+            "resources": grouped["resource"],
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class SavedCareerItem(Model):
+    KINDS = ('step', 'pitfall', 'resource')
+
+    saved_career = ForeignKeyField(SavedCareer, backref='items', on_delete='CASCADE')
+    kind = CharField()                    # step, pitfall or resource
+    position = IntegerField()
+    text = TextField()
+    data = TextField(null=True)           # JSON string, only for non-text items
+
+    class Meta:
+        database = db
+        indexes = (
+            (('saved_career', 'kind', 'position'), True),
+        )
+
+    def value(self):
+        return json.loads(self.data) if self.data is not None else self.text
@@ -0,0 +1,39 @@
+from playhouse.sqlite_ext import FTS5Model, SearchField, RowIDField
+from utils.db import db
+
+# External-content FTS5 indexes; rows are kept in sync by triggers (utils/search.py)
+
+class CareerPathIndex(FTS5Model):
+    rowid = RowIDField()
+    title = SearchField()
+    steps = SearchField()
+    pitfalls = SearchField()
+    resources = SearchField()
+
+    class Meta:
+        database = db
+        table_name = 'careerpath_fts'
+        options = {
+            'content': 'careerpath',
+            'content_rowid': 'id',
+            'tokenize': 'porter unicode61',
+            'prefix': '2 3',
+        }
+
+
+class FailCourseIndex(FTS5Model):
+    rowid = RowIDField()
+    title = SearchField()
+    story = SearchField()
+    lesson = SearchField()
+    tags = SearchField()
+
+    class Meta:
+        database = db
+        table_name = 'failcourse_fts'
+        options = {
+            'content': 'failcourse',
+            'content_rowid': 'id',
+            'tokenize': 'porter unicode61',
+            'prefix': '2 3',
+        }
@@ -0,0 +1,14 @@
+from peewee import *
+from utils.db import db
+import datetime
+
+# One row per tracked table; triggers bump it on every write (utils/http_cache.py)
+
+class TableVersion(Model):
+    table = CharField(primary_key=True)
+    version = IntegerField(default=0)
+    changed_at = DateTimeField(default=datetime.datetime.utcnow)
+
+    class Meta:
+        database = db
+        table_name = 'table_versions'
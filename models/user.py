@@ -1,7 +1,6 @@
-from peewee import Model, CharField, TextField
+from peewee import Model, CharField, IntegerField
 from utils.db import db
-from werkzeug.security import generate_password_hash, check_password_hash
-import json
+from utils.passwords import hash_password, verify_password
 
 class User(Model):
     name = CharField()
@@ -11,22 +10,28 @@ class User(Model):
     career = CharField(null=True)
     role = CharField(default='user')
 
-    # New fields for full AI career data
-    career_title = CharField(null=True)
-    career_description = TextField(null=True)
-    career_steps = TextField(null=True)       # JSON string
-    career_pitfalls = TextField(null=True)    # JSON string
-    career_resources = TextField(null=True)   # JSON string
+    # Saved AI careers live in SavedCareer/SavedCareerItem (models/savedcareer.py)
+
+    # Bumped on every save so per-worker profile caches can detect writes
+    version = IntegerField(default=0)
 
     class Meta:
         database = db
 
+    def save(self, *args, **kwargs):
+        if self.id is not None:
+            self.version = User.version + 1
+            # Update only the changed columns, so the user_version_au trigger
+            # (utils/http_cache.py, UPDATE OF name, email) fires only on renames
+            kwargs.setdefault("only", self.dirty_fields)
+        return super().save(*args, **kwargs)
+
     @classmethod
     def create_user(cls, data):
         return cls.create(
             name=data['name'],
             email=data['email'],
-            password=generate_password_hash(data['password']),
+            password=hash_password(data['password']),
             bio=data.get('bio', ''),
             career=data.get('career', ''),
             role=data.get('role', 'user')
@@ -35,11 +40,14 @@ class User(Model):
     @classmethod
     def authenticate(cls, email, password):
         user = cls.get_or_none(cls.email == email)
-        if user and check_password_hash(user.password, password):
+        if user and verify_password(user.password, password):
             return user
         return None
 
     def to_dict(self):
+        from utils.saved_careers import get_current_career
+
+        saved = get_current_career(self.id) or {}
         return {
             "id": self.id,
             "name": self.name,
@@ -47,9 +55,9 @@ class User(Model):
             "bio": self.bio,
             "career": self.career,
             "role": self.role,
-            "career_title": self.career_title,
-            "career_description": self.career_description,
-            "career_steps": json.loads(self.career_steps) if self.career_steps else [],
-            "career_pitfalls": json.loads(self.career_pitfalls) if self.career_pitfalls else [],
-            "career_resources": json.loads(self.career_resources) if self.career_resources else []
+            "career_title": saved.get("title"),
+            "career_description": saved.get("description"),
+            "career_steps": saved.get("steps", []),
+            "career_pitfalls": saved.get("pitfalls", []),
+            "career_resources": saved.get("resources", [])
         }
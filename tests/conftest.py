@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read at import time, so every store points at a scratch dir
+# before the app or utils.* are imported
+from utils.query_plans import isolate  # noqa: E402
+
+WORKDIR = tempfile.mkdtemp(prefix="failed-tests-")
+isolate(WORKDIR)
+os.environ["PASSWORD_HASH_WORKERS"] = "0"  # hash inline; no process pool in tests
+os.environ["PASSWORD_BULK_WORKERS"] = "0"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    from utils.bootstrap import bootstrap
+
+    bootstrap()
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    """A connection for tests that use the models outside a request."""
+    from utils.db import db
+
+    with db.connection_context():
+        yield db
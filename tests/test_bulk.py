@@ -0,0 +1,117 @@
+import io
+import json
+import uuid
+
+import pytest
+
+from utils.bulk import import_rows, read_rows, export_lines, UNUSABLE_PASSWORD
+
+
+def ndjson(*rows):
+    return [row if isinstance(row, str) else json.dumps(row) for row in rows]
+
+
+@pytest.fixture
+def tag():
+    """A unique suffix, so rows from one test don't collide with another's."""
+    return uuid.uuid4().hex[:8]
+
+
+def test_careers_upsert_by_normalized_title(db, tag):
+    from models.careerpath import CareerPath, normalize_title
+
+    report = import_rows("careers", read_rows(ndjson(
+        {"title": f"Pilot {tag}", "steps": ["a"]},
+        {"title": f"  pilot {tag} ", "steps": ["b"]},   # same key, later row wins
+        {"title": f"Chef {tag}", "steps": "x | y"},
+        {"nope": 1},
+        "not json",
+    )), chunk_size=10)
+
+    assert (report["rows"], report["created"], report["duplicates"], report["failed"]) == (5, 2, 1, 2)
+    assert [e["line"] for e in report["errors"]] == [4, 5]
+    pilot = CareerPath.get(CareerPath.title_key == normalize_title(f"Pilot {tag}"))
+    assert pilot.to_dict()["steps"] == ["b"]
+
+    again = import_rows("careers", read_rows(ndjson({"title": f"PILOT {tag}", "steps": ["c"]})))
+    assert (again["created"], again["updated"]) == (0, 1)
+    assert CareerPath.get_by_id(pilot.id).to_dict()["steps"] == ["c"]
+
+
+def test_duplicates_across_chunks_update_instead(db, tag):
+    rows = ndjson(*({"title": f"Role {tag}", "steps": [str(i)]} for i in range(3)))
+    report = import_rows("careers", read_rows(rows), chunk_size=1)
+    assert (report["created"], report["updated"], report["duplicates"]) == (1, 2, 0)
+
+
+def test_users_hash_plaintext_and_keep_existing_passwords(db, tag):
+    from models.user import User
+
+    email = f"u-{tag}@example.com"
+    report = import_rows("users", read_rows(ndjson(
+        {"name": "First", "email": email, "password": "old"},
+        {"name": "Second", "email": email, "password": "s3cret"},
+        {"name": "Hashed", "email": f"h-{tag}@example.com", "password_hash": "scrypt:1$salt$hash"},
+        {"name": "None", "email": f"n-{tag}@example.com"},
+        {"name": "Bad", "email": "not-an-email"},
+        {"name": "Role", "email": f"r-{tag}@example.com", "role": "root"},
+    )))
+    assert (report["created"], report["duplicates"], report["failed"]) == (3, 1, 2)
+
+    assert User.authenticate(email, "s3cret").name == "Second"
+    assert User.authenticate(email, "old") is None
+    assert User.get(User.email == f"h-{tag}@example.com").password == "scrypt:1$salt$hash"
+    assert User.get(User.email == f"n-{tag}@example.com").password == UNUSABLE_PASSWORD
+
+    # A row without a password updates the profile and keeps the stored hash
+    import_rows("users", read_rows(ndjson({"name": "Renamed", "email": email})))
+    assert User.authenticate(email, "s3cret").name == "Renamed"
+
+
+def test_stories_need_a_known_author(db, tag):
+    from models.user import User
+
+    email = f"s-{tag}@example.com"
+    import_rows("users", read_rows(ndjson({"name": "Writer", "email": email})))
+    report = import_rows("stories", read_rows(ndjson(
+        {"email": email, "title": "Fell", "story": "v1", "tags": ["a", "b"]},
+        {"email": f"ghost-{tag}@example.com", "title": "Boo", "story": "x"},
+    )))
+    assert (report["created"], report["failed"]) == (1, 1)
+    assert "no user" in report["errors"][0]["error"]
+
+    import_rows("stories", read_rows(ndjson({"email": email, "title": "Fell", "story": "v2"})))
+    writer = User.get(User.email == email)
+    assert [s.story for s in writer.stories] == ["v2"]
+
+
+def test_csv_round_trip(db, tag):
+    title = f"Csv {tag}"
+    source = io.StringIO(f'title,steps,pitfalls\n"{title}","[""one"", ""two""]",a | b\n')
+    report = import_rows("careers", read_rows(source, "csv"))
+    assert report["created"] == 1 and not report["errors"]
+
+    exported = "".join(export_lines("careers", "csv"))
+    row = next(r for _, r in read_rows(io.StringIO(exported), "csv") if r["title"] == title)
+    assert json.loads(row["steps"]) == ["one", "two"]
+    assert json.loads(row["pitfalls"]) == ["a", "b"]
+
+
+def test_export_leaves_out_password_hashes_unless_asked(db, tag):
+    email = f"e-{tag}@example.com"
+    import_rows("users", read_rows(ndjson({"name": "E", "email": email, "password_hash": "h"})))
+
+    def exported(**kwargs):
+        rows = (json.loads(line) for line in export_lines("users", **kwargs))
+        return next(row for row in rows if row["email"] == email)
+
+    assert "password_hash" not in exported()
+    assert exported(with_passwords=True)["password_hash"] == "h"
+
+
+def test_hash_passwords_on_its_own_pool(monkeypatch):
+    from utils import passwords
+
+    monkeypatch.setattr(passwords, "PASSWORD_BULK_WORKERS", 2)
+    hashes = passwords.hash_passwords(["a", "b", "c"])
+    assert [passwords.verify_password(h, p) for h, p in zip(hashes, "abc")] == [True] * 3
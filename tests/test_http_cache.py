@@ -0,0 +1,81 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def author(db):
+    from models.user import User
+
+    email = f"{uuid.uuid4().hex}@example.com"
+    return User.create(name="Author", email=email, password="!")
+
+
+def add_story(author, title="A story"):
+    from models.failcourse import FailCourse
+
+    return FailCourse.create(user=author, title=title, story="x " * 400, lesson="y", tags="career")
+
+
+def get(client, path, etag=None, **headers):
+    if etag:
+        headers["If-None-Match"] = etag
+    response = client.get(path, headers=headers)
+    response.get_data()  # finish the streamed body, which closes its request context
+    return response
+
+
+def test_unchanged_stories_answer_304(client, author):
+    add_story(author)
+    first = get(client, "/stories?limit=5")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "max-age=" in first.headers["Cache-Control"]
+
+    again = get(client, "/stories?limit=5", etag)
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_etag_is_per_url(client, author):
+    add_story(author)
+    assert (get(client, "/stories?limit=5").headers["ETag"]
+            != get(client, "/stories?limit=6").headers["ETag"])
+
+
+def test_new_story_changes_the_etag(client, author):
+    etag = get(client, "/stories?limit=5").headers["ETag"]
+    add_story(author, "Another")
+    response = get(client, "/stories?limit=5", etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_profile_edits_keep_the_etag_but_renames_change_it(client, author):
+    etag = get(client, "/stories?limit=5").headers["ETag"]
+
+    client.put("/profile", json={"email": author.email, "bio": "New bio"})
+    client.put("/profile", json={"email": author.email, "name": "Author"})  # same name
+    assert get(client, "/stories?limit=5", etag).status_code == 304
+
+    client.put("/profile", json={"email": author.email, "name": "Renamed"})
+    assert get(client, "/stories?limit=5", etag).status_code == 200
+
+
+def test_compressed_body_gets_its_own_etag(client, author):
+    for i in range(5):
+        add_story(author, f"Long {i}")
+    response = get(client, "/stories?limit=5", **{"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    etag = response.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    again = get(client, "/stories?limit=5", etag, **{"Accept-Encoding": "gzip"})
+    assert again.status_code == 304
+
+
+def test_errors_get_no_validators(client):
+    response = get(client, "/stories?limit=abc")
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
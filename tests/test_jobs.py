@@ -0,0 +1,103 @@
+import datetime
+import socket
+
+import pytest
+
+from utils import jobs
+from utils.jobs import submit_job, claim_job, complete_job, run_job, valid_webhook
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """An empty ai_jobs table, immediate retries and an "echo" job kind."""
+    from models.aijob import AIJob
+
+    AIJob.delete().execute()
+    monkeypatch.setattr(jobs, "JOB_RETRY_BACKOFF", 0)
+    monkeypatch.setitem(jobs.JOB_KINDS, "echo", lambda params: {"echo": params["value"]})
+    yield AIJob
+    AIJob.delete().execute()
+
+
+def test_same_params_share_one_job(queue):
+    job, created = submit_job("echo", {"value": 1})
+    again, created_again = submit_job("echo", {"value": 1, "fresh": True})
+    other, created_other = submit_job("echo", {"value": 2})
+    assert created and not created_again and created_other
+    assert again.id == job.id and other.id != job.id
+
+
+def test_done_job_is_reused_unless_fresh(queue):
+    job, _ = submit_job("echo", {"value": 1})
+    run_job(claim_job("w1"), "w1")
+    assert queue.get_by_id(job.id).status == "done"
+
+    assert submit_job("echo", {"value": 1}) == (queue.get_by_id(job.id), False)
+    fresh, created = submit_job("echo", {"value": 1, "fresh": True})
+    assert created and fresh.id != job.id
+
+
+def test_failed_attempts_are_retried_then_fail(queue, monkeypatch):
+    def boom(params):
+        raise RuntimeError("upstream down")
+    monkeypatch.setitem(jobs.JOB_KINDS, "echo", boom)
+    job, _ = submit_job("echo", {"value": 1})
+
+    statuses = []
+    for _ in range(job.max_attempts):
+        claimed = claim_job("w1")
+        run_job(claimed, "w1")
+        statuses.append(queue.get_by_id(job.id).status)
+    assert statuses == ["queued"] * (job.max_attempts - 1) + ["failed"]
+    assert queue.get_by_id(job.id).error == "RuntimeError: upstream down"
+    assert claim_job("w1") is None
+
+
+def test_empty_story_result_is_retried_not_done(queue, monkeypatch):
+    import utils.ai_utils
+    monkeypatch.setattr(utils.ai_utils, "get_ai_failure_stories", lambda **kwargs: [])
+    job, _ = submit_job("ai-stories", {})
+
+    run_job(claim_job("w1"), "w1")
+    stored = queue.get_by_id(job.id)
+    assert stored.status == "queued"
+    assert "No valid stories" in stored.error
+
+
+def test_lapsed_lease_is_reclaimed(queue):
+    job, _ = submit_job("echo", {"value": 1})
+    first = claim_job("w1")
+    queue.update(lease_until=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)).execute()
+
+    second = claim_job("w2")
+    assert second.id == job.id and second.attempts == 2
+    assert complete_job(first, "w1", result={}) is None  # lease lost
+    assert complete_job(second, "w2", result={"ok": True}) == "done"
+
+
+@pytest.fixture
+def resolve(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_HOSTS", {"hooks.example.com"})
+
+    def answer(address):
+        monkeypatch.setattr(socket, "getaddrinfo",
+                            lambda host, port: [(socket.AF_INET, 0, 0, "", (address, 0))])
+    return answer
+
+
+def test_webhook_to_allowlisted_public_host(resolve):
+    resolve("93.184.216.34")
+    assert valid_webhook("https://hooks.example.com/done")
+    assert not valid_webhook("https://other.example.com/done")
+    assert not valid_webhook("ftp://hooks.example.com/done")
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "::1", "fd00::1"])
+def test_webhook_refuses_internal_addresses(resolve, address):
+    resolve(address)
+    assert not valid_webhook("https://hooks.example.com/done")
+
+
+def test_webhooks_off_without_allowlist(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_HOSTS", set())
+    assert not valid_webhook("https://hooks.example.com/done")
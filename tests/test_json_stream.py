@@ -0,0 +1,58 @@
+from utils.json_stream import JSONArrayParser, parse_json_array, iter_json_array
+
+
+def feed_all(chunks):
+    parser = JSONArrayParser()
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    return parser, items
+
+
+def test_elements_arrive_as_each_completes():
+    parser = JSONArrayParser()
+    assert parser.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert parser.feed(': 2}, 3]') == [{"b": 2}, 3]
+    assert parser.done
+
+
+def test_split_at_every_character():
+    text = '```json\n[{"t": "a, [b]", "n": [1, 2]}, "x\\"y", null]\n```'
+    parser, items = feed_all(text)
+    assert items == [{"t": "a, [b]", "n": [1, 2]}, 'x"y', None]
+    assert parser.errors == 0
+
+
+def test_prose_and_bracketed_notes_are_skipped():
+    text = 'Sure [note] here you go: [{"a": 1}] and [ignored]'
+    assert parse_json_array(text) == [{"a": 1}]
+
+
+def test_malformed_element_is_dropped_and_counted():
+    parser, items = feed_all(['[{"a": 1}, {"b": }, {"c": 3}]'])
+    assert items == [{"a": 1}, {"c": 3}]
+    assert parser.errors == 1
+
+
+def test_truncated_array_keeps_completed_elements():
+    assert parse_json_array('[{"a": 1}, {"b": 2}, {"c"') == [{"a": 1}, {"b": 2}]
+
+
+def test_validate_filters_elements():
+    assert parse_json_array('[1, "x", 2]', validate=lambda v: isinstance(v, int)) == [1, 2]
+
+
+def test_iter_closes_source_when_closed_early():
+    closed = []
+
+    def source():
+        try:
+            yield '[1, 2, '
+            yield '3]'
+        finally:
+            closed.append(True)
+
+    items = iter_json_array(source())
+    assert next(items) == 1
+    items.close()
+    assert closed == [True]
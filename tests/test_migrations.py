@@ -0,0 +1,82 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from utils.query_plans import SIDE_PATHS
+
+# Migrations bind to DB_PATH at import time, so each run is its own process
+
+
+def run(module, path, *args):
+    workdir = os.path.dirname(path)
+    env = dict(os.environ, PYTHONPATH=ROOT, DB_PATH=path, OPENROUTER_API_KEY="")
+    env.update({name: os.path.join(workdir, filename) for name, filename in SIDE_PATHS.items()})
+    result = subprocess.run([sys.executable, "-m", module, *args], cwd=workdir, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+@pytest.fixture
+def old_db(tmp_path):
+    """The repo's pre-migration failed.db, plus rows the later migrations rewrite."""
+    path = str(tmp_path / "failed.db")
+    shutil.copy(os.path.join(ROOT, "failed.db"), path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany("INSERT INTO careerpath (title, steps, pitfalls, resources) VALUES (?, '[]', '[]', '[]')",
+                         [("Data Scientist",), (" data  scientist",), ("Chef",)])
+        conn.execute("INSERT INTO question (id, user_id, text) VALUES (100, 1, 'How?')")
+        conn.execute("INSERT INTO answer (question_id, user_id, text) VALUES (100, 2, 'Like so')")
+    return path
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def test_old_database_is_brought_up_to_date(old_db):
+    from utils.migrations import MIGRATIONS
+
+    output = run("utils.migrations", old_db)
+    assert f"{len(MIGRATIONS)} migration(s) applied" in output
+
+    conn = sqlite3.connect(old_db)
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert {"schema_migrations", "savedcareer", "table_versions", "ai_jobs"} <= tables
+    assert {"version"} <= columns(conn, "user")
+    assert {"title_key", "source"} <= columns(conn, "careerpath")
+
+    # Legacy career blobs moved into saved careers
+    assert conn.execute("SELECT COUNT(*) FROM savedcareer").fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM "user" WHERE career_title IS NOT NULL').fetchone()[0] == 0
+
+    # Title keys: the first of two clashing titles gets the key, the other stays unkeyed
+    keys = dict(conn.execute("SELECT title, title_key FROM careerpath"))
+    assert keys == {"Data Scientist": "data scientist", " data  scientist": None, "Chef": "chef"}
+
+    assert conn.execute("SELECT answer_count FROM question WHERE id = 100").fetchone()[0] == 1
+    conn.close()
+
+
+def test_migrations_run_once(old_db):
+    run("utils.migrations", old_db)
+    assert "0 migration(s) applied" in run("utils.migrations", old_db)
+    assert "pending" not in run("utils.migrations", old_db, "--status")
+
+
+def test_new_database_is_created_from_scratch(tmp_path):
+    path = str(tmp_path / "failed.db")
+    run("utils.migrations", path)
+    assert "pending" not in run("utils.migrations", path, "--status")
+
+
+def test_migrated_database_has_no_full_scans(old_db):
+    output = run("utils.query_plans", old_db)
+    assert "0 full scan(s)" in output
+    # The check worked on its own copy and left no side stores behind
+    assert sorted(os.listdir(os.path.dirname(old_db))) == ["failed.db"]
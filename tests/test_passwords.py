@@ -0,0 +1,64 @@
+import hashlib
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from utils import passwords
+from utils.passwords import hash_password, verify_password, needs_rehash
+
+
+@pytest.fixture
+def method(monkeypatch):
+    def configure(value):
+        monkeypatch.setattr(passwords, "PASSWORD_HASH_METHOD", value)
+    return configure
+
+
+def test_default_is_scrypt_and_round_trips():
+    stored = hash_password("s3cret")
+    assert stored.startswith("scrypt:")
+    assert verify_password(stored, "s3cret")
+    assert not verify_password(stored, "wrong")
+    assert not needs_rehash(stored)
+
+
+def test_legacy_sha256_verifies_and_is_rehashed():
+    legacy = hashlib.sha256(b"s3cret").hexdigest()
+    assert verify_password(legacy, "s3cret")
+    assert not verify_password(legacy, "wrong")
+    assert needs_rehash(legacy)
+
+
+def test_weaker_parameters_are_rehashed(method):
+    method("scrypt")
+    assert needs_rehash(generate_password_hash("x", method="scrypt:16384:8:1"))
+    assert needs_rehash(generate_password_hash("x", method="pbkdf2:sha256:1000"))
+
+
+def test_never_downgrades(method):
+    method("pbkdf2:sha256:600000")
+    assert not needs_rehash(generate_password_hash("x", method="scrypt"))
+    assert not needs_rehash(generate_password_hash("x", method="pbkdf2:sha512:600000"))
+    assert not needs_rehash(generate_password_hash("x", method="pbkdf2:sha256:900000"))
+    assert needs_rehash(generate_password_hash("x", method="pbkdf2:sha256:1000"))
+
+
+def test_unknown_method_is_left_alone(method):
+    method("argon2")
+    assert not needs_rehash(generate_password_hash("x", method="scrypt"))
+
+
+def test_login_upgrades_a_legacy_hash(client, db):
+    from models.user import User
+
+    User.create(name="Legacy", email="legacy@example.com",
+                password=hashlib.sha256(b"s3cret").hexdigest())
+
+    response = client.post("/login", json={"email": "legacy@example.com", "password": "s3cret"})
+    assert response.status_code == 200
+    stored = User.get(User.email == "legacy@example.com").password
+    assert stored.startswith("scrypt:")
+    assert verify_password(stored, "s3cret")
+
+    response = client.post("/login", json={"email": "legacy@example.com", "password": "wrong"})
+    assert response.status_code == 401
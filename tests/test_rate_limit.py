@@ -0,0 +1,82 @@
+import uuid
+
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import AIBusy, UpstreamSlots, resolve_client_ip, take_tokens
+
+
+def key():
+    return f"test:{uuid.uuid4().hex}"
+
+
+def test_bucket_allows_burst_then_reports_retry_after():
+    bucket = key()
+    assert [take_tokens([bucket], 3, 1 / 60) for _ in range(3)] == [0, 0, 0]
+    assert 1 <= take_tokens([bucket], 3, 1 / 60) <= 60
+
+
+def test_buckets_are_independent():
+    first, second = key(), key()
+    assert take_tokens([first], 1, 1 / 60) == 0
+    assert take_tokens([first], 1, 1 / 60) > 0
+    assert take_tokens([second], 1, 1 / 60) == 0
+
+
+def test_denied_request_takes_no_tokens():
+    empty, full = key(), key()
+    take_tokens([empty], 1, 1 / 60)
+    assert take_tokens([empty, full], 1, 1 / 60) > 0
+    assert take_tokens([full], 1, 1 / 60) == 0  # still had its token
+
+
+def test_forwarded_for_ignored_without_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXIES", 0)
+    assert resolve_client_ip("10.0.0.1", "1.2.3.4") == "10.0.0.1"
+
+
+def test_only_proxy_added_hops_are_trusted(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXIES", 1)
+    assert resolve_client_ip("10.0.0.1", "6.6.6.6, 1.2.3.4") == "1.2.3.4"
+    assert resolve_client_ip("10.0.0.1", None) == "10.0.0.1"
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXIES", 2)
+    assert resolve_client_ip("10.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.2") == "1.2.3.4"
+
+
+def test_ai_route_answers_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXIES", 1)
+    monkeypatch.setenv("RATE_LIMIT_AI", "2/1")
+    headers = {"X-Forwarded-For": "203.0.113.7"}
+
+    codes = [client.post("/ai-guide", json={"prompt": "hi"}, headers=headers).status_code
+             for _ in range(3)]
+    assert codes == [200, 200, 429]
+
+    response = client.post("/ai-guide", json={"prompt": "hi"}, headers=headers)
+    assert int(response.headers["Retry-After"]) > 0
+
+    other = client.post("/ai-guide", json={"prompt": "hi"}, headers={"X-Forwarded-For": "203.0.113.8"})
+    assert other.status_code == 200
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason="slots are per worker without fcntl")
+def test_upstream_slots_shed_when_queue_is_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "AI_SLOT_DIR", str(tmp_path))
+    slots = UpstreamSlots(max_concurrency=1, queue_size=0, timeout=0.05)
+
+    held = slots.acquire()
+    with pytest.raises(AIBusy):
+        slots.acquire()
+    slots.release(held)
+    slots.release(slots.acquire())
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason="slots are per worker without fcntl")
+def test_upstream_waiter_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "AI_SLOT_DIR", str(tmp_path))
+    slots = UpstreamSlots(max_concurrency=1, queue_size=1, timeout=0.05)
+
+    held = slots.acquire()
+    with pytest.raises(AIBusy, match="Timed out"):
+        slots.acquire()
+    slots.release(held)
@@ -0,0 +1,297 @@
+import asyncio
+import json
+import time
+
+import httpx
+from tenacity import AsyncRetrying, stop_after_attempt, retry_if_exception_type
+
+from utils import ai_utils
+from utils.ai_utils import (
+    OPENROUTER_URL, RETRY_STATUSES, FALLBACK_STATUSES,
+    OPENROUTER_CONNECT_TIMEOUT, OPENROUTER_READ_TIMEOUT, OPENROUTER_MAX_ATTEMPTS,
+    circuit_breaker, CircuitOpenError, build_payload, profile_cache_key, parse_ai_content,
+    _parse_retry_after, _retry_wait
+)
+from utils.ai_cache import cache_get, cache_set
+from utils.ai_profiles import get_profile
+from utils.ai_usage import record_usage
+from utils.metrics import record_ai_call, record_ai_retry
+from utils.rate_limit import async_upstream_slot, AIBusy
+
+# Asyncio twin of get_ai_guidance for the async app (async_app.py): one event loop
+# holds thousands of in-flight OpenRouter calls instead of one thread per call.
+
+AI_ASYNC_MAX_CONNECTIONS = 200
+
+
+class UpstreamStatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"{status_code} from OpenRouter")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# Errors after which the next model in a profile's chain is tried (see ai_utils.FALLBACK_ERRORS)
+ASYNC_FALLBACK_ERRORS = (UpstreamStatusError, httpx.TransportError)
+
+
+_client = None
+_inflight = {}
+
+
+def get_client():
+    """Shared httpx.AsyncClient; created inside the running loop on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OPENROUTER_READ_TIMEOUT, connect=OPENROUTER_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=AI_ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=AI_ASYNC_MAX_CONNECTIONS),
+            headers={
+                "Authorization": f"Bearer {ai_utils.OPENROUTER_API_KEY}",
+                "Content-Type": "application/json"
+            }
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _async_retrying():
+    return AsyncRetrying(
+        stop=stop_after_attempt(OPENROUTER_MAX_ATTEMPTS),
+        wait=_retry_wait,
+        retry=retry_if_exception_type((UpstreamStatusError, httpx.TransportError)),
+        before_sleep=record_ai_retry,
+        reraise=True
+    )
+
+
+def _falls_back(error):
+    if isinstance(error, ASYNC_FALLBACK_ERRORS):
+        return True
+    return (isinstance(error, httpx.HTTPStatusError)
+            and error.response.status_code in FALLBACK_STATUSES)
+
+
+def _check_status(response):
+    if response.status_code in RETRY_STATUSES:
+        raise UpstreamStatusError(response.status_code,
+                                  _parse_retry_after(response.headers.get("Retry-After")))
+    response.raise_for_status()
+
+
+async def async_openrouter_chat(payload):
+    if not circuit_breaker.allow():
+        raise CircuitOpenError("OpenRouter circuit is open")
+
+    async def post():
+        response = await get_client().post(OPENROUTER_URL, json=payload)
+        _check_status(response)
+        return response.json()
+
+    try:
+        result = await _async_retrying()(post)
+    except (UpstreamStatusError, httpx.TransportError):
+        circuit_breaker.record_failure()
+        raise
+    except asyncio.CancelledError:
+        circuit_breaker.release_trial()
+        raise
+    except Exception:
+        circuit_breaker.record_success()
+        raise
+    circuit_breaker.record_success()
+    return result
+
+
+async def async_openrouter_stream(payload):
+    """Open a streaming completion with the same retries and breaker as async_openrouter_chat.
+
+    Only opening the stream is retried; the caller iterates and must aclose() the response.
+    """
+    if not circuit_breaker.allow():
+        raise CircuitOpenError("OpenRouter circuit is open")
+
+    async def open_stream():
+        client = get_client()
+        response = await client.send(client.build_request("POST", OPENROUTER_URL, json=payload),
+                                     stream=True)
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+        _check_status(response)
+        return response
+
+    try:
+        response = await _async_retrying()(open_stream)
+    except (UpstreamStatusError, httpx.TransportError):
+        circuit_breaker.record_failure()
+        raise
+    except asyncio.CancelledError:
+        circuit_breaker.release_trial()
+        raise
+    except Exception:
+        circuit_breaker.record_success()
+        raise
+    circuit_breaker.record_success()
+    return response
+
+
+async def _async_try_models(prompt_text, profile, call, **extra):
+    """Await call(payload) for each model in the profile's chain; returns (result, model)."""
+    if not profile.models:
+        raise ValueError(f"AI profile {profile.name} has no models")
+    last_error = None
+    for model in profile.models:
+        started = time.perf_counter()
+        try:
+            result = await call(dict(build_payload(prompt_text, profile, model), **extra))
+        except CircuitOpenError:
+            record_ai_call(profile.name, model, "circuit_open", 0)
+            raise
+        except Exception as e:
+            record_ai_call(profile.name, model, "error", time.perf_counter() - started)
+            if not _falls_back(e):
+                raise
+            print(f"⚠️ OpenRouter model {model} failed:", e)
+            last_error = e
+            continue
+        record_ai_call(profile.name, model, "ok", time.perf_counter() - started)
+        return result, model
+    raise last_error
+
+
+async def _coalesce(key, make_coro):
+    """Async single-flight: concurrent callers with the same key await one task."""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(make_coro())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one caller disconnecting must not cancel the call for the others
+    return await asyncio.shield(task)
+
+
+async def async_get_ai_guidance(prompt_text, expect_json=False, cache_ttl=None, use_cache=True,
+                                profile="default", validate=None):
+    """Same contract as ai_utils.get_ai_guidance, without blocking the event loop."""
+    profile = get_profile(profile)
+    request_key = profile_cache_key(prompt_text, profile, expect_json)
+    if cache_ttl and use_cache:
+        cached = await asyncio.to_thread(cache_get, request_key)
+        if cached is not None:
+            return cached
+
+    cache_key = request_key if cache_ttl else None
+    return await _coalesce(
+        request_key,
+        lambda: _async_fetch_guidance(prompt_text, expect_json, cache_key, cache_ttl, profile,
+                                      validate)
+    )
+
+
+async def _async_fetch_guidance(prompt_text, expect_json, cache_key, cache_ttl, profile,
+                                validate=None):
+    if not ai_utils.OPENROUTER_API_KEY:
+        print("❌ OPENROUTER_API_KEY not found in environment.")
+        return [] if expect_json else "AI service unavailable. API key missing."
+
+    try:
+        # Only the coalesced call that goes upstream takes a slot
+        async with async_upstream_slot():
+            response, model = await _async_try_models(prompt_text, profile, async_openrouter_chat)
+        await asyncio.to_thread(record_usage, profile.name, model, response.get("usage"))
+        content = response["choices"][0]["message"]["content"].strip()
+
+        result = parse_ai_content(content, expect_json)
+        if result is None:
+            return [] if expect_json else content
+        if cache_key and result and (validate is None or validate(result)):
+            await asyncio.to_thread(cache_set, cache_key, result, cache_ttl)
+        return result
+
+    except AIBusy:
+        raise
+
+    except CircuitOpenError:
+        print("⚠️ OpenRouter circuit open, skipping AI call")
+        return [] if expect_json else "AI service is temporarily unavailable. Try again shortly."
+
+    except (UpstreamStatusError, httpx.HTTPStatusError) as http_err:
+        print("❌ OpenRouter HTTP Error:", http_err)
+        return [] if expect_json else "AI service failed. Try again later."
+
+    except Exception as e:
+        print("❌ General AI Error:", e)
+        return [] if expect_json else "Something went wrong. Please try again."
+
+
+async def async_stream_ai_guidance(prompt_text, cache_ttl=None, use_cache=True, profile="default",
+                                   validate=None):
+    """Open the upstream stream and return an async generator of its text chunks.
+
+    Like stream_ai_guidance, errors raise here rather than mid-response;
+    cancelling or closing the generator closes the upstream stream.
+    """
+    chunks = _async_stream_chunks(prompt_text, cache_ttl, use_cache, profile, validate)
+    await chunks.__anext__()  # runs up to the opened stream (or the cache hit)
+    return chunks
+
+
+async def _async_stream_chunks(prompt_text, cache_ttl, use_cache, profile, validate):
+    # Yields None once the reply is ready to relay, then the text chunks
+    profile = get_profile(profile)
+    cache_key = None
+    if cache_ttl:
+        cache_key = profile_cache_key(prompt_text, profile, False)
+        if use_cache:
+            cached = await asyncio.to_thread(cache_get, cache_key)
+            if cached is not None:
+                yield None
+                yield cached
+                return
+
+    if not ai_utils.OPENROUTER_API_KEY:
+        raise RuntimeError("AI service unavailable. API key missing.")
+
+    # Held until the stream ends or the client goes away
+    async with async_upstream_slot():
+        response, model = await _async_try_models(
+            prompt_text, profile, async_openrouter_stream,
+            stream=True, stream_options={"include_usage": True})
+        parts = []
+        usage = None
+        finished = False
+        try:
+            yield None  # opened; async_stream_ai_guidance returns from here
+            async for line in response.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    finished = True
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or usage  # sent in the last chunk
+                choices = event.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except httpx.TransportError:
+            circuit_breaker.record_failure()
+            raise
+        finally:
+            await response.aclose()
+            await asyncio.to_thread(record_usage, profile.name, model, usage)
+
+    content = "".join(parts).strip()
+    if finished and cache_key and content and (validate is None or validate(content)):
+        await asyncio.to_thread(cache_set, cache_key, content, cache_ttl)
+
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from peewee import SqliteDatabase, Model, CharField, TextField, FloatField, IntegerField, fn
+
+# Cache settings
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", os.path.join(os.getcwd(), "ai_cache.db"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "1") != "0"
+# Seconds between eviction passes per worker; the table can overshoot
+# AI_CACHE_MAX_ENTRIES by the writes made in between
+AI_CACHE_EVICT_INTERVAL = float(os.getenv("AI_CACHE_EVICT_INTERVAL", "60"))
+
+# How long (seconds) each endpoint's AI responses stay fresh
+AI_CACHE_TTLS = {
+    "test-ai": 24 * 3600,
+    "ai-quote": 6 * 3600,
+    "ai-careers": 24 * 3600,
+    "ai-stories": 3600,
+    "ai-guide": 3600,
+    "ai-guidance": 3600,
+    "career-details": 7 * 24 * 3600,
+}
+
+# Separate file so cache writes never contend with failed.db, shared by all workers
+cache_db = SqliteDatabase(AI_CACHE_PATH, pragmas={
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+})
+
+
+class AICacheEntry(Model):
+    key = CharField(primary_key=True)
+    value = TextField()                      # JSON encoded response
+    created_at = FloatField()
+    expires_at = FloatField()
+    last_accessed = FloatField(index=True)   # drives LRU eviction
+    hits = IntegerField(default=0)
+
+    class Meta:
+        database = cache_db
+        table_name = "ai_cache"
+
+
+_ready = False
+_ready_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_last_evict = 0.0
+_evict_lock = threading.Lock()
+
+
+def _ensure_ready():
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if not _ready:
+            cache_db.connect(reuse_if_open=True)
+            cache_db.create_tables([AICacheEntry], safe=True)
+            _ready = True
+    cache_db.connect(reuse_if_open=True)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_ttl_for(endpoint):
+    """Return the TTL for an endpoint, overridable with AI_CACHE_TTL_<ENDPOINT> env vars."""
+    env_name = "AI_CACHE_TTL_" + endpoint.upper().replace("-", "_")
+    return int(os.getenv(env_name, AI_CACHE_TTLS.get(endpoint, 3600)))
+
+
+def normalize_prompt(prompt_text):
+    # Whitespace only: case carries meaning ("Go" vs "go", "IT" vs "it")
+    return re.sub(r"\s+", " ", (prompt_text or "").strip())
+
+
+def make_cache_key(prompt_text, model, system_prompt, temperature, expect_json, max_tokens=None):
+    raw = json.dumps([
+        normalize_prompt(prompt_text),
+        model,
+        system_prompt,
+        temperature,
+        bool(expect_json),
+        max_tokens,
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_get(key):
+    """Return the cached value for key, or None on a miss."""
+    if not AI_CACHE_ENABLED:
+        return None
+    try:
+        _ensure_ready()
+        now = time.time()
+        entry = AICacheEntry.get_or_none(
+            (AICacheEntry.key == key) & (AICacheEntry.expires_at > now)
+        )
+        if entry is None:
+            _count("misses")
+            return None
+
+        (AICacheEntry
+         .update(last_accessed=now, hits=AICacheEntry.hits + 1)
+         .where(AICacheEntry.key == key)
+         .execute())
+        _count("hits")
+        return json.loads(entry.value)
+    except Exception as e:
+        print("⚠️ AI cache read failed:", e)
+        return None
+
+
+def cache_set(key, value, ttl):
+    if not AI_CACHE_ENABLED or not ttl:
+        return
+    try:
+        _ensure_ready()
+        now = time.time()
+        (AICacheEntry
+         .insert(key=key, value=json.dumps(value), created_at=now,
+                 expires_at=now + ttl, last_accessed=now, hits=0)
+         .on_conflict_replace()
+         .execute())
+        if _evict_due(now):
+            with cache_db.atomic():
+                _evict(now)
+    except Exception as e:
+        print("⚠️ AI cache write failed:", e)
+
+
+def _evict_due(now):
+    """True for at most one write per AI_CACHE_EVICT_INTERVAL in this worker."""
+    global _last_evict
+    with _evict_lock:
+        if now - _last_evict < AI_CACHE_EVICT_INTERVAL:
+            return False
+        _last_evict = now
+        return True
+
+
+def _evict(now):
+    AICacheEntry.delete().where(AICacheEntry.expires_at <= now).execute()
+
+    overflow = AICacheEntry.select().count() - AI_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = (AICacheEntry
+                  .select(AICacheEntry.key)
+                  .order_by(AICacheEntry.last_accessed)
+                  .limit(overflow))
+        removed = AICacheEntry.delete().where(AICacheEntry.key.in_(oldest)).execute()
+        with _stats_lock:
+            _stats["evictions"] += removed
+
+
+def cache_clear():
+    _ensure_ready()
+    AICacheEntry.delete().execute()
+
+
+def cache_stats():
+    """Hit/miss counters for this worker plus totals shared by every worker."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+
+    try:
+        _ensure_ready()
+        stats["entries"] = AICacheEntry.select().count()
+        stats["total_hits"] = AICacheEntry.select(fn.SUM(AICacheEntry.hits)).scalar() or 0
+    except Exception as e:
+        stats["error"] = str(e)
+    stats["max_entries"] = AI_CACHE_MAX_ENTRIES
+    return stats
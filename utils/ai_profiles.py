@@ -0,0 +1,85 @@
+import os
+
+# Named call profiles: each route picks the smallest model budget and prompt that does its job.
+
+DEFAULT_MODEL = "openai/gpt-3.5-turbo"
+FALLBACK_MODELS = [m.strip() for m in os.getenv("OPENROUTER_FALLBACK_MODELS", "").split(",") if m.strip()]
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are an AI mentor helping students who failed in traditional education. "
+    "If asked for careers, return JSON array of objects with title, description, steps, pitfalls, and resources. "
+    "If asked for quotes or guidance, return plain text without quotes or markdown. "
+    "If asked for study goals, ONLY return a raw JSON array of strings like: "
+    "[\"Goal 1\", \"Goal 2\", \"Goal 3\", \"Goal 4\", \"Goal 5\"]"
+)
+
+
+class AIProfile:
+    """Model chain, token budget, temperature and system prompt for one kind of call.
+
+    Every value can be overridden with AI_PROFILE_<NAME>_MODELS (comma separated,
+    tried in order), _MAX_TOKENS and _TEMPERATURE environment variables.
+    """
+
+    def __init__(self, name, max_tokens, temperature, system_prompt, models=None):
+        env = "AI_PROFILE_" + name.upper().replace("-", "_")
+        env_models = os.getenv(env + "_MODELS")
+        if env_models:
+            models = [m.strip() for m in env_models.split(",") if m.strip()]
+            if not models:
+                raise ValueError(f"{env}_MODELS is set but names no models")
+        self.name = name
+        self.models = models or [DEFAULT_MODEL] + FALLBACK_MODELS
+        self.max_tokens = int(os.getenv(env + "_MAX_TOKENS", max_tokens))
+        self.temperature = float(os.getenv(env + "_TEMPERATURE", temperature))
+        self.system_prompt = system_prompt
+
+    @property
+    def model(self):
+        return self.models[0]
+
+
+AI_PROFILES = {p.name: p for p in [
+    AIProfile("default", 2000, 0.7, DEFAULT_SYSTEM_PROMPT),
+    AIProfile("quote", 80, 0.9,
+              "You write one short motivational quote for students who failed. "
+              "Reply with the quote only, as plain text without quotation marks or markdown."),
+    AIProfile("guide", 700, 0.7,
+              "You are a concise mentor for students who failed in traditional education. "
+              "Answer in plain text without markdown."),
+    AIProfile("career-details", 900, 0.5,
+              "You are a career mentor. Reply ONLY with a raw JSON object with the keys "
+              "description, steps, pitfalls and resources. No markdown, no prose."),
+    AIProfile("careers", 1500, 0.5,
+              "Reply ONLY with a raw JSON array of objects with the keys title, description, "
+              "steps, pitfalls and resources. No markdown, no prose."),
+    AIProfile("stories", 3500, 0.8,
+              "You write realistic, inspiring stories. Reply ONLY with a raw JSON array of objects "
+              "with the keys title, story and tags. No markdown, no prose."),
+]}
+
+
+# Which profile each route uses
+ENDPOINT_PROFILES = {
+    "test-ai": "quote",
+    "ai-quote": "quote",
+    "ai-guide": "guide",
+    "ai-guidance": "default",
+    "ai-careers": "careers",
+    "ai-stories": "stories",
+    "career-details": "career-details",
+}
+
+
+def profile_for(endpoint):
+    return ENDPOINT_PROFILES.get(endpoint, "default")
+
+
+def get_profile(name):
+    """Look up a profile by name; AIProfile instances pass straight through."""
+    if isinstance(name, AIProfile):
+        return name
+    profile = AI_PROFILES.get(name or "default")
+    if profile is None:
+        raise KeyError(f"Unknown AI profile: {name}")
+    return profile
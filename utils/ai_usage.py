@@ -0,0 +1,77 @@
+import datetime
+import threading
+
+from peewee import Model, CharField, DateField, IntegerField, CompositeKey, fn
+from utils.ai_cache import cache_db
+from utils.metrics import record_ai_tokens
+
+# Daily token usage per AI profile and model, stored next to the AI cache so
+# every worker adds to the same totals.
+
+
+class AIUsage(Model):
+    day = DateField()
+    profile = CharField()
+    model = CharField()
+    calls = IntegerField(default=0)
+    prompt_tokens = IntegerField(default=0)
+    completion_tokens = IntegerField(default=0)
+
+    class Meta:
+        database = cache_db
+        table_name = "ai_usage"
+        primary_key = CompositeKey("day", "profile", "model")
+
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def _ensure_ready():
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if not _ready:
+            cache_db.connect(reuse_if_open=True)
+            cache_db.create_tables([AIUsage], safe=True)
+            _ready = True
+    cache_db.connect(reuse_if_open=True)
+
+
+def record_usage(profile, model, usage):
+    """Add one call's upstream `usage` block to today's totals; never raises."""
+    usage = usage or {}
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    completion_tokens = int(usage.get("completion_tokens") or 0)
+    record_ai_tokens(profile, model, prompt_tokens, completion_tokens)
+    try:
+        _ensure_ready()
+        (AIUsage
+         .insert(day=datetime.date.today(), profile=profile, model=model, calls=1,
+                 prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+         .on_conflict(
+             conflict_target=[AIUsage.day, AIUsage.profile, AIUsage.model],
+             update={
+                 AIUsage.calls: AIUsage.calls + 1,
+                 AIUsage.prompt_tokens: AIUsage.prompt_tokens + prompt_tokens,
+                 AIUsage.completion_tokens: AIUsage.completion_tokens + completion_tokens,
+             })
+         .execute())
+    except Exception as e:
+        print("⚠️ AI usage write failed:", e)
+
+
+def usage_summary(days=7):
+    _ensure_ready()
+    since = datetime.date.today() - datetime.timedelta(days=days - 1)
+    query = (AIUsage
+             .select(AIUsage.profile, AIUsage.model,
+                     fn.SUM(AIUsage.calls).alias("calls"),
+                     fn.SUM(AIUsage.prompt_tokens).alias("prompt_tokens"),
+                     fn.SUM(AIUsage.completion_tokens).alias("completion_tokens"))
+             .where(AIUsage.day >= since)
+             .group_by(AIUsage.profile, AIUsage.model)
+             .order_by(AIUsage.profile, AIUsage.model)
+             .dicts())
+    return list(query)
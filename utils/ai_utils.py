@@ -1,75 +1,372 @@
 import requests
 import os
 import json
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, stop_after_attempt, retry_if_exception_type, wait_random_exponential
+from utils.ai_cache import make_cache_key, cache_get, cache_set
+from utils.ai_profiles import get_profile
+from utils.ai_usage import record_usage
+from utils.metrics import record_ai_call, record_ai_retry
+from utils.singleflight import SingleFlight
+from utils.rate_limit import upstream_slot
+from utils.prompts import STORIES_PROMPT, valid_stories
+from utils.json_stream import parse_json_array
 
 # API settings
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-OPENROUTER_MODEL = "openai/gpt-3.5-turbo"
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+# Model, temperature, token budget and system prompt come from utils/ai_profiles.py
+
+# Client settings
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+OPENROUTER_MAX_ATTEMPTS = int(os.getenv("OPENROUTER_MAX_ATTEMPTS", "3"))
+OPENROUTER_MAX_RETRY_WAIT = float(os.getenv("OPENROUTER_MAX_RETRY_WAIT", "10"))
+OPENROUTER_POOL_SIZE = int(os.getenv("OPENROUTER_POOL_SIZE", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("OPENROUTER_CIRCUIT_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("OPENROUTER_CIRCUIT_RESET", "30"))
+# Directory for cross-worker single-flight locks; unset keeps coalescing per worker
+AI_SINGLEFLIGHT_LOCK_DIR = os.getenv("AI_SINGLEFLIGHT_LOCK_DIR")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Errors after which the next model in a profile's chain is tried; any other
+# 4xx (bad key, bad request) would fail the same way on every model
+FALLBACK_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+FALLBACK_STATUSES = {404}  # model unknown or has no available endpoint
+
+
+# ---------- OpenRouter Client ----------
+class RetryableStatusError(requests.exceptions.HTTPError):
+    """429/5xx from OpenRouter; carries the Retry-After delay when one was sent."""
+
+    def __init__(self, message, retry_after=None, **kwargs):
+        super().__init__(message, **kwargs)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def _falls_back(error):
+    """True if the next model in the chain might succeed where this one failed."""
+    if isinstance(error, (RetryableStatusError,) + FALLBACK_ERRORS):
+        return True
+    response = getattr(error, "response", None)
+    return (isinstance(error, requests.exceptions.HTTPError) and response is not None
+            and response.status_code in FALLBACK_STATUSES)
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures, then lets one trial call through."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Free the half-open slot when a trial call was cancelled without an outcome."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+ai_single_flight = SingleFlight(lock_dir=AI_SINGLEFLIGHT_LOCK_DIR)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Shared keep-alive session so calls reuse pooled TCP/TLS connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OPENROUTER_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                    "Content-Type": "application/json"
+                })
+                _session = session
+    return _session
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_backoff = wait_random_exponential(multiplier=0.5, max=OPENROUTER_MAX_RETRY_WAIT)
+
+
+def _retry_wait(retry_state):
+    retry_after = getattr(retry_state.outcome.exception(), "retry_after", None)
+    if retry_after is not None:
+        return min(retry_after, OPENROUTER_MAX_RETRY_WAIT)
+    return _backoff(retry_state)
+
+
+def _retrying():
+    return Retrying(
+        stop=stop_after_attempt(OPENROUTER_MAX_ATTEMPTS),
+        wait=_retry_wait,
+        retry=retry_if_exception_type((
+            RetryableStatusError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        )),
+        before_sleep=record_ai_retry,
+        reraise=True
+    )
+
+
+def _send(payload, stream=False):
+    response = get_session().post(
+        OPENROUTER_URL,
+        json=payload,
+        timeout=(OPENROUTER_CONNECT_TIMEOUT, OPENROUTER_READ_TIMEOUT),
+        stream=stream
+    )
+    if response.status_code in RETRY_STATUSES:
+        response.close()
+        raise RetryableStatusError(
+            f"{response.status_code} from OpenRouter",
+            retry_after=_parse_retry_after(response.headers.get("Retry-After")),
+            response=response
+        )
+    if response.status_code >= 400:
+        response.close()
+    response.raise_for_status()
+    return response
+
+
+def _post_once(payload):
+    return _send(payload).json()
+
+
+def _open_stream(payload):
+    return _send(payload, stream=True)
+
 
-def get_ai_guidance(prompt_text, expect_json=False):
+def openrouter_chat(payload):
+    """POST a chat completion with timeouts, jittered retries and the circuit breaker."""
+    if not circuit_breaker.allow():
+        raise CircuitOpenError("OpenRouter circuit is open")
+
+    try:
+        result = _retrying()(_post_once, payload)
+    except (RetryableStatusError, requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        circuit_breaker.record_failure()
+        raise
+    except Exception:
+        # The upstream answered (4xx, odd body), so it is healthy; keep the breaker closed
+        circuit_breaker.record_success()
+        raise
+    circuit_breaker.record_success()
+    return result
+
+
+def openrouter_stream(payload):
+    """Open a streaming chat completion with the same retries and breaker as openrouter_chat."""
+    if not circuit_breaker.allow():
+        raise CircuitOpenError("OpenRouter circuit is open")
+
+    try:
+        response = _retrying()(_open_stream, payload)
+    except (RetryableStatusError, requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        circuit_breaker.record_failure()
+        raise
+    except Exception:
+        circuit_breaker.record_success()
+        raise
+    circuit_breaker.record_success()
+    return response
+
+
+def build_payload(prompt_text, profile="default", model=None):
+    profile = get_profile(profile)
+    return {
+        "model": model or profile.model,
+        "messages": [
+            {
+                "role": "system",
+                "content": profile.system_prompt
+            },
+            {
+                "role": "user",
+                "content": prompt_text
+            }
+        ],
+        "temperature": profile.temperature,
+        "max_tokens": profile.max_tokens
+    }
+
+
+def profile_cache_key(prompt_text, profile, expect_json):
+    profile = get_profile(profile)
+    return make_cache_key(prompt_text, ",".join(profile.models), profile.system_prompt,
+                          profile.temperature, expect_json, profile.max_tokens)
+
+
+def _try_models(prompt_text, profile, call, **extra):
+    """Run call(payload) for each model in the profile's chain until one succeeds.
+
+    Returns (result, model). An open circuit is not retried on the next model.
+    """
+    if not profile.models:
+        raise ValueError(f"AI profile {profile.name} has no models")
+    last_error = None
+    for model in profile.models:
+        started = time.perf_counter()
+        try:
+            result = call(dict(build_payload(prompt_text, profile, model), **extra))
+        except CircuitOpenError:
+            record_ai_call(profile.name, model, "circuit_open", 0)
+            raise
+        except Exception as e:
+            record_ai_call(profile.name, model, "error", time.perf_counter() - started)
+            if not _falls_back(e):
+                raise
+            print(f"⚠️ OpenRouter model {model} failed:", e)
+            last_error = e
+            continue
+        record_ai_call(profile.name, model, "ok", time.perf_counter() - started)
+        return result, model
+    raise last_error
+
+
+def get_ai_guidance(prompt_text, expect_json=False, cache_ttl=None, use_cache=True, profile="default",
+                    validate=None):
+    """Ask OpenRouter for guidance using the named profile (see utils/ai_profiles.py).
+
+    Successful responses are cached for cache_ttl seconds (no caching when None),
+    unless validate(result) says the reply isn't usable;
+    pass use_cache=False to skip the lookup and refresh the stored entry.
+    Identical calls already in flight are coalesced into one upstream request.
+    """
+    profile = get_profile(profile)
+    request_key = profile_cache_key(prompt_text, profile, expect_json)
+    recheck = None
+    if cache_ttl and use_cache:
+        cached = cache_get(request_key)
+        if cached is not None:
+            return cached
+        recheck = lambda: cache_get(request_key)
+
+    cache_key = request_key if cache_ttl else None
+
+    def fetch():
+        # Only the call that goes upstream takes a slot; AIBusy reaches every coalesced caller
+        with upstream_slot():
+            return _fetch_guidance(prompt_text, expect_json, cache_key, cache_ttl, profile, validate)
+
+    return ai_single_flight.do(request_key, fetch, recheck=recheck)
+
+
+def parse_ai_content(content, expect_json):
+    """Shape completion text into what get_ai_guidance returns; None if unusable."""
+    if not expect_json:
+        return content or None
+
+    content = content.strip("` \n")
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError as e:
+        # Salvage the well-formed items instead of dropping the whole response
+        salvaged = parse_json_array(content)
+        if salvaged:
+            print(f"⚠️ JSON decode failed ({e}); kept {len(salvaged)} well-formed items")
+            return salvaged
+        print("⚠️ JSON decode failed:", e)
+        print("🚫 Raw content:\n", content)
+        return None
+
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        return [v for v in parsed.values() if isinstance(v, str)]
+    print("⚠️ Unexpected AI response structure:", parsed)
+    return None
+
+
+def _fetch_guidance(prompt_text, expect_json, cache_key, cache_ttl, profile, validate=None):
     if not OPENROUTER_API_KEY:
         print("❌ OPENROUTER_API_KEY not found in environment.")
         return [] if expect_json else "AI service unavailable. API key missing."
 
     try:
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        data = {
-            "model": OPENROUTER_MODEL,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an AI mentor helping students who failed in traditional education. "
-                        "If asked for careers, return JSON array of objects with title, description, steps, pitfalls, and resources. "
-                        "If asked for quotes or guidance, return plain text without quotes or markdown. "
-                        "If asked for study goals, ONLY return a raw JSON array of strings like: "
-                        "[\"Goal 1\", \"Goal 2\", \"Goal 3\", \"Goal 4\", \"Goal 5\"]"
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": prompt_text
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-
-        response = requests.post(OPENROUTER_URL, headers=headers, json=data)
-        response.raise_for_status()
-
-        content = response.json()["choices"][0]["message"]["content"].strip()
-
-        if expect_json:
-            content = content.strip("` \n")
-            try:
-                parsed = json.loads(content)
-                if isinstance(parsed, list):
-                    return parsed
-                elif isinstance(parsed, dict):
-                    return [v for v in parsed.values() if isinstance(v, str)]
-                else:
-                    print("⚠️ Unexpected AI response structure:", parsed)
-                    return []
-            except json.JSONDecodeError as e:
-                print("⚠️ JSON decode failed:", e)
-                print("🚫 Raw content:\n", content)
-                return []
-        else:
-            return content
+        response, model = _try_models(prompt_text, profile, openrouter_chat)
+        record_usage(profile.name, model, response.get("usage"))
+
+        content = response["choices"][0]["message"]["content"].strip()
+
+        result = parse_ai_content(content, expect_json)
+        if result is None:
+            return [] if expect_json else content
+        if cache_key and result and (validate is None or validate(result)):
+            cache_set(cache_key, result, cache_ttl)
+        return result
+
+    except CircuitOpenError:
+        print("⚠️ OpenRouter circuit open, skipping AI call")
+        return [] if expect_json else "AI service is temporarily unavailable. Try again shortly."
 
     except requests.exceptions.HTTPError as http_err:
         print("❌ OpenRouter HTTP Error:", http_err)
-        print("📦 Payload Sent:\n", json.dumps(data, indent=2))
+        print("📦 Payload Sent:\n", json.dumps(build_payload(prompt_text, profile), indent=2))
         return [] if expect_json else "AI service failed. Try again later."
 
     except Exception as e:
@@ -77,27 +374,74 @@ def get_ai_guidance(prompt_text, expect_json=False):
         return [] if expect_json else "Something went wrong. Please try again."
 
 
-def get_ai_failure_stories():
-    prompt = (
-        "Generate 10 inspiring Indian stories of individuals who initially failed in education, UPSC, or business, "
-        "but later achieved significant success. Each story should be written in 3 to 4 paragraphs, not as bullet points. "
-        "Include realistic characters with background, failure, turning point, and final growth. Avoid using real names like 'Narendra Modi' or 'Ambani'. "
-        "Return the stories as a JSON array of objects with the keys: 'title', 'story', and optional 'tags'. "
-        "Each 'story' field should contain a well-written paragraph-style narrative. "
-        "Do not return markdown or code formatting."
-    )
+def stream_ai_guidance(prompt_text, cache_ttl=None, use_cache=True, profile="default", validate=None):
+    """Return a generator of plain-text chunks as OpenRouter generates them (upstream stream: true).
+
+    The upstream request is opened before this returns, so AIBusy, an open circuit
+    or an HTTP error raise here, while the route can still answer with a status
+    code. Closing the generator (e.g. the client disconnected) closes the upstream
+    connection and frees the slot. The full reply is cached as in get_ai_guidance.
+    """
+    chunks = _stream_chunks(prompt_text, cache_ttl, use_cache, profile, validate)
+    next(chunks)  # runs up to the opened stream (or the cache hit)
+    return chunks
+
+
+def _stream_chunks(prompt_text, cache_ttl, use_cache, profile, validate):
+    # Yields None once the reply is ready to relay, then the text chunks
+    profile = get_profile(profile)
+    cache_key = None
+    if cache_ttl:
+        cache_key = profile_cache_key(prompt_text, profile, False)
+        if use_cache:
+            cached = cache_get(cache_key)
+            if cached is not None:
+                yield None
+                yield cached
+                return
+
+    if not OPENROUTER_API_KEY:
+        raise RuntimeError("AI service unavailable. API key missing.")
+
+    # Held until the stream ends or the client goes away
+    with upstream_slot():
+        yield from _relay_stream(prompt_text, profile, cache_key, cache_ttl, validate)
+
+
+def _relay_stream(prompt_text, profile, cache_key, cache_ttl, validate):
+    response, model = _try_models(prompt_text, profile, openrouter_stream,
+                                  stream=True, stream_options={"include_usage": True})
+
+    parts = []
+    usage = None
+    try:
+        yield None  # opened; stream_ai_guidance returns from here
+        for line in response.iter_lines(decode_unicode=True):
+            # Skip blank keep-alives and ": OPENROUTER PROCESSING" comments
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            event = json.loads(data)
+            usage = event.get("usage") or usage  # sent in the last chunk
+            choices = event.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                parts.append(delta)
+                yield delta
+        else:
+            return  # upstream hung up before [DONE]; don't cache a partial answer
 
-    raw_stories = get_ai_guidance(prompt, expect_json=True)
+        content = "".join(parts).strip()
+        if cache_key and content and (validate is None or validate(content)):
+            cache_set(cache_key, content, cache_ttl)
+    finally:
+        response.close()
+        record_usage(profile.name, model, usage)
 
-    stories = []
-    for item in raw_stories:
-        if (
-            isinstance(item, dict)
-            and item.get("title")
-            and item.get("story")
-            and isinstance(item["story"], str)
-            and len(item["story"].split()) > 50
-        ):
-            stories.append(item)
 
-    return stories[:10]
+def get_ai_failure_stories(cache_ttl=None, use_cache=True):
+    raw_stories = get_ai_guidance(STORIES_PROMPT, expect_json=True, cache_ttl=cache_ttl,
+                                  use_cache=use_cache, profile="stories")
+    return valid_stories(raw_stories)
@@ -0,0 +1,63 @@
+"""One-shot database setup: pending migrations and the admin account.
+
+Run it once per deploy, before workers start serving:
+
+    python -m utils.bootstrap
+
+gunicorn.conf.py does this in the gunicorn master, so workers boot without
+touching the database and never race each other on these writes.
+"""
+import time
+
+from dotenv import load_dotenv
+load_dotenv()  # the CLI reads DB_PATH and friends from .env like the app does
+
+from utils.db import db
+from utils.migrations import run_migrations
+from utils.passwords import hash_password
+from models.user import User
+
+
+def ensure_admin_exists():
+    try:
+        if not User.select().where(User.email == "admin@failed.com").exists():
+            User.create_user({
+                "name": "Admin",
+                "email": "admin@failed.com",
+                "password": "admin123",
+                "role": "admin",
+                "bio": "Platform administrator"
+            })
+    except Exception as e:
+        print("Admin creation failed:", e)
+
+
+def seed_default_user():
+    """Local-development admin; `python app.py` creates it, deploys don't."""
+    email = "admin@example.com"
+
+    if not User.get_or_none(User.email == email):
+        User.create(
+            name="Admin",
+            email=email,
+            password=hash_password("admin123"),
+            role="admin",
+            bio="System administrator"
+        )
+        print("✅ Admin user created")
+    else:
+        print("ℹ️ Admin user already exists")
+
+
+def bootstrap():
+    # A bare connection, not `with db:`, so each migration's IMMEDIATE
+    # transaction is a real one rather than a savepoint inside ours
+    with db.connection_context():
+        run_migrations()
+        ensure_admin_exists()
+
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    bootstrap()
+    print(f"✅ Bootstrap done in {time.perf_counter() - started:.2f}s")
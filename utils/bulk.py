@@ -0,0 +1,401 @@
+"""Bulk NDJSON/CSV import and export for careers, stories and users.
+
+Imports stream their input, clean each row, and write it in chunks of
+IMPORT_CHUNK_SIZE rows. Each chunk is one transaction that upserts by natural
+key:
+
+- careers: the normalized title (title_key)
+- stories: author email + title
+- users:   email
+
+Rows that fail validation are reported by line number and skipped. Within a
+chunk the last row with a given key wins and the earlier ones are counted as
+duplicates. Exports read in keyset pages, so memory use stays flat however
+large the table is.
+
+    python -m utils.bulk import stories corpus.ndjson
+    python -m utils.bulk import careers careers.csv --format csv
+    python -m utils.bulk export users --with-passwords -o users.ndjson
+
+The admin routes /admin/import/<kind> and /admin/export/<kind> in app.py wrap
+the same functions.
+"""
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()  # the CLI reads DB_PATH and friends from .env like the app does
+
+from peewee import EXCLUDED
+from utils.db import db
+from utils.passwords import hash_passwords
+from models.user import User
+from models.failcourse import FailCourse
+from models.careerpath import CareerPath, normalize_title
+from models.search_index import CareerPathIndex, FailCourseIndex
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 100
+FORMATS = ("ndjson", "csv")
+ROLES = ("user", "admin")
+UNUSABLE_PASSWORD = "!"  # never matches a hash check; the user must reset it
+
+
+class RowError(ValueError):
+    pass
+
+
+# ---------- Reading input ----------
+def read_rows(lines, fmt="ndjson"):
+    """Yield (line number, dict or RowError) from an iterable of text lines."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, RowError(f"invalid JSON: {e}")
+            continue
+        yield number, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+
+def _text(row, key, required=False, default=""):
+    value = row.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise RowError(f"{key} is required")
+        return default
+    if not isinstance(value, (str, int, float)):
+        raise RowError(f"{key} must be text")
+    return str(value).strip()
+
+
+def _list(row, key):
+    """A list column: a JSON array, or in CSV a JSON array or "a | b | c"."""
+    value = row.get(key)
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        if value.lstrip().startswith("["):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise RowError(f"{key} is not a valid JSON array")
+        else:
+            value = value.split("|")
+    if not isinstance(value, list):
+        raise RowError(f"{key} must be a list")
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+# ---------- Careers ----------
+def _clean_career(row):
+    title = _text(row, "title", required=True)
+    return {
+        "title": title,
+        "title_key": normalize_title(title),
+        "description": _text(row, "description", default=None),
+        "steps": json.dumps(_list(row, "steps")),
+        "pitfalls": json.dumps(_list(row, "pitfalls")),
+        "resources": json.dumps(_list(row, "resources")),
+        "source": _text(row, "source", default="curated"),
+    }
+
+
+def _write_careers(rows):
+    keys = [r["title_key"] for r in rows]
+    existing = {k for (k,) in CareerPath.select(CareerPath.title_key)
+                .where(CareerPath.title_key.in_(keys)).tuples()}
+    (CareerPath
+     .insert_many(rows)
+     .on_conflict(conflict_target=[CareerPath.title_key],
+                  preserve=[CareerPath.title, CareerPath.description, CareerPath.steps,
+                            CareerPath.pitfalls, CareerPath.resources, CareerPath.source])
+     .execute())
+    return len(rows) - len(existing), len(existing), []
+
+
+def _export_careers(with_passwords=False):
+    query = CareerPath.select(CareerPath.id, CareerPath.title, CareerPath.description,
+                              CareerPath.steps, CareerPath.pitfalls, CareerPath.resources,
+                              CareerPath.source)
+    for career in _pages(query, CareerPath.id):
+        data = career.to_dict()
+        yield {"title": career.title, "description": career.description,
+               "steps": data["steps"], "pitfalls": data["pitfalls"],
+               "resources": data["resources"], "source": career.source}
+
+
+# ---------- Stories ----------
+def _clean_story(row):
+    tags = ", ".join(_list(row, "tags")) if isinstance(row.get("tags"), list) else _text(row, "tags")
+    return {
+        "email": _text(row, "email", required=True),
+        "title": _text(row, "title", required=True),
+        "story": _text(row, "story", required=True),
+        "lesson": _text(row, "lesson"),
+        "tags": tags,
+    }
+
+
+def _write_stories(rows):
+    errors = []
+    emails = {r["email"] for r in rows}
+    user_ids = {email: uid for uid, email in
+                User.select(User.id, User.email).where(User.email.in_(list(emails))).tuples()}
+
+    resolved = []
+    for r in rows:
+        user_id = user_ids.get(r["email"])
+        if user_id is None:
+            errors.append((r, f"no user with email {r['email']}"))
+            continue
+        resolved.append({"user": user_id, "title": r["title"], "story": r["story"],
+                         "lesson": r["lesson"], "tags": r["tags"]})
+
+    # Natural key -> id of the oldest existing story with that author and title
+    existing = {}
+    if resolved:
+        query = (FailCourse
+                 .select(FailCourse.id, FailCourse.user, FailCourse.title)
+                 .where(FailCourse.user.in_({r["user"] for r in resolved})
+                        & FailCourse.title.in_({r["title"] for r in resolved}))
+                 .order_by(FailCourse.id.desc())
+                 .tuples())
+        existing = {(user_id, title): story_id for story_id, user_id, title in query}
+
+    updates = [dict(r, id=existing[(r["user"], r["title"])]) for r in resolved
+               if (r["user"], r["title"]) in existing]
+    inserts = [r for r in resolved if (r["user"], r["title"]) not in existing]
+    if updates:
+        (FailCourse
+         .insert_many(updates)
+         .on_conflict(conflict_target=[FailCourse.id],
+                      preserve=[FailCourse.story, FailCourse.lesson, FailCourse.tags])
+         .execute())
+    if inserts:
+        FailCourse.insert_many(inserts).execute()
+    return len(inserts), len(updates), errors
+
+
+def _export_stories(with_passwords=False):
+    query = (FailCourse
+             .select(FailCourse.id, User.email, FailCourse.title, FailCourse.story,
+                     FailCourse.lesson, FailCourse.tags)
+             .join(User)
+             .dicts())
+    for story in _pages(query, FailCourse.id):
+        tags = [t.strip() for t in (story["tags"] or "").split(",") if t.strip()]
+        yield {"email": story["email"], "title": story["title"], "story": story["story"],
+               "lesson": story["lesson"], "tags": tags}
+
+
+# ---------- Users ----------
+def _clean_user(row):
+    email = _text(row, "email", required=True)
+    if "@" not in email:
+        raise RowError("email is not valid")
+    role = _text(row, "role", default="user")
+    if role not in ROLES:
+        raise RowError(f"role must be one of {', '.join(ROLES)}")
+    password = _text(row, "password_hash", default=None)
+    user = {
+        "name": _text(row, "name", required=True),
+        "email": email,
+        "bio": _text(row, "bio"),
+        "career": _text(row, "career"),
+        "role": role,
+        "password": password,
+    }
+    if password is None and row.get("password"):
+        user["plain_password"] = str(row["password"])  # hashed per chunk by _hash_users
+    return user
+
+
+def _hash_users(rows):
+    """Hash a chunk's plaintext passwords together, after dedupe and outside its transaction."""
+    plain = [r for r in rows if "plain_password" in r]
+    hashed = hash_passwords([r.pop("plain_password") for r in plain])
+    for row, password in zip(plain, hashed):
+        row["password"] = password
+
+
+def _write_users(rows):
+    emails = [r["email"] for r in rows]
+    existing = {e for (e,) in User.select(User.email).where(User.email.in_(emails)).tuples()}
+    update = {User.name: EXCLUDED.name, User.bio: EXCLUDED.bio, User.career: EXCLUDED.career,
+              User.role: EXCLUDED.role, User.version: User.version + 1}  # version: user caches
+
+    # Rows without a password keep the stored one on update
+    with_password = [r for r in rows if r["password"]]
+    without = [dict(r, password=UNUSABLE_PASSWORD) for r in rows if not r["password"]]
+    if with_password:
+        (User.insert_many(with_password)
+         .on_conflict(conflict_target=[User.email], update={**update, User.password: EXCLUDED.password})
+         .execute())
+    if without:
+        User.insert_many(without).on_conflict(conflict_target=[User.email], update=update).execute()
+    return len(rows) - len(existing), len(existing), []
+
+
+def _export_users(with_passwords=False):
+    query = User.select(User.id, User.name, User.email, User.bio, User.career, User.role,
+                        User.password)
+    for user in _pages(query, User.id):
+        row = {"name": user.name, "email": user.email, "bio": user.bio,
+               "career": user.career, "role": user.role}
+        if with_passwords:
+            row["password_hash"] = user.password
+        yield row
+
+
+# kind -> (clean, write, export, natural key of a cleaned row, search index to optimize,
+#          prepare run on each deduped chunk before its transaction)
+KINDS = {
+    "careers": (_clean_career, _write_careers, _export_careers, lambda r: r["title_key"],
+                CareerPathIndex, None),
+    "stories": (_clean_story, _write_stories, _export_stories, lambda r: (r["email"], r["title"]),
+                FailCourseIndex, None),
+    "users": (_clean_user, _write_users, _export_users, lambda r: r["email"], None, _hash_users),
+}
+
+
+# ---------- Import ----------
+def import_rows(kind, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Load (line number, row) pairs from read_rows(); returns a summary with per-row errors.
+
+    A chunk that fails in the database rolls back alone and its rows are reported.
+    """
+    clean, write, _, natural_key, index, prepare = KINDS[kind]
+    report = {"kind": kind, "rows": 0, "created": 0, "updated": 0, "duplicates": 0, "failed": 0,
+              "errors": []}
+
+    def fail(number, message):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": number, "error": message})
+
+    def flush(chunk):
+        # Later rows win over earlier ones with the same key
+        unique = list({natural_key(row): (number, row) for number, row in chunk}.values())
+        report["duplicates"] += len(chunk) - len(unique)
+        chunk = unique
+        lines = {id(row): number for number, row in chunk}
+        try:
+            if prepare is not None:
+                prepare([row for _, row in chunk])
+            with db.atomic(lock_type='IMMEDIATE'):
+                created, updated, errors = write([row for _, row in chunk])
+        except Exception as e:
+            for number, _ in chunk:
+                fail(number, f"chunk not written: {e}")
+            return
+        report["created"] += created
+        report["updated"] += updated
+        for row, message in errors:
+            fail(lines[id(row)], message)
+
+    started = time.perf_counter()
+    chunk = []
+    for number, row in rows:
+        report["rows"] += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            chunk.append((number, clean(row)))
+        except RowError as e:
+            fail(number, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    # The FTS triggers kept the index in sync row by row; merge its segments once
+    if index is not None and report["created"] + report["updated"]:
+        index.optimize()
+    db.execute_sql("PRAGMA optimize")
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+# ---------- Export ----------
+def _pages(query, id_field):
+    last = 0
+    while True:
+        page = list(query.where(id_field > last).order_by(id_field).limit(EXPORT_PAGE_SIZE))
+        if not page:
+            return
+        yield from page
+        last = page[-1]["id"] if isinstance(page[-1], dict) else page[-1].id
+
+
+def export_rows(kind, with_passwords=False):
+    return KINDS[kind][2](with_passwords)
+
+
+def export_lines(kind, fmt="ndjson", with_passwords=False):
+    """Yield the export as NDJSON or CSV text; list columns become JSON arrays in CSV."""
+    rows = export_rows(kind, with_passwords)
+    if fmt != "csv":
+        for row in rows:
+            yield json.dumps(row) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow({k: json.dumps(v) if isinstance(v, list) else v for k, v in row.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("path", nargs="?", default="-", help="input file for import ('-' = stdin)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("-o", "--output", help="export to this file instead of stdout")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--with-passwords", action="store_true", help="export users' password hashes")
+    args = parser.parse_args()
+
+    with db.connection_context():
+        if args.action == "import":
+            fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+            source = (open(args.path, encoding="utf-8-sig", newline="") if args.path != "-"
+                      else io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline=""))
+            with source:
+                report = import_rows(args.kind, read_rows(source, fmt), args.chunk_size)
+            for error in report["errors"]:
+                print(f"❌ line {error['line']}: {error['error']}", file=sys.stderr)
+            print(f"✅ {args.kind}: {report['rows']} rows, {report['created']} created, "
+                  f"{report['updated']} updated, {report['duplicates']} duplicates, "
+                  f"{report['failed']} failed in {report['seconds']}s")
+            sys.exit(1 if report["failed"] else 0)
+        else:
+            fmt = args.format or ("csv" if (args.output or "").endswith(".csv") else "ndjson")
+            out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+            with out:
+                for text in export_lines(args.kind, fmt, args.with_passwords):
+                    out.write(text)
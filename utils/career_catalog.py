@@ -0,0 +1,70 @@
+import datetime
+import json
+
+from utils.ai_utils import get_ai_guidance
+from utils.ai_cache import cache_ttl_for
+from utils.prompts import career_details_prompt, parse_career_details, is_valid_career_details
+from models.careerpath import CareerPath, normalize_title
+
+# Write-through catalog: an AI answer for an unknown career is stored as a
+# CareerPath row, so the next lookup for that title is one indexed read.
+
+AI_SOURCE = "ai"
+
+
+def find_career(title):
+    return CareerPath.get_or_none(CareerPath.title_key == normalize_title(title))
+
+
+def store_career(title, details, replace=False):
+    """Insert AI-generated details for title; replace=True overwrites an existing row."""
+    key = normalize_title(title)
+    fields = {
+        CareerPath.description: details["description"],
+        CareerPath.steps: json.dumps(details["steps"]),
+        CareerPath.pitfalls: json.dumps(details["pitfalls"]),
+        CareerPath.resources: json.dumps(details["resources"]),
+        CareerPath.source: AI_SOURCE,
+        CareerPath.generated_at: datetime.datetime.utcnow(),
+    }
+    query = CareerPath.insert({**fields, CareerPath.title: " ".join(title.split()),
+                               CareerPath.title_key: key})
+    if replace:
+        query = query.on_conflict(conflict_target=[CareerPath.title_key], update=fields)
+    else:
+        # Another request stored it first; keep that row
+        query = query.on_conflict_ignore()
+    query.execute()
+    return CareerPath.get(CareerPath.title_key == key)
+
+
+def store_ai_text(title, text, replace=False):
+    """Parse an AI reply and store it; returns the CareerPath, or None if it wasn't usable."""
+    try:
+        details = parse_career_details(text)
+    except ValueError as e:
+        print(f"⚠️ Not storing AI career details for {title!r}: {e}")
+        return None
+    return store_career(title, details, replace=replace)
+
+
+def generate_career(title, use_cache=True, replace=False):
+    """Ask the AI about title and store the result.
+
+    Returns (career, text): career is None when the reply couldn't be parsed,
+    in which case text is the raw reply.
+    """
+    text = get_ai_guidance(career_details_prompt(title), expect_json=False,
+                           cache_ttl=cache_ttl_for("career-details"),
+                           use_cache=use_cache, profile="career-details",
+                           validate=is_valid_career_details)
+    return store_ai_text(title, text, replace=replace), text
+
+
+def career_result(title, text):
+    """What /career-details answers for a generated reply: the stored career,
+    or the raw text when it couldn't be parsed."""
+    career = store_ai_text(title, text)
+    if career:
+        return career.to_dict()
+    return {"title": title, "description": "(AI Generated)", "ai_result": text}
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.singleflight import SingleFlight
+
+# Career-plan PDFs are rendered in a process pool and stored under a hash of the
+# plan, so a plan that hasn't changed is served from disk instead of re-rendered.
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(os.getcwd(), "uploads", "career_plans"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))      # 0 = render inline
+PDF_RENDER_MAX_QUEUE = int(os.getenv("PDF_RENDER_MAX_QUEUE", "16"))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "30"))
+PDF_RENDER_RETRY_AFTER = 2  # seconds, sent with 503s
+
+# Bump when the layout changes so cached files are rendered again
+PDF_TEMPLATE_VERSION = 1
+
+
+class RenderOverloaded(Exception):
+    """Too many renders queued; the caller should answer 503 instead of waiting."""
+
+
+# ---------- Plan -> cache key ----------
+def plan_data(career):
+    """The fields of a saved career (SavedCareer.to_dict()) that end up in the PDF."""
+    return {
+        "title": career.get("title") or "",
+        "description": career.get("description") or "",
+        "steps": career.get("steps") or [],
+        "pitfalls": career.get("pitfalls") or [],
+        "resources": career.get("resources") or [],
+    }
+
+
+def plan_hash(plan):
+    payload = json.dumps({"template": PDF_TEMPLATE_VERSION, "plan": plan}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_path(digest):
+    return os.path.join(PDF_CACHE_DIR, f"{digest}.pdf")
+
+
+# ---------- Rendering (runs in the pool) ----------
+_PUNCTUATION = str.maketrans({
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "–": "-", "—": "-", "•": "-", "…": "...", " ": " ",
+})
+
+
+def _latin1(value):
+    # fpdf 1.7's core fonts only cover Latin-1
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return value.translate(_PUNCTUATION).encode("latin-1", "replace").decode("latin-1")
+
+
+def render_plan_pdf(plan, path):
+    """Write plan as a PDF to path, atomically; returns the file size."""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 18)
+    pdf.multi_cell(0, 10, _latin1(plan["title"]))
+    if plan["description"]:
+        pdf.set_font("Arial", "", 11)
+        pdf.multi_cell(0, 6, _latin1(plan["description"]))
+
+    for heading, items, numbered in (("Steps", plan["steps"], True),
+                                     ("Pitfalls to avoid", plan["pitfalls"], False),
+                                     ("Resources", plan["resources"], False)):
+        if not items:
+            continue
+        pdf.ln(4)
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 9, heading, ln=1)
+        pdf.set_font("Arial", "", 11)
+        for i, item in enumerate(items, 1):
+            pdf.multi_cell(0, 6, _latin1(f"{i}. " if numbered else "- ") + _latin1(item))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    pdf.output(tmp, "F")
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+# ---------- Render pool ----------
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+pdf_single_flight = SingleFlight(lock_dir=os.path.join(PDF_CACHE_DIR, ".locks"))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS)
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _release(_future=None):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _render(plan, path):
+    """Render in the pool, refusing work once the queue is full."""
+    if PDF_RENDER_WORKERS <= 0:
+        return render_plan_pdf(plan, path)
+
+    global _pending
+    with _pending_lock:
+        if _pending >= PDF_RENDER_WORKERS + PDF_RENDER_MAX_QUEUE:
+            raise RenderOverloaded("PDF render queue is full")
+        _pending += 1
+
+    try:
+        future = _get_executor().submit(render_plan_pdf, plan, path)
+    except (BrokenProcessPool, RuntimeError):
+        _reset_executor()
+        _release()
+        raise RenderOverloaded("PDF render pool unavailable")
+    future.add_done_callback(_release)
+
+    try:
+        return future.result(timeout=PDF_RENDER_TIMEOUT)
+    except FutureTimeout:
+        raise RenderOverloaded("PDF render timed out")
+    except BrokenProcessPool:
+        _reset_executor()
+        raise RenderOverloaded("PDF render pool crashed")
+
+
+# ---------- Cache ----------
+def _cached(path):
+    try:
+        os.utime(path)  # mtime doubles as last use for eviction
+        return path
+    except FileNotFoundError:
+        return None
+
+
+def evict(max_bytes=PDF_CACHE_MAX_BYTES, keep=None):
+    """Delete the least recently used PDFs until the cache fits in max_bytes."""
+    entries = []
+    with os.scandir(PDF_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def get_plan_pdf(plan):
+    """Path of the PDF for plan, rendering it only if no cached copy exists.
+
+    Returns (path, digest); the digest doubles as the file's ETag.
+    """
+    digest = plan_hash(plan)
+    path = cache_path(digest)
+    if _cached(path):
+        return path, digest
+
+    def render():
+        _render(plan, path)
+        try:
+            evict(keep=path)
+        except OSError as e:
+            print("⚠️ PDF cache eviction failed:", e)
+        return path
+
+    # One render per plan at a time, across workers too; later callers find the file
+    pdf_single_flight.do(digest, render, recheck=lambda: _cached(path))
+    return path, digest
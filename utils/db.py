@@ -1,4 +1,99 @@
+from contextlib import contextmanager
 from peewee import SqliteDatabase
+from playhouse.pool import PooledSqliteDatabase
 import os
+import time
 
-db = SqliteDatabase(os.path.join(os.getcwd(), 'failed.db'))
+DB_PATH = os.getenv("DB_PATH", os.path.join(os.getcwd(), 'failed.db'))
+DB_POOL = os.getenv("DB_POOL", "1") != "0"
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "16"))
+DB_STALE_TIMEOUT = int(os.getenv("DB_STALE_TIMEOUT", "300"))
+
+# Applied to every new connection. WAL lets readers run alongside the single writer.
+DB_PRAGMAS = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "wal"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "normal"),
+    "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT", "5000")),          # ms
+    "cache_size": int(os.getenv("DB_CACHE_SIZE", "-16000")),            # negative = KiB
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024))),  # bytes
+}
+
+# Called as hook(sql, seconds) after every statement; utils/metrics.py adds one
+query_hooks = []
+
+
+class TimedQueriesMixin:
+    """Times each statement and passes it to query_hooks."""
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        if not query_hooks:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            for hook in query_hooks:
+                hook(sql, elapsed)
+
+
+class TimedPooledSqliteDatabase(TimedQueriesMixin, PooledSqliteDatabase):
+    pass
+
+
+class TimedSqliteDatabase(TimedQueriesMixin, SqliteDatabase):
+    pass
+
+
+# Connections open lazily on a thread's first query and go back to the pool
+# when the request tears down, so routes that never query never touch SQLite.
+if DB_POOL:
+    db = TimedPooledSqliteDatabase(
+        DB_PATH,
+        pragmas=DB_PRAGMAS,
+        max_connections=DB_MAX_CONNECTIONS,
+        stale_timeout=DB_STALE_TIMEOUT,
+        check_same_thread=False
+    )
+else:
+    db = TimedSqliteDatabase(DB_PATH, pragmas=DB_PRAGMAS)
+
+
+def ensure_columns(model):
+    """Add any columns declared on model that its existing table is missing."""
+    from playhouse.migrate import SqliteMigrator, migrate
+
+    table = model._meta.table_name
+    if not db.table_exists(table):
+        return
+    existing = {c.name for c in db.get_columns(table)}
+    missing = [f for f in model._meta.sorted_fields if f.column_name not in existing]
+    if missing:
+        # SQLite reads an unknown quoted column as a string literal, so a
+        # create_tables(safe=True) run before this indexed a constant; drop it
+        for f in missing:
+            if f.index or f.unique:
+                db.execute_sql(f'DROP INDEX IF EXISTS "{table}_{f.column_name}"')
+        migrator = SqliteMigrator(db)
+        migrate(*[migrator.add_column(table, f.column_name, f) for f in missing])
+
+
+@contextmanager
+def capture_queries():
+    """Collect (sql, params) for every statement sent to db inside the block.
+
+    Patches this db instance, so it's meant for single-threaded diagnostics
+    (query-plan checks, benchmark query counts), not for live traffic.
+    """
+    queries = []
+    execute_sql = db.execute_sql
+
+    def recording(sql, params=None, *args, **kwargs):
+        queries.append((sql, params))
+        return execute_sql(sql, params, *args, **kwargs)
+
+    db.execute_sql = recording
+    try:
+        yield queries
+    finally:
+        del db.execute_sql
@@ -0,0 +1,132 @@
+import datetime
+
+from utils.db import db
+from utils.pagination import keyset
+from models.user import User
+from models.question import Question
+from models.answer import Answer
+
+# Q&A forum. Question.answer_count is updated in the same transaction as every
+# answer insert, so the feed reads counts straight off the question rows.
+FEED_LATEST_ANSWERS = 3    # answers shown under each question in the feed
+MAX_TEXT_LENGTH = 5000
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def question_dict(row):
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "user_id": row["user_id"],
+        "user": row["user"],
+        "answer_count": row["answer_count"],
+        "created_at": _iso(row["created_at"]),
+        "last_answer_at": _iso(row["last_answer_at"])
+    }
+
+
+def _answer_dict(row):
+    return {
+        "id": row["id"],
+        "question_id": row["question_id"],
+        "text": row["text"],
+        "user_id": row["user_id"],
+        "user": row["user"],
+        "created_at": _iso(row["created_at"])
+    }
+
+
+def _questions():
+    return (Question
+            .select(Question.id, Question.text, Question.answer_count, Question.created_at,
+                    Question.last_answer_at, User.id.alias("user_id"), User.name.alias("user"))
+            .join(User)
+            .dicts())
+
+
+def _answers():
+    return (Answer
+            .select(Answer.id, Answer.question.alias("question_id"), Answer.text, Answer.created_at,
+                    User.id.alias("user_id"), User.name.alias("user"))
+            .join(User)
+            .dicts())
+
+
+# ---------- Writes ----------
+def ask_question(user_id, text):
+    return Question.create(user=user_id, text=text)
+
+
+def post_answer(question_id, user_id, text):
+    """Add an answer and bump the question's count together; None if the question is gone."""
+    now = datetime.datetime.utcnow()
+    with db.atomic():
+        # The UPDATE comes first: it takes the write lock and confirms the question exists
+        updated = (Question
+                   .update(answer_count=Question.answer_count + 1, last_answer_at=now)
+                   .where(Question.id == question_id)
+                   .execute())
+        if not updated:
+            return None
+        return Answer.create(question=question_id, user=user_id, text=text, created_at=now)
+
+
+# ---------- Reads ----------
+def latest_answers(question_ids, per_question=FEED_LATEST_ANSWERS):
+    """{question id: newest answers first} for a page of questions, in one query.
+
+    The correlated subquery reads at most per_question index entries per
+    question, so a huge thread costs the feed no more than a small one.
+    """
+    if not question_ids or per_question <= 0:
+        return {}
+    Latest = Answer.alias()
+    newest = (Latest
+              .select(Latest.id)
+              .where(Latest.question == Question.id)
+              .order_by(Latest.id.desc())
+              .limit(per_question))
+    rows = (Question
+            .select(Question.id.alias("question_id"), Answer.id, Answer.text, Answer.created_at,
+                    User.id.alias("user_id"), User.name.alias("user"))
+            .join(Answer, on=Answer.id.in_(newest))
+            .join(User, on=(Answer.user == User.id))
+            .where(Question.id.in_(question_ids))
+            .order_by(Question.id, Answer.id.desc())
+            .dicts())
+
+    grouped = {qid: [] for qid in question_ids}
+    for row in rows:
+        grouped[row["question_id"]].append(_answer_dict(row))
+    return grouped
+
+
+def question_feed(cursor=None, limit=20, per_question=FEED_LATEST_ANSWERS):
+    """Newest questions first, each with its answer count and latest answers.
+
+    Two queries per page whatever its size. Returns (items, next_cursor).
+    """
+    rows = list(keyset(_questions(), Question.id, cursor, limit, descending=True))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    answers = latest_answers([r["id"] for r in rows], per_question)
+    items = [dict(question_dict(r), latest_answers=answers[r["id"]]) for r in rows]
+    next_cursor = str(rows[-1]["id"]) if has_more else None
+    return items, next_cursor
+
+
+def get_question(question_id):
+    return _questions().where(Question.id == question_id).first()
+
+
+def thread_answers(question_id, cursor=None, limit=20):
+    """One page of a thread's answers, oldest first. Returns (answers, next_cursor)."""
+    rows = list(keyset(_answers().where(Answer.question == question_id), Answer.id, cursor, limit))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = str(rows[-1]["id"]) if has_more else None
+    return [_answer_dict(r) for r in rows], next_cursor
@@ -0,0 +1,199 @@
+import functools
+import gzip
+import hashlib
+import os
+import zlib
+
+from flask import request, make_response
+from utils.db import db
+from models.tableversion import TableVersion
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Conditional GETs for the catalog routes. Triggers bump a per-table version on
+# every write, so a route's ETag comes from those versions and the request URL:
+# one primary-key read decides a 304 before any row is fetched.
+
+# Cache-Control for catalog responses: browsers revalidate every time (cheap
+# 304s), a CDN may serve a copy for CATALOG_S_MAXAGE seconds
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "0"))
+CATALOG_S_MAXAGE = int(os.getenv("CATALOG_S_MAXAGE", "30"))
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "60"))
+
+# Compression settings
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))          # gzip 1-9
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))           # 0-11
+COMPRESS_STREAM_BUFFER = 16 * 1024
+COMPRESSIBLE_TYPES = {"application/json"}
+
+# table -> columns whose updates count as a change (None = any column)
+VERSIONED_TABLES = {
+    "careerpath": None,
+    "failcourse": None,
+    "question": None,            # answer_count and last_answer_at change with every answer
+    # /stories shows names. User saves only dirty columns, so bio/career edits
+    # and password rehashes leave this version alone
+    "user": ["name", "email"],
+}
+
+
+# ---------- Table versions ----------
+def ensure_version_triggers():
+    """Create the table_versions rows and the triggers that bump them."""
+    with db.atomic():
+        TableVersion.create_table(safe=True)
+        for table, columns in VERSIONED_TABLES.items():
+            TableVersion.insert(table=table).on_conflict_ignore().execute()
+            bump = (f"BEGIN UPDATE table_versions SET version = version + 1, "
+                    f"changed_at = CURRENT_TIMESTAMP WHERE \"table\" = '{table}'; END;")
+            of_columns = f" OF {', '.join(columns)}" if columns else ""
+            for suffix, event in (("ai", "INSERT"), ("ad", "DELETE"), ("au", "UPDATE" + of_columns)):
+                db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} '
+                               f'AFTER {event} ON "{table}" {bump}')
+
+
+def table_versions(*tables):
+    """{table: (version, changed_at)} for the given tables, in one query."""
+    rows = (TableVersion
+            .select(TableVersion.table, TableVersion.version, TableVersion.changed_at)
+            .where(TableVersion.table.in_(tables))
+            .tuples())
+    return {table: (version, changed_at) for table, version, changed_at in rows}
+
+
+def _matches(etag):
+    # Weak comparison (RFC 9110), so a CDN that weakened or re-encoded our tag still matches
+    inm = request.if_none_match
+    return inm.star_tag or any(inm.contains_weak(etag + suffix) for suffix in ("", "-gzip", "-br"))
+
+
+def cache_headers(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = (
+        f"public, max-age={CATALOG_MAX_AGE}, s-maxage={CATALOG_S_MAXAGE}, "
+        f"stale-while-revalidate={CATALOG_STALE_WHILE_REVALIDATE}")
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def make_etag(*parts):
+    """ETag for this request's URL plus whatever version info the caller passes."""
+    key = f"{request.path}?{sorted(request.args.items(multi=True))}|" + ";".join(map(str, parts))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def not_modified(etag, last_modified=None):
+    """True when the client's If-None-Match (or, failing that, If-Modified-Since) still holds."""
+    if request.if_none_match:
+        return _matches(etag)
+    return bool(last_modified and request.if_modified_since
+                and last_modified.replace(microsecond=0)
+                <= request.if_modified_since.replace(tzinfo=None))
+
+
+def conditional(*tables):
+    """Route decorator: ETag/Last-Modified from the tables' versions, 304 when unchanged.
+
+    Only 200 responses get validators and cache headers; errors go out as before.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                versions = table_versions(*tables)
+            except Exception as e:
+                print("⚠️ Table versions unavailable, serving uncached:", e)
+                return view(*args, **kwargs)
+
+            etag = make_etag(*(f"{t}={versions.get(t, (0, None))[0]}" for t in tables))
+            changed = [c for _, c in versions.values() if c]
+            last_modified = max(changed) if changed else None
+
+            if not_modified(etag, last_modified):
+                return cache_headers(make_response("", 304), etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                cache_headers(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+# ---------- Compression ----------
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    compress, finish = _compressor(encoding)
+    pending, size = [], 0
+    try:
+        for chunk in chunks:
+            # Rows arrive a few hundred bytes at a time; batch them into fewer compressor calls
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= COMPRESS_STREAM_BUFFER:
+                data = compress(b"".join(pending))
+                pending, size = [], 0
+                if data:
+                    yield data
+        yield compress(b"".join(pending)) + finish()
+    finally:
+        # Closing the inner iterator ends stream_with_context's request context
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def compress_response(response):
+    """after_request hook: gzip/br-encode JSON bodies the client accepts.
+
+    Buffered bodies under COMPRESS_MIN_BYTES are left alone; streamed ones are
+    compressed as they are generated.
+    """
+    if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_TYPES
+            or "Content-Encoding" in response.headers or request.method == "HEAD"):
+        return response
+    encoding = _choose_encoding()
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        if encoding == "br":
+            response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, COMPRESS_LEVEL, mtime=0))
+
+    response.headers["Content-Encoding"] = encoding
+    # Strong validators are per representation, so the encoded body gets its own tag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
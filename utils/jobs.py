@@ -0,0 +1,352 @@
+"""Durable queue for long AI generations, stored in failed.db (ai_jobs).
+
+Routes submit a job and answer 202 with its id; separate worker processes
+claim jobs under a lease, run them and keep the result for JOB_RESULT_TTL
+seconds (idle workers purge expired ones). A worker that dies mid-job stops
+renewing its lease, so the job is claimed again once the lease lapses (up to
+max_attempts). Submitting the same kind and params while a job is pending, or
+while its result is still kept, returns that job instead of a new one.
+
+    python -m utils.jobs worker --concurrency 4   # run workers
+    python -m utils.jobs purge                    # delete expired jobs
+"""
+import argparse
+import datetime
+import hashlib
+import ipaddress
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+
+from dotenv import load_dotenv
+load_dotenv()  # the CLI reads DB_PATH and friends from .env like the app does
+
+from utils.db import db
+from models.aijob import AIJob
+
+# Queue settings
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))               # worker processes
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))         # seconds, doubled per attempt
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", str(3600)))           # seconds
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))         # idle worker sleep
+JOB_PURGE_INTERVAL = int(os.getenv("JOB_PURGE_INTERVAL", "300"))       # seconds between purges
+JOB_SLOT_TIMEOUT = float(os.getenv("JOB_SLOT_TIMEOUT", "60"))          # wait for an upstream AI slot
+JOB_WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))
+# Comma-separated hosts webhooks may be sent to; empty turns webhooks off
+JOB_WEBHOOK_HOSTS = {h.strip() for h in os.getenv("JOB_WEBHOOK_HOSTS", "").split(",") if h.strip()}
+
+
+# ---------- Job kinds ----------
+def _ai_careers(params):
+    from utils.ai_utils import get_ai_guidance
+    from utils.ai_cache import cache_ttl_for
+    from utils.ai_profiles import profile_for
+    from utils.prompts import career_ideas_prompt, parse_career_ideas
+
+    response = get_ai_guidance(career_ideas_prompt(params.get("keyword") or "technology"),
+                               expect_json=False, cache_ttl=cache_ttl_for("ai-careers"),
+                               use_cache=not params.get("fresh"), profile=profile_for("ai-careers"))
+    # Raises on a failed call (get_ai_guidance returns an error message), so the job is retried
+    return {"careers": parse_career_ideas(response)}
+
+
+def _ai_stories(params):
+    from utils.ai_utils import get_ai_failure_stories
+    from utils.ai_cache import cache_ttl_for
+
+    stories = get_ai_failure_stories(cache_ttl=cache_ttl_for("ai-stories"),
+                                     use_cache=not params.get("fresh"))
+    if not stories:
+        # get_ai_guidance swallows upstream errors; fail so the attempt is retried
+        raise ValueError("No valid stories in the AI response")
+    return {"stories": stories}
+
+
+# kind -> fn(params) returning a JSON-serializable result
+JOB_KINDS = {
+    "ai-careers": _ai_careers,
+    "ai-stories": _ai_stories,
+}
+
+
+# ---------- Submitting ----------
+def dedupe_key(kind, params):
+    # fresh only changes how the job runs, not what it is
+    key_params = {k: v for k, v in params.items() if k != "fresh"}
+    payload = json.dumps({"kind": kind, "params": key_params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _public_host(host):
+    """True if host resolves, and only to public unicast addresses."""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except (socket.gaierror, UnicodeError):
+        return False
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        # is_global rules out private, loopback, link-local and reserved ranges
+        if not address.is_global or address.is_multicast:
+            return False
+    return bool(infos)
+
+
+def valid_webhook(url):
+    """Webhooks go only to allowlisted hosts, and only while they resolve to public addresses."""
+    parsed = urlparse(url or "")
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    return parsed.hostname in JOB_WEBHOOK_HOSTS and _public_host(parsed.hostname)
+
+
+def submit_job(kind, params, webhook_url=None):
+    """Queue a job, or return the pending/finished one with the same kind and params.
+
+    Returns (job, created). A fresh=True job only reuses queued or running work.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    key = dedupe_key(kind, params)
+    now = datetime.datetime.utcnow()
+    reusable = ['queued', 'running'] if params.get("fresh") else ['queued', 'running', 'done']
+
+    # IMMEDIATE: look up then insert, without another worker queuing the same job in between
+    with db.atomic(lock_type='IMMEDIATE'):
+        existing = (AIJob
+                    .select()
+                    .where((AIJob.dedupe_key == key)
+                           & AIJob.status.in_(reusable)
+                           & ((AIJob.expires_at.is_null()) | (AIJob.expires_at > now)))
+                    .order_by(AIJob.created_at.desc())
+                    .first())
+        if existing:
+            return existing, False
+        job = AIJob.create(id=uuid.uuid4().hex, kind=kind, dedupe_key=key,
+                           params=json.dumps(params), max_attempts=JOB_MAX_ATTEMPTS,
+                           webhook_url=webhook_url, created_at=now, run_after=now)
+    return job, True
+
+
+def get_job(job_id):
+    job = AIJob.get_or_none(AIJob.id == job_id)
+    if job and job.expires_at and job.expires_at <= datetime.datetime.utcnow():
+        return None
+    return job
+
+
+# ---------- Claiming ----------
+def claim_job(worker_id):
+    """Lease the oldest runnable job to worker_id; None when there is nothing to do.
+
+    Runnable means queued and due, or running with a lapsed lease (its worker died).
+    """
+    now = datetime.datetime.utcnow()
+    abandoned = []
+    with db.atomic(lock_type='IMMEDIATE'):
+        while True:
+            job = (AIJob
+                   .select()
+                   .where(((AIJob.status == 'queued') & (AIJob.run_after <= now))
+                          | ((AIJob.status == 'running') & (AIJob.lease_until < now)))
+                   .order_by(AIJob.run_after)
+                   .first())
+            if job is None or job.status == 'queued' or job.attempts < job.max_attempts:
+                break
+            _finish(job, 'failed', error="Worker lost during the last attempt", now=now)
+            abandoned.append(job)
+
+        if job is not None:
+            job.status = 'running'
+            job.attempts += 1
+            job.worker = worker_id
+            job.lease_until = now + datetime.timedelta(seconds=JOB_LEASE_SECONDS)
+            job.save()
+
+    for lost in abandoned:
+        if lost.webhook_url:
+            send_webhook(lost)
+    return job
+
+
+def renew_lease(job, worker_id):
+    """Extend the lease; False if another worker has taken the job over."""
+    lease_until = datetime.datetime.utcnow() + datetime.timedelta(seconds=JOB_LEASE_SECONDS)
+    return bool(AIJob
+                .update(lease_until=lease_until)
+                .where((AIJob.id == job.id) & (AIJob.worker == worker_id)
+                       & (AIJob.status == 'running'))
+                .execute())
+
+
+def _finish(job, status, result=None, error=None, now=None):
+    now = now or datetime.datetime.utcnow()
+    job.status = status
+    job.result = json.dumps(result) if result is not None else None
+    job.error = error
+    job.lease_until = None
+    job.finished_at = now
+    job.expires_at = now + datetime.timedelta(seconds=JOB_RESULT_TTL)
+    job.save()
+
+
+def complete_job(job, worker_id, result=None, error=None):
+    """Record the outcome of an attempt; a failed attempt is retried with backoff if any remain.
+
+    Returns the final status, or None if the lease was lost to another worker.
+    """
+    now = datetime.datetime.utcnow()
+    with db.atomic(lock_type='IMMEDIATE'):
+        current = AIJob.get_or_none((AIJob.id == job.id) & (AIJob.worker == worker_id)
+                                    & (AIJob.status == 'running'))
+        if current is None:
+            return None
+        if error is None:
+            _finish(current, 'done', result=result, now=now)
+        elif current.attempts < current.max_attempts:
+            backoff = JOB_RETRY_BACKOFF * 2 ** (current.attempts - 1)
+            current.status = 'queued'
+            current.error = error
+            current.lease_until = None
+            current.run_after = now + datetime.timedelta(seconds=backoff)
+            current.save()
+        else:
+            _finish(current, 'failed', error=error, now=now)
+    job.__data__.update(current.__data__)
+    return current.status
+
+
+def purge_expired():
+    """Delete jobs whose results are past their TTL; returns how many."""
+    return AIJob.delete().where(AIJob.expires_at <= datetime.datetime.utcnow()).execute()
+
+
+# ---------- Webhooks ----------
+def send_webhook(job):
+    # Checked again at send time: the host may resolve differently than at submit
+    if not valid_webhook(job.webhook_url):
+        print(f"⚠️ Webhook for job {job.id} skipped: {job.webhook_url} is not allowed")
+        return
+    try:
+        requests.post(job.webhook_url, json=job.to_dict(), timeout=JOB_WEBHOOK_TIMEOUT,
+                      allow_redirects=False)
+    except requests.RequestException as e:
+        print(f"⚠️ Webhook for job {job.id} failed:", e)
+
+
+# ---------- Worker ----------
+class _Heartbeat(threading.Thread):
+    """Renews a job's lease while it runs, so only a dead worker's jobs are reclaimed."""
+
+    def __init__(self, job, worker_id):
+        super().__init__(name=f"lease-{job.id}", daemon=True)
+        self.job = job
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(JOB_LEASE_SECONDS / 3):
+            try:
+                with db.connection_context():
+                    if not renew_lease(self.job, self.worker_id):
+                        return
+            except Exception as e:
+                print(f"⚠️ Lease renewal for job {self.job.id} failed:", e)
+
+
+def run_job(job, worker_id):
+    heartbeat = _Heartbeat(job, worker_id)
+    heartbeat.start()
+    started = time.perf_counter()
+    result, error = None, None
+    try:
+        result = JOB_KINDS[job.kind](json.loads(job.params))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        heartbeat.stopped.set()
+
+    status = complete_job(job, worker_id, result=result, error=error)
+    print(f"🧵 Job {job.id} ({job.kind}) attempt {job.attempts}: "
+          f"{status or 'lease lost'} in {time.perf_counter() - started:.1f}s"
+          + (f" - {error}" if error else ""))
+    if status in ('done', 'failed') and job.webhook_url:
+        send_webhook(job)
+
+
+def work(stop=None):
+    """Claim and run jobs until stop is set."""
+    stop = stop or threading.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    last_purge = 0.0
+    while not stop.is_set():
+        try:
+            with db.connection_context():
+                job = claim_job(worker_id)
+                if job is None and time.time() - last_purge > JOB_PURGE_INTERVAL:
+                    last_purge = time.time()
+                    purge_expired()
+        except Exception as e:
+            print("⚠️ Claiming a job failed:", e)
+            job = None
+        if job is None:
+            stop.wait(JOB_POLL_INTERVAL)
+            continue
+        with db.connection_context():
+            run_job(job, worker_id)
+
+
+def _worker_process():
+    from utils.rate_limit import upstream_slots
+    # Nobody is holding a connection open here, so queue behind web traffic instead of failing
+    upstream_slots.timeout = JOB_SLOT_TIMEOUT
+
+    stop = threading.Event()
+    # Finish the job in hand on SIGTERM/SIGINT; the lease covers a hard kill
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    work(stop)
+
+
+def run_workers(concurrency):
+    """Run concurrency worker processes, restarting any that die, until SIGTERM/SIGINT."""
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    processes = []
+    while not stopping.is_set():
+        processes = [p for p in processes if p.is_alive()]
+        for _ in range(concurrency - len(processes)):
+            process = multiprocessing.Process(target=_worker_process, name="ai-job-worker")
+            process.start()
+            processes.append(process)
+        stopping.wait(1)
+
+    for process in processes:
+        process.terminate()  # SIGTERM: finish the current job, then exit
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="AI job queue")
+    parser.add_argument("command", choices=["worker", "purge"])
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        print(f"🧵 Starting {args.concurrency} job worker(s)")
+        run_workers(args.concurrency)
+    else:
+        with db.connection_context():
+            print(f"🧹 Purged {purge_expired()} expired job(s)")
@@ -0,0 +1,136 @@
+import json
+
+
+class JSONArrayParser:
+    """Incrementally pull elements out of the first top-level JSON array in a text stream.
+
+    feed() takes chunks as they arrive and returns every element completed so far,
+    so callers can act on item 1 while item 6 is still being generated. Each
+    element is decoded on its own: a malformed one is counted in `errors` and
+    skipped, and the rest still come through. Text before the array (prose, code
+    fences) and after it is ignored. The scan is a single pass with no backtracking.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.elem_start = None
+        self.errors = 0
+        self.emitted = 0
+
+    def feed(self, text):
+        if self.done or not text:
+            return []
+        self.buf += text
+        items = []
+        buf = self.buf
+
+        for i in range(self.pos, len(buf)):
+            c = buf[i]
+
+            if not self.started:
+                if c == "[":
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+                continue
+
+            if c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.elem_start is None:
+                    self.elem_start = i
+            elif c in "{[":
+                if self.depth == 1 and self.elem_start is None:
+                    self.elem_start = i
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    # End of the array; flush a trailing scalar element
+                    self._emit(buf, i, items)
+                    if not self.emitted:
+                        # Bracketed prose like "[note]", not the payload; keep looking
+                        self.started = False
+                        continue
+                    self.done = True
+                    self.pos = i + 1
+                    return items
+                if self.depth == 1 and self.elem_start is not None and buf[self.elem_start] in "{[":
+                    self._emit(buf, i + 1, items)
+            elif self.depth == 1:
+                if c == ",":
+                    self._emit(buf, i, items)
+                elif not c.isspace() and self.elem_start is None:
+                    self.elem_start = i
+
+        self.pos = len(buf)
+        # Drop consumed text so long streams don't keep re-buffering it
+        keep_from = self.elem_start if self.elem_start is not None else self.pos
+        if keep_from > 0:
+            self.buf = buf[keep_from:]
+            self.pos -= keep_from
+            if self.elem_start is not None:
+                self.elem_start -= keep_from
+        return items
+
+    def _emit(self, buf, end, items):
+        if self.elem_start is None:
+            return
+        raw = buf[self.elem_start:end].strip()
+        self.elem_start = None
+        if not raw:
+            return
+        try:
+            items.append(json.loads(raw))
+            self.emitted += 1
+        except ValueError:
+            self.errors += 1
+
+
+def parse_json_array(text, validate=None):
+    """Parse every well-formed element of the array in text, keeping those that validate."""
+    items = JSONArrayParser().feed(text)
+    return [item for item in items if validate is None or validate(item)]
+
+
+def iter_json_array(chunks, validate=None):
+    """Yield array elements from an iterable of text chunks as soon as each completes.
+
+    The source is drained to the end (so it can finish and cache its text) and
+    closed if this generator is closed early.
+    """
+    parser = JSONArrayParser()
+    try:
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                if validate is None or validate(item):
+                    yield item
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+async def aiter_json_array(chunks, validate=None):
+    """Async twin of iter_json_array for async text streams."""
+    parser = JSONArrayParser()
+    try:
+        async for chunk in chunks:
+            for item in parser.feed(chunk):
+                if validate is None or validate(item):
+                    yield item
+    finally:
+        await chunks.aclose()
@@ -0,0 +1,198 @@
+import hmac
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from utils.db import query_hooks
+
+# Prometheus metrics for requests, DB queries and AI calls, served at /metrics.
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so every
+# worker writes to shared files and /metrics reports the sum over all workers.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402 - reads PROMETHEUS_MULTIPROC_DIR at import
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest,
+    multiprocess
+)
+
+# Requests slower than this many ms are printed with their query breakdown; 0 turns it off
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv("SLOW_REQUEST_TOP_QUERIES", "5"))
+
+# Bearer token for /metrics and the other ops endpoints, since scrapers can't
+# log in as the admin; unset leaves them to admin HTTP Basic (none on async_app)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# ---------- Metrics ----------
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests by route and status", ["method", "route", "status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency, including streamed bodies",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being served", ["method", "route"],
+    multiprocess_mode="livesum")
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time per SQL statement", ["operation"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5))
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements sent per request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+DB_SECONDS_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Total SQL time per request", ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+AI_CALLS = Counter(
+    "ai_calls_total", "OpenRouter calls by outcome (ok, error, circuit_open)",
+    ["profile", "model", "outcome"])
+AI_CALL_SECONDS = Histogram(
+    "ai_call_duration_seconds", "OpenRouter call latency including retries; "
+    "for streams, until the response started", ["profile", "model"], buckets=LATENCY_BUCKETS)
+AI_RETRIES = Counter(
+    "ai_retries_total", "OpenRouter attempts retried, by status code or error", ["reason"])
+AI_TOKENS = Counter(
+    "ai_tokens_total", "Tokens reported by OpenRouter", ["profile", "model", "kind"])
+
+ADMISSIONS = Counter(
+    "ai_admissions_total", "AI admission decisions (rate_limited, admitted, queued, "
+    "queue_full, timed_out)", ["scope", "outcome"])
+AI_SLOT_WAIT_SECONDS = Histogram(
+    "ai_slot_wait_seconds", "Time queued for an upstream AI slot",
+    buckets=(0.02, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60))
+
+APP_STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Worker boot time: module imports, then create_app()", ["phase"],
+    multiprocess_mode="max")
+
+
+# ---------- Per-request stats ----------
+class RequestStats:
+    """Query totals for one request; statements are only kept when the slow log is on."""
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = {} if SLOW_REQUEST_MS else None
+        self.finished = False
+
+
+_current = ContextVar("request_stats", default=None)
+_finish_lock = threading.Lock()
+
+
+def _operation(sql):
+    verb = sql.lstrip()[:6].upper()
+    return verb if verb in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def _observe_query(sql, seconds):
+    DB_QUERY_SECONDS.labels(_operation(sql)).observe(seconds)
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.query_time += seconds
+    if stats.statements is not None:
+        count, total = stats.statements.get(sql, (0, 0.0))
+        stats.statements[sql] = (count + 1, total + seconds)
+
+
+query_hooks.append(_observe_query)
+
+
+def start_request(method, route):
+    stats = RequestStats(method, route)
+    _current.set(stats)
+    HTTP_IN_PROGRESS.labels(method, route).inc()
+    return stats
+
+
+def finish_request(stats, status):
+    """Record a finished request; safe to call more than once."""
+    with _finish_lock:
+        if stats.finished:
+            return
+        stats.finished = True
+    elapsed = time.perf_counter() - stats.started
+    HTTP_IN_PROGRESS.labels(stats.method, stats.route).dec()
+    HTTP_REQUESTS.labels(stats.method, stats.route, str(status)).inc()
+    HTTP_REQUEST_SECONDS.labels(stats.method, stats.route).observe(elapsed)
+    DB_QUERIES_PER_REQUEST.labels(stats.route).observe(stats.queries)
+    DB_SECONDS_PER_REQUEST.labels(stats.route).observe(stats.query_time)
+    if _current.get() is stats:
+        _current.set(None)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        log_slow_request(stats, status, elapsed)
+
+
+def log_slow_request(stats, status, elapsed):
+    print(f"🐢 Slow request {stats.method} {stats.route} -> {status} in {elapsed * 1000:.1f} ms; "
+          f"{stats.queries} queries took {stats.query_time * 1000:.1f} ms")
+    top = sorted(stats.statements.items(), key=lambda item: item[1][1], reverse=True)
+    for sql, (count, total) in top[:SLOW_REQUEST_TOP_QUERIES]:
+        print(f"   {count:>3}x {total * 1000:>8.1f} ms  {' '.join(sql.split())[:300]}")
+
+
+def record_startup(import_seconds, create_seconds):
+    APP_STARTUP_SECONDS.labels("import").set(import_seconds)
+    APP_STARTUP_SECONDS.labels("create_app").set(create_seconds)
+    print(f"⏱️ App ready in {(import_seconds + create_seconds) * 1000:.0f} ms "
+          f"(imports {import_seconds * 1000:.0f} ms, create_app {create_seconds * 1000:.0f} ms, "
+          f"pid {os.getpid()})")
+
+
+# ---------- AI calls ----------
+def record_ai_call(profile, model, outcome, seconds):
+    AI_CALLS.labels(profile, model, outcome).inc()
+    if outcome != "circuit_open":
+        AI_CALL_SECONDS.labels(profile, model).observe(seconds)
+
+
+def record_ai_retry(retry_state):
+    """tenacity before_sleep hook: count the attempt about to be retried."""
+    error = retry_state.outcome.exception()
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None),
+                                                           "status_code", None)
+    AI_RETRIES.labels(str(status) if status else type(error).__name__).inc()
+
+
+def record_ai_tokens(profile, model, prompt_tokens, completion_tokens):
+    if prompt_tokens:
+        AI_TOKENS.labels(profile, model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        AI_TOKENS.labels(profile, model, "completion").inc(completion_tokens)
+
+
+def record_admission(scope, outcome, waited=None):
+    ADMISSIONS.labels(scope, outcome).inc()
+    if waited is not None:
+        AI_SLOT_WAIT_SECONDS.observe(waited)
+
+
+# ---------- Exposition ----------
+def metrics_token_ok(authorization):
+    """True if an Authorization header value is "Bearer <METRICS_TOKEN>"."""
+    if not METRICS_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(),
+                                                              METRICS_TOKEN.encode())
+
+
+def render_metrics():
+    """Return (body, content type) for /metrics, summed over workers in multiprocess mode."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
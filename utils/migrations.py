@@ -0,0 +1,157 @@
+"""Versioned schema migrations for failed.db.
+
+Each migration runs once, in version order, and is recorded in the
+schema_migrations table. They run once per deploy from `python -m
+utils.bootstrap`, which gunicorn.conf.py starts in the master before any worker
+is forked; workers never migrate. run_migrations() still takes the write lock,
+so a second process running it at the same time finds nothing to do.
+
+Migration 1 is a baseline that works from any older failed.db (or none): it
+adds columns the models gained and creates the missing tables. Later
+migrations must also be safe on a database that baseline just created from the
+current models, so add columns with ensure_columns() and indexes with
+safe=True rather than bare ALTERs.
+
+    python -m utils.migrations            # apply pending migrations
+    python -m utils.migrations --status   # list applied and pending
+"""
+import datetime
+import sys
+
+from peewee import Model, IntegerField, CharField, DateTimeField
+from utils.db import db, ensure_columns
+from models.user import User
+from models.careerpath import CareerPath, normalize_title
+from models.failcourse import FailCourse
+from models.question import Question
+from models.answer import Answer
+from models.aistory import AIStory
+from models.savedcareer import SavedCareer, SavedCareerItem
+from models.aijob import AIJob
+from utils.saved_careers import migrate_legacy_careers
+from utils.search import ensure_search_index
+from utils.http_cache import ensure_version_triggers
+
+ALL_MODELS = [User, CareerPath, FailCourse, Question, Answer, AIStory, SavedCareer, SavedCareerItem]
+
+
+class SchemaMigration(Model):
+    version = IntegerField(primary_key=True)
+    name = CharField()
+    applied_at = DateTimeField(default=datetime.datetime.utcnow)
+
+    class Meta:
+        database = db
+        table_name = 'schema_migrations'
+
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# ---------- Migrations ----------
+@migration(1, "baseline")
+def _baseline():
+    # Columns first: create_tables(safe=True) also builds indexes, and on an
+    # older table those must not be created before their columns exist
+    for model in ALL_MODELS:
+        ensure_columns(model)
+    db.create_tables(ALL_MODELS, safe=True)
+
+
+@migration(2, "saved_careers_from_user_blobs")
+def _saved_careers():
+    migrate_legacy_careers()
+
+
+@migration(3, "career_title_keys")
+def _career_title_keys():
+    """Key catalog rows written before title_key existed; duplicates stay unkeyed."""
+    taken = {key for (key,) in CareerPath.select(CareerPath.title_key)
+             .where(CareerPath.title_key.is_null(False)).tuples()}
+    for career in CareerPath.select(CareerPath.id, CareerPath.title).where(CareerPath.title_key.is_null()):
+        key = normalize_title(career.title)
+        if key in taken:
+            print(f"⚠️ Duplicate career title left unkeyed: {career.title!r} (id {career.id})")
+            continue
+        taken.add(key)
+        CareerPath.update(title_key=key).where(CareerPath.id == career.id).execute()
+    CareerPath.update(source="curated").where(CareerPath.source.is_null()).execute()
+
+
+@migration(4, "search_index")
+def _search_index():
+    ensure_search_index()
+
+
+@migration(5, "table_versions")
+def _table_versions():
+    ensure_version_triggers()
+
+
+@migration(6, "ai_jobs")
+def _ai_jobs():
+    db.create_tables([AIJob], safe=True)
+
+
+@migration(7, "qa_forum")
+def _qa_forum():
+    for model in (Question, Answer):
+        ensure_columns(model)
+    db.create_tables([Question, Answer], safe=True)
+    # Counts for answers written before answer_count existed
+    db.execute_sql(
+        "UPDATE question SET "
+        "answer_count = (SELECT COUNT(*) FROM answer WHERE answer.question_id = question.id), "
+        "last_answer_at = (SELECT MAX(created_at) FROM answer WHERE answer.question_id = question.id)")
+    ensure_version_triggers()
+
+
+# ---------- Runner ----------
+def applied_versions():
+    if not SchemaMigration.table_exists():
+        return set()
+    return {v for (v,) in SchemaMigration.select(SchemaMigration.version).tuples()}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def run_migrations():
+    """Apply pending migrations in order, each in its own transaction; returns their versions."""
+    if not pending_migrations():
+        return []
+
+    done = []
+    SchemaMigration.create_table(safe=True)
+    for version, name, fn in MIGRATIONS:
+        # IMMEDIATE takes the write lock up front, so two processes migrating
+        # together can't both apply the same migration
+        with db.atomic(lock_type='IMMEDIATE'):
+            if SchemaMigration.get_or_none(SchemaMigration.version == version):
+                continue
+            fn()
+            SchemaMigration.create(version=version, name=name)
+        print(f"✅ Applied migration {version}: {name}")
+        done.append(version)
+    return done
+
+
+if __name__ == '__main__':
+    with db.connection_context():
+        if '--status' in sys.argv:
+            applied = applied_versions()
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>4}  {'applied' if version in applied else 'pending'}  {name}")
+        else:
+            applied = run_migrations()
+            print(f"{len(applied)} migration(s) applied")
@@ -0,0 +1,67 @@
+import json
+
+from flask import Response, stream_with_context
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_LIST_SIZE = 500  # cap for the legacy bare-array response
+
+
+def page_params(args):
+    """Read ?cursor=&limit= from the query string.
+
+    Returns (paginated, cursor, limit). Requests with neither parameter keep the
+    legacy bare-array response, but only its first MAX_LIST_SIZE rows; bad values
+    raise ValueError.
+    """
+    paginated = "cursor" in args or "limit" in args
+    if not paginated:
+        return False, None, MAX_LIST_SIZE
+    cursor = args.get("cursor")
+    cursor = int(cursor) if cursor else None
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return paginated, cursor, min(limit, MAX_PAGE_SIZE)
+
+
+def keyset(query, field, cursor=None, limit=None, descending=False):
+    """Order query by a unique field and start after cursor.
+
+    Fetches one row past limit so stream_page can tell whether another page exists.
+    """
+    if cursor is not None:
+        query = query.where(field < cursor if descending else field > cursor)
+    query = query.order_by(field.desc() if descending else field.asc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def stream_rows(query, limit):
+    """Stream up to limit query rows (dicts) as a JSON array without materializing the list."""
+    def generate():
+        yield "["
+        for i, row in enumerate(query.limit(limit).iterator()):
+            yield ("," if i else "") + json.dumps(row)
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def stream_page(query, limit, key="id"):
+    """Stream one keyset page as {"items": [...], "next_cursor": ...}."""
+    def generate():
+        yield '{"items":['
+        last = None
+        has_more = False
+        for i, row in enumerate(query.iterator()):
+            if i == limit:
+                has_more = True
+                break
+            yield ("," if i else "") + json.dumps(row)
+            last = row[key]
+        next_cursor = str(last) if has_more else None
+        yield '],"next_cursor":' + json.dumps(next_cursor) + "}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
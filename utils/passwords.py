@@ -0,0 +1,156 @@
+import functools
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Hashing settings; the default is werkzeug's own (scrypt), which every existing hash uses
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))      # 0 = hash inline
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+PASSWORD_HASH_RETRY_AFTER = 2  # seconds, sent with 503s
+PASSWORD_BULK_WORKERS = int(os.getenv("PASSWORD_BULK_WORKERS", "2"))      # 0 = hash inline
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+# Memory-hard scrypt outranks pbkdf2; a hash is never rehashed to a lower rank
+_KDF_RANK = {"pbkdf2": 0, "scrypt": 1}
+_PBKDF2_DIGESTS = {"sha256": 0, "sha384": 1, "sha512": 2}
+
+
+class HashingOverloaded(Exception):
+    """Too many hashes queued; the caller should answer 503 instead of waiting."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _release(_future=None):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _run(fn, *args, **kwargs):
+    """Run a hashing call in the pool, refusing work once the queue is full."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args, **kwargs)
+
+    global _pending
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+            raise HashingOverloaded("Password hashing queue is full")
+        _pending += 1
+
+    try:
+        future = _get_executor().submit(fn, *args, **kwargs)
+    except (BrokenProcessPool, RuntimeError):
+        _reset_executor()
+        _release()
+        raise HashingOverloaded("Password hashing pool unavailable")
+    future.add_done_callback(_release)
+
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        raise HashingOverloaded("Password hashing timed out")
+    except BrokenProcessPool:
+        _reset_executor()
+        raise HashingOverloaded("Password hashing pool crashed")
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password,
+                method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH)
+
+
+def hash_passwords(passwords):
+    """Hash a batch for bulk imports on a short-lived pool of its own.
+
+    Imports stay out of the bounded login pool, so a big one can neither fail
+    with HashingOverloaded nor queue ahead of /login.
+    """
+    hash_one = functools.partial(generate_password_hash, method=PASSWORD_HASH_METHOD,
+                                 salt_length=PASSWORD_SALT_LENGTH)
+    if PASSWORD_BULK_WORKERS <= 0 or len(passwords) < 2:
+        return [hash_one(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (PASSWORD_BULK_WORKERS * 4))
+    with ProcessPoolExecutor(max_workers=PASSWORD_BULK_WORKERS) as pool:
+        return list(pool.map(hash_one, passwords, chunksize=chunksize))
+
+
+def is_legacy_hash(stored):
+    """Unsalted SHA-256 hex digests written by the old seed_default_user."""
+    return bool(stored) and bool(_LEGACY_SHA256.match(stored))
+
+
+def verify_password(stored, password):
+    if not stored or password is None:
+        return False
+    if is_legacy_hash(stored):
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(digest, stored)
+    return _run(check_password_hash, stored, password)
+
+
+def _kdf_params(method):
+    """(kdf, parameters) for a werkzeug method string, with werkzeug's defaults filled in.
+
+    Parameters compare element-wise, larger being stronger; None if unrecognised.
+    """
+    kdf, *args = method.split(":")
+    try:
+        if kdf == "scrypt":
+            n, r, p = (int(a) for a in args) if args else (2 ** 15, 8, 1)
+            return kdf, (n, r, p)
+        if kdf == "pbkdf2":
+            digest = args[0] if args else "sha256"
+            iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+            return kdf, (_PBKDF2_DIGESTS[digest], iterations)
+    except (ValueError, KeyError):
+        pass
+    return None
+
+
+def needs_rehash(stored):
+    """True for legacy SHA-256 hashes and hashes weaker than PASSWORD_HASH_METHOD.
+
+    A hash at least as strong as the configured method is kept, even if its
+    method differs, so changing the setting can never downgrade stored hashes.
+    """
+    if is_legacy_hash(stored):
+        return True
+    current = _kdf_params(stored.split("$", 1)[0])
+    wanted = _kdf_params(PASSWORD_HASH_METHOD)
+    if current is None or wanted is None:
+        return False
+    if current[0] != wanted[0]:
+        return _KDF_RANK[current[0]] < _KDF_RANK[wanted[0]]
+    return any(have < want for have, want in zip(current[1], wanted[1]))
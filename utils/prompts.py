@@ -0,0 +1,110 @@
+import json
+
+from utils.json_stream import parse_json_array
+
+# Prompts and response shaping shared by the Flask app and the async AI app
+
+TEST_PROMPT = "Give a short motivational quote for failed students"
+
+STORIES_PROMPT = (
+    "Generate 10 inspiring Indian stories of individuals who initially failed in education, UPSC, or business, "
+    "but later achieved significant success. Each story should be written in 3 to 4 paragraphs, not as bullet points. "
+    "Include realistic characters with background, failure, turning point, and final growth. Avoid using real names like 'Narendra Modi' or 'Ambani'. "
+    "Return the stories as a JSON array of objects with the keys: 'title', 'story', and optional 'tags'. "
+    "Each 'story' field should contain a well-written paragraph-style narrative. "
+    "Do not return markdown or code formatting."
+)
+
+
+def quote_prompt(topic):
+    return f"Give me a short motivational quote about {topic}."
+
+
+def career_details_prompt(title):
+    return f"""
+Explain how to build a career in "{title}".
+Respond ONLY with a JSON object with the keys:
+- "description": 2-3 sentences about the career
+- "steps": 5 short steps to get started
+- "pitfalls": 3 common pitfalls
+- "resources": 3 free online resources
+"""
+
+
+def career_ideas_prompt(keyword):
+    return f"""
+Suggest 6 career paths for someone interested in "{keyword}".
+Each with:
+- title
+- short description
+- 3 steps to get started
+- 2 pitfalls
+- 2 free online resources
+
+Respond ONLY as valid JSON array.
+"""
+
+
+def is_valid_career(item):
+    return isinstance(item, dict) and isinstance(item.get("title"), str) and item["title"].strip() != ""
+
+
+def parse_career_ideas(response):
+    """Keep every well-formed career in the response; only fail if none survive."""
+    careers = parse_json_array(response, is_valid_career)
+    if not careers:
+        raise ValueError("Could not parse valid JSON array from AI response.")
+    return careers
+
+
+def _text_items(value):
+    if not isinstance(value, list):
+        return []
+    return [v.strip() if isinstance(v, str) else v
+            for v in value if (isinstance(v, str) and v.strip()) or isinstance(v, dict)]
+
+
+def parse_career_details(response):
+    """Pull the career object out of an AI reply; ValueError if there isn't a usable one."""
+    text = (response or "").strip("` \n")
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1]) if 0 <= start < end else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get("description"), str):
+        raise ValueError("Could not parse career details from AI response.")
+
+    details = {
+        "description": data["description"].strip(),
+        "steps": _text_items(data.get("steps")),
+        "pitfalls": _text_items(data.get("pitfalls")),
+        "resources": _text_items(data.get("resources")),
+    }
+    if not details["description"] or not details["steps"]:
+        raise ValueError("AI career details are missing a description or steps.")
+    return details
+
+
+def is_valid_career_details(response):
+    """True if parse_career_details can use response; replies that fail aren't cached."""
+    try:
+        parse_career_details(response)
+    except ValueError:
+        return False
+    return True
+
+
+def is_valid_story(item):
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("title"), str)
+        and item["title"].strip()
+        and item.get("story")
+        and isinstance(item["story"], str)
+        and len(item["story"].split()) > 50  # ensure it's more than a few lines
+    )
+
+
+def valid_stories(raw_stories):
+    return [item for item in raw_stories if is_valid_story(item)][:10]
@@ -0,0 +1,142 @@
+"""EXPLAIN QUERY PLAN checks for the SQL the routes actually run.
+
+Each request in ROUTE_CHECKS goes through the Flask test client while the
+statements it sends to failed.db are recorded. Every statement is then
+explained, and any full table scan fails the check, so a missing index shows
+up here before it shows up as latency.
+
+    python -m utils.query_plans [path/to/failed.db]
+
+The database is copied to a temp dir first, and the side stores the app writes
+(AI cache, rate-limit buckets, slot and lock dirs, PDF cache) point into the
+same dir, so the check leaves nothing behind. Exits 1 when any route
+full-scans a table; CI can also assert on run_check(path) == [].
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+# (method, path, json body) for read routes that don't call the AI
+ROUTE_CHECKS = [
+    ("GET", "/me?email=admin@failed.com", None),
+    ("GET", "/profile?email=admin@failed.com", None),
+    ("GET", "/stories?limit=20", None),
+    ("GET", "/stories?limit=20&cursor=1", None),
+    ("GET", "/stories?limit=20&tag=career", None),
+    ("GET", "/stories?limit=20&user_id=1", None),
+    ("GET", "/user-stories?email=admin@failed.com&limit=20&cursor=1", None),
+    ("GET", "/career-paths?limit=20&cursor=1", None),
+    ("GET", "/career-search?q=data", None),
+    ("GET", "/search?q=data", None),
+    ("GET", "/saved-careers?email=admin@failed.com", None),
+    ("POST", "/career-details", {"title": "__plan_check__"}),
+    ("GET", "/career-options", None),
+    ("GET", "/questions?limit=20", None),
+    ("GET", "/questions?limit=20&cursor=1000000", None),
+    ("GET", "/questions/1?limit=20&cursor=1", None),
+]
+
+# (path, table) scans that are the point of the route
+ALLOWED_SCANS = {
+    ("/career-options", "careerpath"),   # returns every catalog title
+}
+
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# Env settings for files the app writes besides DB_PATH; read at import time
+SIDE_PATHS = {
+    "AI_CACHE_PATH": "ai_cache.db",
+    "RATE_LIMIT_PATH": "ratelimit.db",
+    "AI_SLOT_DIR": "ai_slots",
+    "AI_SINGLEFLIGHT_LOCK_DIR": "locks",
+    "PDF_CACHE_DIR": "career_plans",
+}
+
+
+def explain(sql, params=()):
+    from utils.db import db
+    return [row[-1] for row in db.execute_sql("EXPLAIN QUERY PLAN " + sql, params or ())]
+
+
+def full_scans(sql, plan):
+    """Tables the plan reads end to end.
+
+    A rowid-ordered scan with LIMIT and no WHERE (the first keyset page) stops
+    after LIMIT rows, so it doesn't count.
+    """
+    bounded = (" LIMIT " in sql and " WHERE " not in sql
+               and not any("TEMP B-TREE" in step for step in plan))
+    aliases = dict((alias, table) for table, alias in re.findall(r'"(\w+)" AS "(\w+)"', sql))
+    scans = []
+    for step in plan:
+        match = re.match(r"SCAN (\w+)", step)
+        if match and "VIRTUAL TABLE" not in step and not bounded:
+            scans.append(aliases.get(match.group(1), match.group(1)))
+    return scans
+
+
+def check_routes(app, checks=ROUTE_CHECKS, allowed=ALLOWED_SCANS):
+    """Run each route and explain its queries; returns a list of problem strings."""
+    from utils.db import capture_queries
+
+    client = app.test_client()
+    problems = []
+
+    for method, path, body in checks:
+        with capture_queries() as queries:
+            response = client.open(path, method=method, json=body)
+            response.get_data()  # drain streamed bodies so their queries run
+
+        route = path.split("?")[0]
+        for sql, params in queries:
+            if not sql.lstrip().upper().startswith(EXPLAINED):
+                continue
+            plan = explain(sql, params)
+            for table in full_scans(sql, plan):
+                if (route, table) not in allowed:
+                    problems.append(f"{method} {path}: full scan of {table}\n    {sql}\n    "
+                                    + "\n    ".join(plan))
+    return problems
+
+
+def isolate(workdir):
+    """Point DB_PATH and every side store at workdir, and keep the AI and metrics off."""
+    os.environ["DB_PATH"] = os.path.join(workdir, "failed.db")
+    for name, filename in SIDE_PATHS.items():
+        os.environ[name] = os.path.join(workdir, filename)
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    os.environ["OPENROUTER_API_KEY"] = ""  # never call the AI from a plan check
+
+
+def run_check(source):
+    """Check every route against a temp copy of source; returns the problem strings.
+
+    Must run before the app is imported in this process, since the paths it
+    redirects are read at import time.
+    """
+    if "utils.db" in sys.modules:
+        raise RuntimeError("run_check needs a fresh process: the app is already imported")
+    workdir = tempfile.mkdtemp()
+    if os.path.exists(source):
+        shutil.copy(source, os.path.join(workdir, "failed.db"))
+    isolate(workdir)
+
+    try:
+        from app import create_app
+        from utils.bootstrap import bootstrap
+        bootstrap()
+        return check_routes(create_app())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), "failed.db")
+    problems = run_check(source)
+
+    for problem in problems:
+        print("❌", problem)
+    print(f"{len(ROUTE_CHECKS)} routes checked, {len(problems)} full scan(s)")
+    sys.exit(1 if problems else 0)
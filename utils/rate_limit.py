@@ -0,0 +1,349 @@
+"""Admission control for routes that call the AI.
+
+Two layers, both shared by every gunicorn worker on the host:
+
+- Token buckets per client IP (ratelimit.db, one UPSERT per
+  bucket), checked by the @rate_limited route decorator before any work.
+- A cap on concurrent upstream calls (upstream_slot(), taken in utils/ai_utils.py
+  only when a call actually goes to OpenRouter; async_upstream_slot() in
+  utils/ai_async.py). Slots and the bounded wait
+  queue are flock'd files, so a worker that dies frees its slot with it.
+
+Callers over either limit get AIBusy / a 429 with Retry-After instead of tying
+up a worker, which keeps the DB-backed routes responsive during AI spikes.
+
+Behind a reverse proxy, set RATE_LIMIT_PROXIES to the number of proxies in
+front of the app (1 for a single nginx/Render/Heroku router); each must append
+the peer address to X-Forwarded-For. Otherwise every client shares the
+proxy's bucket, and a warning is printed whenever X-Forwarded-For shows up
+with RATE_LIMIT_PROXIES unset.
+
+Buckets are per client IP only: the AI routes take no credentials, so an email
+in the request names nobody reliably and can't key a per-user bucket.
+"""
+import asyncio
+import functools
+import math
+import os
+import tempfile
+import threading
+import time
+
+from flask import request, jsonify
+from peewee import SqliteDatabase
+from utils.metrics import record_admission
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are per worker
+    fcntl = None
+
+# Rate limit settings
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join(os.getcwd(), "ratelimit.db"))
+# Reverse proxies in front of the app; the X-Forwarded-For entries they add are trusted
+RATE_LIMIT_PROXIES = int(os.getenv("RATE_LIMIT_PROXIES", "0"))
+PROXY_WARNING_INTERVAL = 600  # seconds between unconfigured-proxy warnings, per worker
+
+# scope -> (burst, requests per minute), per client; override with RATE_LIMIT_<SCOPE>="burst/per_minute"
+RATE_LIMITS = {
+    "ai": (5, 10),
+}
+
+# Upstream concurrency settings
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))   # OpenRouter calls in flight
+AI_QUEUE_SIZE = int(os.getenv("AI_QUEUE_SIZE", "16"))            # callers allowed to wait
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "2"))     # seconds before a waiter is shed
+AI_SLOT_DIR = os.getenv("AI_SLOT_DIR", os.path.join(
+    tempfile.gettempdir(), f"failed-ai-slots-{os.getenv('PORT', '8000')}"))
+AI_BUSY_RETRY_AFTER = 2  # seconds, sent when the queue is full
+
+BUCKET_IDLE_SECONDS = 24 * 3600  # buckets untouched this long are deleted
+
+
+class AIBusy(Exception):
+    """No upstream slot free; the caller should answer 429 instead of waiting."""
+
+    def __init__(self, message, retry_after=AI_BUSY_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ---------- Token buckets ----------
+# Separate file, like the AI cache, so limiter writes never contend with failed.db
+limit_db = SqliteDatabase(RATE_LIMIT_PATH, pragmas={
+    "journal_mode": "wal",
+    "synchronous": "off",    # losing a few tokens on a crash is fine
+    "busy_timeout": 1000,
+})
+
+_ready = False
+_ready_lock = threading.Lock()
+_last_cleanup = 0.0
+_last_proxy_warning = 0.0
+
+# Refill, then take one token only if one is available; no row back means denied
+_TAKE_SQL = """
+INSERT INTO rate_buckets (key, tokens, updated_at) VALUES (?, ? - 1, ?)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = MIN(?, tokens + (excluded.updated_at - updated_at) * ?) - 1,
+    updated_at = excluded.updated_at
+WHERE MIN(?, tokens + (excluded.updated_at - updated_at) * ?) >= 1
+RETURNING tokens
+"""
+
+
+def _ensure_ready():
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if not _ready:
+            limit_db.connect(reuse_if_open=True)
+            limit_db.execute_sql(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+            _ready = True
+    # One connection per thread, kept open: this runs on every AI request
+    limit_db.connect(reuse_if_open=True)
+
+
+def limit_for(scope):
+    """(burst, refill per second) for a scope."""
+    burst, per_minute = RATE_LIMITS[scope]
+    override = os.getenv("RATE_LIMIT_" + scope.upper().replace("-", "_"))
+    if override:
+        burst, per_minute = (float(v) for v in override.split("/"))
+    return float(burst), float(per_minute) / 60
+
+
+def take_tokens(keys, burst, rate):
+    """Take a token from every bucket in keys, or from none.
+
+    Returns 0 when admitted, else the seconds until the emptiest bucket has a token.
+    """
+    _ensure_ready()
+    now = time.time()
+    with limit_db.atomic(lock_type='IMMEDIATE') as txn:
+        denied = []
+        for key in keys:
+            row = limit_db.execute_sql(
+                _TAKE_SQL, (key, burst, now, burst, rate, burst, rate)).fetchone()
+            if row is None:
+                denied.append(key)
+        if not denied:
+            _cleanup(now)
+            return 0
+        # Put back the tokens taken from the buckets that did have one
+        txn.rollback()
+        tokens = limit_db.execute_sql(
+            f"SELECT MIN(MIN(?, tokens + (? - updated_at) * ?)) FROM rate_buckets "
+            f"WHERE key IN ({', '.join('?' * len(denied))})",
+            (burst, now, rate, *denied)).fetchone()[0] or 0
+    return max(1, math.ceil((1 - tokens) / rate)) if rate else 60
+
+
+def _cleanup(now):
+    global _last_cleanup
+    if now - _last_cleanup > 600:
+        _last_cleanup = now
+        limit_db.execute_sql("DELETE FROM rate_buckets WHERE updated_at < ?",
+                             (now - BUCKET_IDLE_SECONDS,))
+
+
+def resolve_client_ip(remote_addr, forwarded_for=None):
+    """The client address from the peer address and the X-Forwarded-For header.
+
+    Only the last RATE_LIMIT_PROXIES entries were added by our own proxies; the
+    one they name is the client. Anything earlier is client-supplied and ignored.
+    """
+    global _last_proxy_warning
+    if forwarded_for and RATE_LIMIT_PROXIES:
+        hops = [h.strip() for h in forwarded_for.split(",") if h.strip()]
+        if len(hops) >= RATE_LIMIT_PROXIES:
+            return hops[-RATE_LIMIT_PROXIES]
+    elif forwarded_for and time.time() - _last_proxy_warning > PROXY_WARNING_INTERVAL:
+        _last_proxy_warning = time.time()
+        print(f"⚠️ X-Forwarded-For received but RATE_LIMIT_PROXIES=0: every client behind "
+              f"{remote_addr} shares one rate-limit bucket. Set RATE_LIMIT_PROXIES to the "
+              f"number of proxies in front of the app.")
+    return remote_addr or "unknown"
+
+
+def client_ip():
+    return resolve_client_ip(request.remote_addr, request.headers.get("X-Forwarded-For"))
+
+
+def client_keys(scope, ip):
+    """Bucket keys for a client of scope."""
+    return [f"{scope}:ip:{ip}"]
+
+
+def too_many_requests(retry_after, message="Too many requests, please slow down"):
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
+def admit(scope, ip):
+    """0 if a client at ip may make a scope request now, else seconds until it may."""
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    try:
+        burst, rate = limit_for(scope)
+        retry_after = take_tokens(client_keys(scope, ip), burst, rate)
+    except Exception as e:
+        # Fail open: a limiter problem shouldn't take the routes down with it
+        print("⚠️ Rate limiter unavailable:", e)
+        return 0
+    if retry_after:
+        record_admission(scope, "rate_limited")
+    return retry_after
+
+
+def check_rate_limit(scope):
+    """None if this request may go ahead, else a 429 response to return."""
+    retry_after = admit(scope, client_ip())
+    return too_many_requests(retry_after) if retry_after else None
+
+
+def rate_limited(scope):
+    """Route decorator: 429 once the client's token bucket for scope is empty."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return check_rate_limit(scope) or view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- Upstream slots ----------
+class _SlotFiles:
+    """count flock'd files; holding a lock on one of them is holding that slot."""
+
+    def __init__(self, prefix, count):
+        self.prefix = prefix
+        self.count = count
+
+    def try_acquire(self):
+        """An fd holding a free slot, or None."""
+        os.makedirs(AI_SLOT_DIR, exist_ok=True)
+        for i in range(self.count):
+            fd = os.open(os.path.join(AI_SLOT_DIR, f"{self.prefix}-{i}.lock"),
+                         os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    @staticmethod
+    def release(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class UpstreamSlots:
+    """Caps concurrent upstream calls; up to queue_size callers wait up to timeout seconds."""
+
+    def __init__(self, max_concurrency, queue_size, timeout):
+        self.timeout = timeout
+        self.shared = fcntl is not None
+        if self.shared:
+            self.slots = _SlotFiles("slot", max_concurrency)
+            self.waiters = _SlotFiles("waiter", queue_size)
+        else:
+            self.semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def _try_now(self):
+        """(slot fd, None) when a slot is free, else (None, waiter fd); AIBusy if the queue is full."""
+        fd = self.slots.try_acquire()
+        if fd is not None:
+            record_admission("upstream", "admitted")
+            return fd, None
+        waiter = self.waiters.try_acquire()
+        if waiter is None:
+            record_admission("upstream", "queue_full")
+            raise AIBusy("AI queue is full")
+        return None, waiter
+
+    def _poll(self, started):
+        fd = self.slots.try_acquire()
+        if fd is not None:
+            record_admission("upstream", "queued", time.monotonic() - started)
+        return fd
+
+    def _timed_out(self):
+        record_admission("upstream", "timed_out", self.timeout)
+        return AIBusy("Timed out waiting for an AI slot")
+
+    def acquire(self):
+        if not self.shared:
+            if not self.semaphore.acquire(timeout=self.timeout):
+                raise AIBusy("Timed out waiting for an AI slot")
+            return None
+
+        fd, waiter = self._try_now()
+        if fd is not None:
+            return fd
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < self.timeout:
+                time.sleep(0.02)
+                fd = self._poll(started)
+                if fd is not None:
+                    return fd
+        finally:
+            self.waiters.release(waiter)
+        raise self._timed_out()
+
+    async def acquire_async(self):
+        """acquire() for an event loop: waits with asyncio.sleep between non-blocking polls."""
+        if not self.shared:
+            return await asyncio.to_thread(self.acquire)
+
+        fd, waiter = self._try_now()
+        if fd is not None:
+            return fd
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < self.timeout:
+                await asyncio.sleep(0.02)
+                fd = self._poll(started)
+                if fd is not None:
+                    return fd
+        finally:
+            self.waiters.release(waiter)
+        raise self._timed_out()
+
+    def release(self, fd):
+        if self.shared:
+            self.slots.release(fd)
+        else:
+            self.semaphore.release()
+
+
+upstream_slots = UpstreamSlots(AI_MAX_CONCURRENCY, AI_QUEUE_SIZE, AI_QUEUE_TIMEOUT)
+
+
+class upstream_slot:
+    """with upstream_slot(): ... holds one upstream slot; raises AIBusy when none frees up."""
+
+    def __enter__(self):
+        self.fd = upstream_slots.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        upstream_slots.release(self.fd)
+
+
+class async_upstream_slot:
+    """async with async_upstream_slot(): ... is upstream_slot() for the async app."""
+
+    async def __aenter__(self):
+        self.fd = await upstream_slots.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        upstream_slots.release(self.fd)
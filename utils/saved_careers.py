@@ -0,0 +1,113 @@
+import datetime
+import json
+
+from peewee import prefetch
+from utils.db import db
+from models.user import User
+from models.savedcareer import SavedCareer, SavedCareerItem
+
+# Old per-user blob columns, moved into savedcareer/savedcareeritem by migrate_legacy_careers
+LEGACY_COLUMNS = ('career_title', 'career_description', 'career_steps',
+                  'career_pitfalls', 'career_resources')
+
+
+def _item_rows(saved_career_id, kind, values):
+    rows = []
+    for position, value in enumerate(values or []):
+        if isinstance(value, str):
+            text, data = value, None
+        else:
+            text, data = json.dumps(value), json.dumps(value)
+        rows.append({
+            "saved_career": saved_career_id,
+            "kind": kind,
+            "position": position,
+            "text": text,
+            "data": data
+        })
+    return rows
+
+
+def save_career(user_id, title, description=None, steps=None, pitfalls=None, resources=None):
+    """Create or replace the user's saved career with this title and make it current."""
+    now = datetime.datetime.utcnow()
+    # IMMEDIATE: this reads then writes, and a deferred transaction can't
+    # upgrade to a write lock once another writer has committed under WAL
+    with db.atomic(lock_type='IMMEDIATE'):
+        career = SavedCareer.get_or_none(
+            (SavedCareer.user == user_id) & (SavedCareer.title == title)
+        )
+        if career is None:
+            career = SavedCareer.create(user=user_id, title=title, description=description,
+                                        created_at=now, updated_at=now)
+        else:
+            (SavedCareer
+             .update(description=description, updated_at=now)
+             .where(SavedCareer.id == career.id)
+             .execute())
+            SavedCareerItem.delete().where(SavedCareerItem.saved_career == career.id).execute()
+
+        rows = (_item_rows(career.id, "step", steps)
+                + _item_rows(career.id, "pitfall", pitfalls)
+                + _item_rows(career.id, "resource", resources))
+        if rows:
+            SavedCareerItem.insert_many(rows).execute()
+
+        # The current career is part of User.to_dict(), so cached profiles must refresh
+        User.update(version=User.version + 1).where(User.id == user_id).execute()
+    return career
+
+
+def get_current_career(user_id, career_id=None):
+    """The most recently saved career (or the user's career_id) as a dict, or None."""
+    query = SavedCareer.select().where(SavedCareer.user == user_id)
+    if career_id is not None:
+        query = query.where(SavedCareer.id == career_id)
+    career = query.order_by(SavedCareer.updated_at.desc()).first()
+    if career is None:
+        return None
+    items = list(SavedCareerItem
+                 .select()
+                 .where(SavedCareerItem.saved_career == career.id))
+    return career.to_dict(items)
+
+
+def list_saved_careers(user_id):
+    careers = (SavedCareer
+               .select()
+               .where(SavedCareer.user == user_id)
+               .order_by(SavedCareer.updated_at.desc()))
+    # Two queries in total, however many careers the user has saved
+    return [c.to_dict() for c in prefetch(careers, SavedCareerItem)]
+
+
+def migrate_legacy_careers():
+    """Move career_* blobs off user rows into saved careers, then blank them."""
+    existing = {c.name for c in db.get_columns(User._meta.table_name)}
+    if not set(LEGACY_COLUMNS) <= existing:
+        return 0
+
+    cursor = db.execute_sql(
+        'SELECT id, career_title, career_description, career_steps, career_pitfalls, '
+        'career_resources FROM "user" WHERE career_title IS NOT NULL OR career_steps IS NOT NULL '
+        'OR career_pitfalls IS NOT NULL OR career_resources IS NOT NULL'
+    )
+    rows = cursor.fetchall()
+
+    def parse(value):
+        try:
+            parsed = json.loads(value) if value else []
+        except ValueError:
+            return [value]
+        return parsed if isinstance(parsed, list) else [parsed]
+
+    with db.atomic():
+        for user_id, title, description, steps, pitfalls, resources in rows:
+            save_career(user_id, title or "Saved career", description,
+                        parse(steps), parse(pitfalls), parse(resources))
+        if rows:
+            db.execute_sql('UPDATE "user" SET ' + ', '.join(f'{c} = NULL' for c in LEGACY_COLUMNS)
+                           + ' WHERE id IN (' + ', '.join(str(r[0]) for r in rows) + ')')
+    if rows:
+        print(f"✅ Migrated {len(rows)} saved careers off the user table")
+    return len(rows)
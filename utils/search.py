@@ -0,0 +1,128 @@
+import re
+
+from peewee import fn
+from utils.db import db
+from models.careerpath import CareerPath
+from models.failcourse import FailCourse
+from models.user import User
+from models.search_index import CareerPathIndex, FailCourseIndex
+
+SEARCH_MAX_LIMIT = 50
+
+# Column weights for bm25(); titles count most
+CAREER_WEIGHTS = (10.0, 2.0, 1.0, 1.0)
+STORY_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+_INDEXES = [
+    (CareerPathIndex, 'careerpath', ['title', 'steps', 'pitfalls', 'resources']),
+    (FailCourseIndex, 'failcourse', ['title', 'story', 'lesson', 'tags']),
+]
+
+
+def _create_triggers(index_table, content_table, columns):
+    cols = ', '.join(columns)
+    new_vals = ', '.join(f'new.{c}' for c in columns)
+    old_vals = ', '.join(f'old.{c}' for c in columns)
+    delete_row = (f"INSERT INTO {index_table}({index_table}, rowid, {cols}) "
+                  f"VALUES ('delete', old.id, {old_vals});")
+    insert_row = (f"INSERT INTO {index_table}(rowid, {cols}) "
+                  f"VALUES (new.id, {new_vals});")
+
+    db.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {index_table}_ai AFTER INSERT ON {content_table} "
+                   f"BEGIN {insert_row} END;")
+    db.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {index_table}_ad AFTER DELETE ON {content_table} "
+                   f"BEGIN {delete_row} END;")
+    db.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {index_table}_au AFTER UPDATE ON {content_table} "
+                   f"BEGIN {delete_row} {insert_row} END;")
+
+
+def ensure_search_index():
+    """Create the FTS5 tables and sync triggers; backfill any index created just now."""
+    with db.atomic():
+        for model, content_table, columns in _INDEXES:
+            created = not model.table_exists()
+            model.create_table(safe=True)
+            _create_triggers(model._meta.table_name, content_table, columns)
+            if created:
+                model.rebuild()
+
+
+def rebuild_search_index():
+    for model, _, _ in _INDEXES:
+        model.rebuild()
+        model.optimize()
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query where every word is a quoted prefix term."""
+    terms = re.findall(r"\w+", text or "", re.UNICODE)
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def tag_filter(tag):
+    """Where-clause for stories tagged with tag (word or phrase), answered from the FTS index.
+
+    Returns None when tag has no searchable words.
+    """
+    terms = re.findall(r"\w+", tag or "", re.UNICODE)
+    if not terms:
+        return None
+    tagged = (FailCourseIndex
+              .select(FailCourseIndex.rowid)
+              .where(FailCourseIndex.match('tags : "%s"' % " ".join(terms))))
+    return FailCourse.id.in_(tagged)
+
+
+def page_args(args, default_limit=10):
+    try:
+        page = max(1, int(args.get("page", 1)))
+        limit = min(SEARCH_MAX_LIMIT, max(1, int(args.get("limit", default_limit))))
+    except ValueError:
+        page, limit = 1, default_limit
+    return page, limit
+
+
+def _snippet(model, max_tokens=12):
+    return fn.snippet(model._meta.entity, -1, '<mark>', '</mark>', '…', max_tokens)
+
+
+def search_careers(text, page=1, limit=10):
+    """BM25-ranked career matches; returns (results, has_more)."""
+    match = build_match_query(text)
+    if not match:
+        return [], False
+
+    rank = CareerPathIndex.bm25(*CAREER_WEIGHTS)
+    query = (CareerPathIndex
+             .select(CareerPath.id, CareerPath.title, CareerPath.description,
+                     _snippet(CareerPathIndex).alias('snippet'), rank.alias('score'))
+             .join(CareerPath, on=(CareerPath.id == CareerPathIndex.rowid))
+             .where(CareerPathIndex.match(match))
+             .order_by(rank)
+             .limit(limit + 1)
+             .offset((page - 1) * limit)
+             .dicts())
+    rows = list(query)
+    return rows[:limit], len(rows) > limit
+
+
+def search_stories(text, page=1, limit=10):
+    """BM25-ranked fail-story matches; returns (results, has_more)."""
+    match = build_match_query(text)
+    if not match:
+        return [], False
+
+    rank = FailCourseIndex.bm25(*STORY_WEIGHTS)
+    query = (FailCourseIndex
+             .select(FailCourse.id, FailCourse.title, FailCourse.tags,
+                     User.name.alias('user'),
+                     _snippet(FailCourseIndex).alias('snippet'), rank.alias('score'))
+             .join(FailCourse, on=(FailCourse.id == FailCourseIndex.rowid))
+             .join(User, on=(User.id == FailCourse.user))
+             .where(FailCourseIndex.match(match))
+             .order_by(rank)
+             .limit(limit + 1)
+             .offset((page - 1) * limit)
+             .dicts())
+    rows = list(query)
+    return rows[:limit], len(rows) > limit
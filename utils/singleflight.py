@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-worker locking
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs fn; callers arriving while it is
+    in flight wait and receive the same result or exception. With lock_dir set,
+    leaders in different worker processes also serialize on a striped file lock,
+    and the recheck callback (usually a shared-cache lookup) lets a later worker
+    reuse what the first one stored instead of calling upstream again.
+    """
+
+    def __init__(self, lock_dir=None, stripes=256, lock_timeout=90):
+        self.lock_dir = lock_dir if fcntl else None
+        self.stripes = stripes
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, recheck)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _run(self, key, fn, recheck):
+        if not self.lock_dir:
+            return fn()
+
+        with self._file_lock(key):
+            if recheck is not None:
+                value = recheck()
+                if value is not None:
+                    return value
+            return fn()
+
+    def _file_lock(self, key):
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % self.stripes
+        path = os.path.join(self.lock_dir, f"singleflight-{stripe}.lock")
+        return _FileLock(path, self.lock_timeout)
+
+
+class _FileLock:
+    """flock with a timeout; on timeout the caller proceeds unlocked rather than hang."""
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self.fd = None
+
+    def __enter__(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            print("⚠️ Single-flight lock unavailable:", e)
+            return self
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    print("⚠️ Single-flight lock timed out:", self.path)
+                    os.close(self.fd)
+                    self.fd = None
+                    return self
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
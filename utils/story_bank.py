@@ -0,0 +1,210 @@
+import collections
+import datetime
+import json
+import math
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+load_dotenv()  # the CLI reads DB_PATH and friends from .env like the app does
+
+from peewee import fn
+from utils.db import db
+from utils.ai_utils import get_ai_failure_stories
+from models.aistory import AIStory
+
+# Story bank settings
+STORY_BANK_PAGE_SIZE = int(os.getenv("STORY_BANK_PAGE_SIZE", "10"))
+STORY_BANK_LOW_WATER = int(os.getenv("STORY_BANK_LOW_WATER", "30"))
+STORY_BANK_MAX_SIZE = int(os.getenv("STORY_BANK_MAX_SIZE", "200"))
+STORY_BANK_MAX_AGE = int(os.getenv("STORY_BANK_MAX_AGE", str(24 * 3600)))  # seconds
+STORY_BANK_REFRESH_COOLDOWN = int(os.getenv("STORY_BANK_REFRESH_COOLDOWN", "300"))
+STORY_BANK_RETRY_BACKOFF = int(os.getenv("STORY_BANK_RETRY_BACKOFF", "10"))     # seconds, doubled per failure
+STORY_BANK_MAX_BACKOFF = int(os.getenv("STORY_BANK_MAX_BACKOFF", "300"))
+STORY_BANK_SERVED_FLUSH = int(os.getenv("STORY_BANK_SERVED_FLUSH", "30"))       # seconds between count writes
+STORY_BANK_BUSY_RETRY_AFTER = 5  # seconds, sent while another request fills an empty pool
+
+_refresh_lock = threading.Lock()
+_last_refresh = 0.0
+_failed_refills = 0
+_retry_at = 0.0
+
+# Served counts are batched in memory and written by a background thread, so
+# serving stories never takes the write lock. Counts a worker loses on exit
+# only make rotation slightly less even.
+_served = collections.Counter()
+_served_lock = threading.Lock()
+_last_served_flush = 0.0
+
+
+class StoryBankEmpty(Exception):
+    """The pool is empty and can't be filled right now; the caller should answer 503."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _normalize_tags(tags):
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        return [t.strip() for t in tags.split(",") if t.strip()]
+    if isinstance(tags, list):
+        return [str(t).strip() for t in tags if str(t).strip()]
+    return []
+
+
+def refill_story_bank():
+    """Generate a fresh batch of stories, store the new ones and trim the pool."""
+    global _last_refresh
+    _last_refresh = time.time()
+    added = 0
+    try:
+        stories = get_ai_failure_stories(use_cache=False)
+        rows = [{
+            "title": s["title"].strip()[:255],
+            "story": s["story"].strip(),
+            "tags": json.dumps(_normalize_tags(s.get("tags")))
+        } for s in stories]
+
+        with db.atomic():
+            before = AIStory.select().count()
+            if rows:
+                # Titles are unique, so repeats from the model are skipped
+                AIStory.insert_many(rows).on_conflict_ignore().execute()
+            added = AIStory.select().count() - before
+
+            overflow = before + added - STORY_BANK_MAX_SIZE
+            if overflow > 0:
+                oldest = (AIStory
+                          .select(AIStory.id)
+                          .order_by(AIStory.created_at)
+                          .limit(overflow))
+                AIStory.delete().where(AIStory.id.in_(oldest)).execute()
+    finally:
+        _record_refill(added)
+
+    print(f"📚 Story bank refilled: {added} new of {len(rows)} generated stories")
+    return added
+
+
+def _record_refill(added):
+    """Back off exponentially after refills that fail or add nothing."""
+    global _failed_refills, _retry_at
+    if added:
+        _failed_refills, _retry_at = 0, 0.0
+        return
+    _failed_refills += 1
+    backoff = min(STORY_BANK_MAX_BACKOFF, STORY_BANK_RETRY_BACKOFF * 2 ** (_failed_refills - 1))
+    _retry_at = time.time() + backoff
+
+
+def _needs_refresh():
+    count = AIStory.select().count()
+    if count < STORY_BANK_LOW_WATER:
+        return True
+    newest = AIStory.select(fn.MAX(AIStory.created_at)).scalar()
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=STORY_BANK_MAX_AGE)
+    return newest is None or newest < cutoff
+
+
+def _refresh_in_background():
+    def run():
+        try:
+            with db.connection_context():
+                refill_story_bank()
+        except Exception as e:
+            print("⚠️ Story bank refresh failed:", e)
+        finally:
+            _refresh_lock.release()
+
+    now = time.time()
+    if now - _last_refresh < STORY_BANK_REFRESH_COOLDOWN or now < _retry_at:
+        return False
+    if not _refresh_lock.acquire(blocking=False):
+        return False  # a refresh is already running in this worker
+    threading.Thread(target=run, name="story-bank-refresh", daemon=True).start()
+    return True
+
+
+def _fill_empty_bank():
+    """Fill an empty pool in this request, or raise StoryBankEmpty.
+
+    One request per worker generates; the others, and every request during the
+    backoff after a failed fill, get StoryBankEmpty instead of queuing up.
+    """
+    wait = _retry_at - time.time()
+    if wait > 0:
+        raise StoryBankEmpty("Story bank is empty, retry later", math.ceil(wait))
+    if not _refresh_lock.acquire(blocking=False):
+        raise StoryBankEmpty("Story bank is being filled, retry shortly", STORY_BANK_BUSY_RETRY_AFTER)
+    try:
+        if AIStory.select().exists() or refill_story_bank():
+            return
+    finally:
+        _refresh_lock.release()
+    raise StoryBankEmpty("No stories could be generated, retry later",
+                         max(1, math.ceil(_retry_at - time.time())))
+
+
+def _flush_served():
+    with _served_lock:
+        counts = dict(_served)
+        _served.clear()
+    # One UPDATE per distinct count rather than per story
+    by_count = collections.defaultdict(list)
+    for story_id, n in counts.items():
+        by_count[n].append(story_id)
+    try:
+        with db.connection_context():
+            with db.atomic():
+                for n, ids in by_count.items():
+                    (AIStory
+                     .update(served_count=AIStory.served_count + n)
+                     .where(AIStory.id.in_(ids))
+                     .execute())
+    except Exception as e:
+        print("⚠️ Story bank served counts not saved:", e)
+
+
+def _record_served(ids):
+    global _last_served_flush
+    with _served_lock:
+        _served.update(ids)
+        now = time.time()
+        if now - _last_served_flush < STORY_BANK_SERVED_FLUSH:
+            return
+        _last_served_flush = now
+    threading.Thread(target=_flush_served, name="story-bank-served", daemon=True).start()
+
+
+def get_bank_stories(count=STORY_BANK_PAGE_SIZE, force_refresh=False):
+    """Serve stories from the pool (stale-while-revalidate).
+
+    Only an empty pool blocks on generation; otherwise a low or stale pool is
+    topped up by a background thread while the current stories are served.
+    The least served stories go out first, so readers rotate through the pool.
+    """
+    if not AIStory.select().exists():
+        _fill_empty_bank()
+    elif force_refresh or _needs_refresh():
+        _refresh_in_background()
+
+    stories = list(AIStory
+                   .select()
+                   .order_by(AIStory.served_count, fn.Random())
+                   .limit(count))
+    if stories:
+        _record_served(s.id for s in stories)
+    return [s.to_dict() for s in stories]
+
+
+if __name__ == "__main__":
+    # Prefill the pool, e.g. from a deploy hook: python -m utils.story_bank
+    with db.connection_context():
+        db.create_tables([AIStory], safe=True)
+        while AIStory.select().count() < STORY_BANK_LOW_WATER:
+            if not refill_story_bank():
+                break
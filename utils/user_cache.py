@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from models.user import User
+
+# Per-worker cache settings
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))  # seconds
+
+
+class _Entry:
+    __slots__ = ("data", "public", "version", "expires_at")
+
+    def __init__(self, user):
+        self.data = dict(user.__data__)   # raw column values
+        self.public = user.to_dict()      # pre-parsed JSON columns
+        self.version = user.version
+        self.expires_at = time.monotonic() + USER_CACHE_TTL
+
+    def user(self):
+        # A fresh instance per caller, so nobody mutates the shared row
+        return User(**self.data)
+
+
+class UserCache:
+    """LRU + TTL cache of user rows and their to_dict(), keyed by email and id.
+
+    Every hit is confirmed against the row's version column (one indexed lookup)
+    so a write made by any worker invalidates entries everywhere.
+    """
+
+    def __init__(self, max_size=USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()   # email -> _Entry
+        self._emails = {}               # id -> email
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def _get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._drop(email)
+                return None
+            self._entries.move_to_end(email)
+            return entry
+
+    def _put(self, entry):
+        email = entry.data["email"]
+        with self._lock:
+            self._entries[email] = entry
+            self._entries.move_to_end(email)
+            self._emails[entry.data["id"]] = email
+            while len(self._entries) > self.max_size:
+                _, old = self._entries.popitem(last=False)
+                self._emails.pop(old.data["id"], None)
+
+    def _drop(self, email):
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            self._emails.pop(entry.data["id"], None)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def invalidate(self, email=None, user_id=None):
+        with self._lock:
+            if email is None and user_id is not None:
+                email = self._emails.get(user_id)
+            if email is not None:
+                self._drop(email)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._emails.clear()
+
+    def load(self, email=None, user_id=None):
+        """Return a fresh _Entry for the user, or None when they don't exist."""
+        if email is None and user_id is not None:
+            with self._lock:
+                email = self._emails.get(user_id)
+        where = (User.email == email) if email is not None else (User.id == user_id)
+
+        entry = self._get(email) if email is not None else None
+        if entry is not None:
+            version = User.select(User.version).where(where).scalar()
+            if version == entry.version:
+                self._count("hits")
+                return entry
+            self._count("stale")
+            self.invalidate(email=email)
+            if version is None:
+                return None
+        else:
+            self._count("misses")
+
+        user = User.get_or_none(where)
+        if user is None:
+            return None
+        entry = _Entry(user)
+        self._put(entry)
+        return entry
+
+
+user_cache = UserCache()
+
+
+def get_cached_user(email=None, user_id=None):
+    entry = user_cache.load(email=email, user_id=user_id)
+    return entry.user() if entry else None
+
+
+def get_cached_user_dict(email=None, user_id=None):
+    entry = user_cache.load(email=email, user_id=user_id)
+    return dict(entry.public) if entry else None
+
+
+def invalidate_user(user=None, email=None):
+    if user is not None:
+        user_cache.invalidate(email=user.email)
+        user_cache.invalidate(user_id=user.id)
+    elif email is not None:
+        user_cache.invalidate(email=email)